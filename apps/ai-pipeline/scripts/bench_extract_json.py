@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmark extract_json() on pathological LLM outputs.
+
+Compares the single-pass scanner against the regex cascade it replaced
+(kept below for reference). The fence patterns' lazy `(.*?)` rescans the
+rest of the text from every unclosed fence, which is quadratic in the
+number of fences; the scanner stays linear on every input.
+
+Usage:
+    cd apps/ai-pipeline && python scripts/bench_extract_json.py [--scale N]
+"""
+
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+# Ensure the ai-pipeline src is importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.clients.llm import extract_json  # noqa: E402
+
+logging.disable(logging.WARNING)  # extract_json warns on every miss
+
+VALID = '{"conditionStructural": "good", "conditionLeaf": "fair", "confidence": 0.8, "observations": ["lean"]}'
+
+
+def legacy_extract_json(text: str) -> dict | None:
+    """The regex cascade extract_json used before the scanner."""
+    try:
+        return json.loads(text.strip())
+    except json.JSONDecodeError:
+        pass
+    patterns = [
+        r"```json\s*\n(.*?)\n```",
+        r"```\s*\n(.*?)\n```",
+        r"\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}",
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text, re.DOTALL)
+        if match:
+            try:
+                candidate = match.group(1) if match.lastindex else match.group(0)
+                return json.loads(candidate.strip())
+            except (json.JSONDecodeError, IndexError):
+                continue
+    return None
+
+
+def cases(scale: int) -> dict[str, str]:
+    """Named inputs, sized by scale."""
+    return {
+        "fenced json + commentary": f"Here you go:\n```json\n{VALID}\n```\n" + "Some notes. " * scale,
+        "unclosed fences": ("```json\n" + "word " * 20) * (scale // 5),
+        "rambling prose, json last": "The tree appears healthy overall. " * scale + VALID,
+        "deeply nested": '{"a": ' * 500 + "1" + "}" * 500,  # json recursion limit is ~1000
+        "stray braces": "{" * scale + VALID,
+        "prose braces": "{see below} " * scale + VALID,
+        "long string value": '{"notes": "' + "x\\\"y " * scale + '"}',
+    }
+
+
+def _time(fn: Callable[[str], object], text: str, budget_s: float) -> float:
+    runs, started = 0, time.perf_counter()
+    while True:
+        fn(text)
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= budget_s or runs >= 100:
+            return elapsed / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10_000, help="repetitions per input (default 10000)")
+    parser.add_argument("--budget", type=float, default=0.5, help="seconds per measurement (default 0.5)")
+    args = parser.parse_args()
+
+    print(f"{'input':<28} {'chars':>9} {'scanner':>17} {'regex':>17}")
+    for name, text in cases(args.scale).items():
+        found = ["found" if fn(text) is not None else "miss" for fn in (extract_json, legacy_extract_json)]
+        scanner_s = _time(extract_json, text, args.budget)
+        regex_s = _time(legacy_extract_json, text, args.budget)
+        print(
+            f"{name:<28} {len(text):>9} "
+            f"{scanner_s * 1000:>9.2f}ms {found[0]:>5} {regex_s * 1000:>9.2f}ms {found[1]:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Cheap-first model cascade for the per-analyzer LLM calls.
+
+With LLM_CASCADE_ROUTE set (e.g. "anthropic:claude-haiku-4-5"), each
+analyzer asks that fast, cheap model first. The call escalates to the
+analyzer's strong model (its LLM_ROUTES entry, else LLM_PROVIDER/LLM_MODEL)
+only when the cheap answer doesn't parse ("parse"), fails the analyzer's
+acceptance check such as a confidence threshold ("low_confidence"), or
+the cheap call errors out ("error"). Species can also escalate after the fact when the
+cheap answer disagrees with Pl@ntNet ("disagreement"), through
+``escalate()``. With LLM_REPAIR on, an answer that doesn't parse first
+gets a text-only repair re-prompt (see repair.py); only if that fails
+does the call count as unparseable.
+
+Every cascaded call counts once in ``llm_cascade_total{analyzer}`` and
+every escalation in ``llm_cascade_escalations_total{analyzer,reason}``.
+The running escalation rate per analyzer is published as the
+``llm_cascade_escalation_rate`` gauge.
+"""
+
+import logging
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from src.analyzers.repair import repair
+from src.clients.llm import LLMResponse, discard_cached
+from src.clients.response_schema import ResponseSchema
+from src.clients.routing import parse_route, route_for
+from src.config import settings
+from src.utils import metrics
+from src.utils.images import PreparedPhoto
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# llm.query, passed in by each analyzer (so it stays patchable per analyzer)
+Query = Callable[..., Awaitable[LLMResponse]]
+
+# An analyzer's parser: the result, or None with the reasons appended to the list
+Parser = Callable[[LLMResponse, list[str]], T | None]
+
+ESCALATION_REASONS = ("parse", "low_confidence", "error", "disagreement")
+
+
+def cheap_route() -> tuple[str, str] | None:
+    """The cheap "provider:model" tried first, or None when the cascade is off."""
+    return parse_route(settings.llm_cascade_route) if settings.llm_cascade_route else None
+
+
+def _publish_rate(analyzer: str) -> None:
+    total = metrics.get("llm_cascade_total", analyzer=analyzer)
+    escalated = sum(
+        metrics.get("llm_cascade_escalations_total", analyzer=analyzer, reason=reason) for reason in ESCALATION_REASONS
+    )
+    if total:
+        metrics.set_gauge("llm_cascade_escalation_rate", escalated / total, analyzer=analyzer)
+
+
+async def _ask(
+    query: Query,
+    prompt: str,
+    images: list[PreparedPhoto],
+    analyzer: str,
+    schema: ResponseSchema,
+    parse: Parser[T],
+    route: tuple[str, str] | None = None,
+) -> T | None:
+    options = route_for(analyzer).query_kwargs()
+    if route is not None:
+        options["provider"], options["model"] = route
+    response = await query(prompt, images=images, analyzer=analyzer, schema=schema, **options)
+    errors: list[str] = []
+    result = parse(response, errors)
+    if result is None and settings.llm_repair:
+        result = await repair(query, response, errors, analyzer, schema, parse, options)
+    if result is None:
+        await discard_cached(response)
+    return result
+
+
+async def run(
+    query: Query,
+    analyzer: str,
+    prompt: str,
+    images: list[PreparedPhoto],
+    schema: ResponseSchema,
+    parse: Parser[T],
+    accept: Callable[[T], bool] | None = None,
+) -> tuple[T | None, bool]:
+    """Query the cheap model first and escalate to the strong one when needed.
+
+    Args:
+        query: The analyzer's LLM query function.
+        analyzer: Calling analyzer ("species", "health", ...).
+        prompt: Text prompt.
+        images: Prepared photos.
+        schema: The analyzer's response schema.
+        parse: Turns a response into the analyzer's result, or None if unusable
+            (appending the reasons to its list argument).
+        accept: Whether a parsed cheap result is good enough; None accepts any.
+
+    Returns:
+        (result, final): final is False when the result came from the cheap
+        model and may still be escalated with ``escalate()``.
+
+    Raises:
+        Whatever the strong model's query raises, when there is no cheap
+        answer to fall back on.
+    """
+    route = cheap_route()
+    if route is None:
+        return await _ask(query, prompt, images, analyzer, schema, parse), True
+
+    metrics.inc("llm_cascade_total", analyzer=analyzer)
+    try:
+        result = await _ask(query, prompt, images, analyzer, schema, parse, route)
+    except Exception:
+        logger.exception("Cheap %s call to %s/%s failed", analyzer, *route)
+        result, reason = None, "error"
+    else:
+        if result is None:
+            reason = "parse"
+        elif accept is not None and not accept(result):
+            reason = "low_confidence"
+        else:
+            _publish_rate(analyzer)
+            logger.info("Cascade: %s answered by %s/%s", analyzer, *route)
+            return result, False
+
+    try:
+        strong = await escalate(query, analyzer, reason, prompt, images, schema, parse)
+    except Exception:
+        if result is None:
+            raise
+        logger.exception("Escalated %s call failed, keeping the cheap answer", analyzer)
+        strong = None
+    # A cheap answer that parsed beats no answer
+    return (strong if strong is not None else result), True
+
+
+async def escalate(
+    query: Query,
+    analyzer: str,
+    reason: str,
+    prompt: str,
+    images: list[PreparedPhoto],
+    schema: ResponseSchema,
+    parse: Parser[T],
+) -> T | None:
+    """Re-ask the strong model after the cheap one's answer was rejected.
+
+    Args:
+        query: The analyzer's LLM query function.
+        analyzer: Calling analyzer.
+        reason: Why ("parse", "low_confidence", "error", "disagreement").
+        prompt: Text prompt.
+        images: Prepared photos.
+        schema: The analyzer's response schema.
+        parse: Turns a response into the analyzer's result.
+
+    Returns:
+        The strong model's parsed result, or None if it was unusable.
+    """
+    metrics.inc("llm_cascade_escalations_total", analyzer=analyzer, reason=reason)
+    _publish_rate(analyzer)
+    strong = route_for(analyzer)
+    logger.info(
+        "Cascade: escalating %s to %s/%s (%s)",
+        analyzer, strong.provider or settings.llm_provider, strong.model or settings.llm_model, reason,
+    )
+    return await _ask(query, prompt, images, analyzer, schema, parse)
@@ -0,0 +1,141 @@
+"""Fused analyzer — species, health, site and measurements from one LLM call.
+
+Sends the photos once with a combined prompt and splits the returned JSON
+document into per-analyzer sections, each parsed by that analyzer's own
+parser. Sections that are missing or fail validation come back as None so
+the pipeline can fall back to the dedicated analyzer for just that section.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.clients.llm import query as llm_query, discard_cached, extract_json, LLMResponse
+from src.clients.response_schema import ResponseSchema, object_schema
+from src.clients.routing import route_for
+from src.analyzers import health, measurements, site, species
+from src.analyzers.species import LLMSpecies, _parse_llm_species
+from src.analyzers.health import HealthResult, parse_health_response
+from src.analyzers.site import SiteResult, parse_site_response
+from src.analyzers.measurements import MeasurementResult, parse_measurement_response
+from src.utils import metrics
+from src.utils.images import PreparedPhoto, as_prepared
+
+logger = logging.getLogger(__name__)
+
+PROMPT_PATH = Path(__file__).parent.parent / "prompts" / "fused_assessment.txt"
+
+SECTIONS = ("species", "health", "site", "measurements")
+
+
+@dataclass
+class FusedResult:
+    """Per-section results of a fused call. None means "fall back for this section"."""
+
+    species: LLMSpecies | None = None
+    health: HealthResult | None = None
+    site: SiteResult | None = None
+    measurements: MeasurementResult | None = None
+
+
+RESPONSE_SCHEMA = ResponseSchema(
+    name="tree_assessment",
+    description="Record species, health, site and measurement findings for the tree.",
+    schema=object_schema({
+        "species": species.RESPONSE_SCHEMA.schema,
+        "health": health.RESPONSE_SCHEMA.schema,
+        "site": site.RESPONSE_SCHEMA.schema,
+        "measurements": measurements.RESPONSE_SCHEMA.schema,
+    }),
+)
+
+
+def parse_fused_response(response: LLMResponse) -> FusedResult:
+    """Split a fused JSON document and parse each section with its analyzer's parser.
+
+    Args:
+        response: Raw LLM response.
+
+    Returns:
+        FusedResult; sections that are absent or invalid are None.
+    """
+    data = extract_json(response.text)
+    if data is None:
+        logger.warning("Failed to extract JSON from fused assessment response")
+        return FusedResult()
+
+    def _section_text(name: str) -> str | None:
+        section = data.get(name)
+        if not isinstance(section, dict):
+            logger.warning("Fused response missing '%s' section", name)
+            return None
+        return json.dumps(section)
+
+    result = FusedResult()
+
+    text = _section_text("species")
+    if text is not None:
+        result.species = _parse_llm_species(
+            LLMResponse(text=text, provider=response.provider, model=response.model)
+        )
+
+    text = _section_text("health")
+    if text is not None:
+        result.health = parse_health_response(text)
+
+    text = _section_text("site")
+    if text is not None:
+        result.site = parse_site_response(text)
+
+    text = _section_text("measurements")
+    if text is not None:
+        result.measurements = parse_measurement_response(text)
+
+    return result
+
+
+async def analyze_fused(
+    photos: list[PreparedPhoto] | list[tuple[bytes, str]],
+    latitude: float | None = None,
+    longitude: float | None = None,
+    region: str = "unknown",
+) -> FusedResult:
+    """Run all four LLM assessments in a single multimodal call.
+
+    Args:
+        photos: PreparedPhotos or (image_bytes, photo_type) tuples.
+        latitude: GPS latitude for geographic context.
+        longitude: GPS longitude for geographic context.
+        region: Reverse-geocoded region string.
+
+    Returns:
+        FusedResult. Never raises; on failure every section is None.
+    """
+    prompt = PROMPT_PATH.read_text().format(
+        latitude=latitude or "unknown",
+        longitude=longitude or "unknown",
+        region=region,
+    )
+    prepared = as_prepared(photos)
+
+    try:
+        response = await llm_query(
+            prompt, images=prepared, analyzer="fused", schema=RESPONSE_SCHEMA, **route_for("fused").query_kwargs(),
+        )
+        result = parse_fused_response(response)
+        if result == FusedResult():
+            await discard_cached(response)
+    except Exception:
+        logger.exception("Fused assessment failed")
+        result = FusedResult()
+
+    for name in SECTIONS:
+        outcome = "ok" if getattr(result, name) is not None else "fallback"
+        metrics.inc("fused_sections_total", section=name, outcome=outcome)
+
+    logger.info(
+        "Fused assessment: species=%s, health=%s, site=%s, measurements=%s",
+        *("✓" if getattr(result, name) is not None else "✗" for name in SECTIONS),
+    )
+    return result
@@ -8,7 +8,11 @@ import logging
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from src.analyzers import cascade
 from src.clients.llm import query as llm_query, extract_json
+from src.clients.response_schema import ResponseSchema, dataclass_schema
+from src.config import settings
+from src.utils.images import PreparedPhoto, as_prepared
 
 logger = logging.getLogger(__name__)
 
@@ -103,6 +107,21 @@ class HealthResult:
     notes: list[str] = field(default_factory=list)
 
 
+RESPONSE_SCHEMA = ResponseSchema(
+    name="health_assessment",
+    description="Record the structural and leaf condition of the tree.",
+    schema=dataclass_schema(
+        HealthResult,
+        exclude=("notes",),
+        enums={
+            "condition_structural": VALID_CONDITIONS,
+            "condition_leaf": VALID_CONDITIONS,
+            "observations": VALID_OBSERVATIONS,
+        },
+    ),
+)
+
+
 def _normalize_condition(raw: str) -> str | None:
     """Normalize a condition string to our 6-tier scale.
 
@@ -168,11 +187,13 @@ def _normalize_observations(raw_list: list) -> tuple[list[str], list[str]]:
     return codes, notes
 
 
-def parse_health_response(text: str) -> HealthResult | None:
+def parse_health_response(text: str, errors: list[str] | None = None) -> HealthResult | None:
     """Parse LLM response into a HealthResult.
 
     Args:
         text: Raw text from LLM response.
+        errors: If given, why the response was rejected is appended here
+            (fed back to the model by the repair re-prompt).
 
     Returns:
         HealthResult or None if parsing fails.
@@ -180,6 +201,8 @@ def parse_health_response(text: str) -> HealthResult | None:
     data = extract_json(text)
     if data is None:
         logger.warning("Failed to extract JSON from health assessment response")
+        if errors is not None:
+            errors.append("No JSON object found in the response")
         return None
 
     # Parse structural condition
@@ -204,6 +227,12 @@ def parse_health_response(text: str) -> HealthResult | None:
             "Could not parse both conditions: structural=%s, leaf=%s",
             raw_structural, raw_leaf,
         )
+        if errors is not None:
+            allowed = ", ".join(sorted(VALID_CONDITIONS))
+            if condition_structural is None:
+                errors.append(f"conditionStructural {raw_structural!r} is not one of: {allowed}")
+            if condition_leaf is None:
+                errors.append(f"conditionLeaf {raw_leaf!r} is not one of: {allowed}")
         return None
 
     # Parse confidence
@@ -229,22 +258,25 @@ def parse_health_response(text: str) -> HealthResult | None:
 
 
 async def analyze_health(
-    photos: list[tuple[bytes, str]],
+    photos: list[PreparedPhoto] | list[tuple[bytes, str]],
 ) -> HealthResult | None:
     """Run health assessment on tree photos.
 
     Args:
-        photos: List of (image_bytes, photo_type) tuples.
+        photos: PreparedPhotos or (image_bytes, photo_type) tuples.
 
     Returns:
         HealthResult or None if assessment fails.
     """
     prompt = PROMPT_PATH.read_text()
-    llm_images = [(img_bytes, "image/jpeg") for img_bytes, _ in photos]
+    prepared = as_prepared(photos)
 
     try:
-        response = await llm_query(prompt, images=llm_images)
-        result = parse_health_response(response.text)
+        result, _ = await cascade.run(
+            llm_query, "health", prompt, prepared, RESPONSE_SCHEMA,
+            parse=lambda response, errors: parse_health_response(response.text, errors),
+            accept=lambda r: r.confidence >= settings.llm_cascade_health_min_confidence,
+        )
         if result:
             logger.info(
                 "Health assessment: structural=%s, leaf=%s (conf=%.3f, observations=%d, notes=%d)",
@@ -4,7 +4,10 @@ import logging
 from dataclasses import dataclass
 from pathlib import Path
 
+from src.analyzers import cascade
 from src.clients.llm import query as llm_query, extract_json
+from src.clients.response_schema import ResponseSchema, dataclass_schema
+from src.utils.images import PreparedPhoto, as_prepared
 
 logger = logging.getLogger(__name__)
 
@@ -31,13 +34,23 @@ class MeasurementResult:
     num_stems: int
 
 
-def parse_measurement_response(text: str) -> MeasurementResult | None:
+# The model reports metric values only; imperial ones are computed on parse
+RESPONSE_SCHEMA = ResponseSchema(
+    name="measurement_estimate",
+    description="Record the estimated tree measurements in metric units.",
+    schema=dataclass_schema(MeasurementResult, exclude=("dbh_in", "height_ft", "crown_width_ft")),
+)
+
+
+def parse_measurement_response(text: str, errors: list[str] | None = None) -> MeasurementResult | None:
     """Parse LLM response into a MeasurementResult.
 
     The LLM returns metric values; we compute imperial conversions here.
 
     Args:
         text: Raw text from LLM response.
+        errors: If given, why the response was rejected is appended here
+            (fed back to the model by the repair re-prompt).
 
     Returns:
         MeasurementResult or None if parsing fails.
@@ -45,6 +58,8 @@ def parse_measurement_response(text: str) -> MeasurementResult | None:
     data = extract_json(text)
     if data is None:
         logger.warning("Failed to extract JSON from measurement response")
+        if errors is not None:
+            errors.append("No JSON object found in the response")
         return None
 
     dbh_cm = data.get("dbhCm")
@@ -52,6 +67,8 @@ def parse_measurement_response(text: str) -> MeasurementResult | None:
 
     if dbh_cm is None or height_m is None:
         logger.warning("Missing dbhCm or heightM in measurement response: %s", data)
+        if errors is not None:
+            errors.extend(f"{key} is missing" for key in ("dbhCm", "heightM") if data.get(key) is None)
         return None
 
     try:
@@ -59,10 +76,14 @@ def parse_measurement_response(text: str) -> MeasurementResult | None:
         height_m = float(height_m)
     except (ValueError, TypeError):
         logger.warning("Non-numeric measurement values: dbhCm=%s, heightM=%s", dbh_cm, height_m)
+        if errors is not None:
+            errors.append(f"dbhCm ({dbh_cm!r}) and heightM ({height_m!r}) must be numbers")
         return None
 
     if dbh_cm <= 0 or height_m <= 0:
         logger.warning("Measurements must be positive: dbhCm=%.2f, heightM=%.2f", dbh_cm, height_m)
+        if errors is not None:
+            errors.append(f"dbhCm ({dbh_cm:g}) and heightM ({height_m:g}) must be positive")
         return None
 
     # Crown width (optional — LLM may not be able to estimate from photos)
@@ -101,13 +122,13 @@ def parse_measurement_response(text: str) -> MeasurementResult | None:
 
 
 async def analyze_measurements(
-    photos: list[tuple[bytes, str]],
+    photos: list[PreparedPhoto] | list[tuple[bytes, str]],
     species_scientific: str | None = None,
 ) -> MeasurementResult | None:
     """Estimate tree physical measurements from photos.
 
     Args:
-        photos: List of (image_bytes, photo_type) tuples.
+        photos: PreparedPhotos or (image_bytes, photo_type) tuples.
         species_scientific: Known species for allometric cross-reference (optional).
 
     Returns:
@@ -119,11 +140,14 @@ async def analyze_measurements(
         prompt += f"\n\nNote: This tree has been identified as {species_scientific}. "
         prompt += "Use species-typical proportions to validate your estimates."
 
-    llm_images = [(img_bytes, "image/jpeg") for img_bytes, _ in photos]
+    prepared = as_prepared(photos)
 
     try:
-        response = await llm_query(prompt, images=llm_images)
-        result = parse_measurement_response(response.text)
+        # No confidence in the response: the cascade only escalates unusable answers
+        result, _ = await cascade.run(
+            llm_query, "measurements", prompt, prepared, RESPONSE_SCHEMA,
+            parse=lambda response, errors: parse_measurement_response(response.text, errors),
+        )
         if result:
             logger.info(
                 "Measurements: DBH=%.1fcm (%.1fin), Height=%.1fm (%.1fft), "
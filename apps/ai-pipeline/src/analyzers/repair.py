@@ -0,0 +1,89 @@
+"""Text-only repair re-prompt for LLM answers that fail validation.
+
+When an analyzer's parser rejects a response (an unknown condition, a
+missing dbhCm, no JSON at all), re-sending the photos costs 10–50× the
+tokens of the original text. With LLM_REPAIR on, the analyzer instead
+sends a text-only follow-up to the provider/model it asked. It contains
+the model's previous answer, the parser's validation errors and the
+analyzer's JSON schema (keys and allowed enum values), and asks for
+corrected JSON.
+
+Outcomes are counted in ``llm_repairs_total{analyzer,outcome}`` (outcome
+"fixed", "failed" or "error").
+"""
+
+import json
+import logging
+from collections.abc import Awaitable, Callable, Mapping
+from pathlib import Path
+from typing import Any, TypeVar
+
+from src.clients.llm import discard_cached, LLMResponse
+from src.clients.response_schema import ResponseSchema
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+PROMPT_PATH = Path(__file__).parent.parent / "prompts" / "repair.txt"
+
+# Longer answers are cut; the start holds the JSON worth repairing
+MAX_PREVIOUS_CHARS = 4000
+
+T = TypeVar("T")
+
+
+def build_prompt(previous: str, errors: list[str], schema: ResponseSchema) -> str:
+    """Render the repair prompt.
+
+    Args:
+        previous: The rejected response text.
+        errors: Validation errors from the parser.
+        schema: The analyzer's response schema.
+
+    Returns:
+        Prompt text.
+    """
+    return PROMPT_PATH.read_text().format(
+        previous=previous[:MAX_PREVIOUS_CHARS],
+        errors="\n".join(f"- {e}" for e in errors) or "- The answer did not match the required format",
+        schema=json.dumps(schema.schema, indent=2),
+    )
+
+
+async def repair(
+    query: Callable[..., Awaitable[LLMResponse]],
+    response: LLMResponse,
+    errors: list[str],
+    analyzer: str,
+    schema: ResponseSchema,
+    parse: Callable[[LLMResponse, list[str]], T | None],
+    options: Mapping[str, Any],
+) -> T | None:
+    """Ask the model to fix its rejected answer, without re-sending images.
+
+    Args:
+        query: The analyzer's LLM query function.
+        response: The rejected response.
+        errors: Why the parser rejected it.
+        analyzer: Calling analyzer.
+        schema: The analyzer's response schema.
+        parse: The analyzer's parser.
+        options: query() keyword arguments used for the rejected call
+            (provider, model, max_tokens, ...); the repair goes to the same model.
+
+    Returns:
+        The parsed corrected result, or None if the repair didn't help.
+    """
+    logger.info("Repairing %s response with a text-only re-prompt (%s)", analyzer, "; ".join(errors))
+    try:
+        fixed = await query(build_prompt(response.text, errors, schema), analyzer=analyzer, schema=schema, **options)
+    except Exception:
+        logger.exception("Repair re-prompt for %s failed", analyzer)
+        metrics.inc("llm_repairs_total", analyzer=analyzer, outcome="error")
+        return None
+
+    result = parse(fixed, [])
+    metrics.inc("llm_repairs_total", analyzer=analyzer, outcome="fixed" if result is not None else "failed")
+    if result is None:
+        await discard_cached(fixed)
+    return result
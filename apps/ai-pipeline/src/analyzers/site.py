@@ -8,7 +8,11 @@ import logging
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from src.analyzers import cascade
 from src.clients.llm import query as llm_query, extract_json
+from src.clients.response_schema import ResponseSchema, dataclass_schema
+from src.config import settings
+from src.utils.images import PreparedPhoto, as_prepared
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +54,23 @@ class SiteResult:
     risk_flag: bool | None = None
 
 
+RESPONSE_SCHEMA = ResponseSchema(
+    name="site_assessment",
+    description="Record the Level 1 site inspection fields; null when not visible.",
+    schema=dataclass_schema(
+        SiteResult,
+        enums={
+            "condition_rating": VALID_CONDITION_RATINGS,
+            "trunk_defects": VALID_TRUNK_DEFECTS,
+            "location_type": VALID_LOCATION_TYPES,
+            "site_type": VALID_SITE_TYPES,
+            "maintenance_flag": VALID_MAINTENANCE_FLAGS,
+            "mulch_soil_condition": VALID_MULCH_CONDITIONS,
+        },
+    ),
+)
+
+
 def _safe_str(val, valid_set: set[str]) -> str | None:
     """Validate a string value against a set of valid options."""
     if val is None:
@@ -69,11 +90,22 @@ def _safe_bool(val) -> bool | None:
     return None
 
 
-def parse_site_response(text: str) -> SiteResult | None:
+def filled_fields(result: SiteResult) -> int:
+    """Count how many of the 10 site fields the model filled in."""
+    return sum(1 for v in [
+        result.condition_rating, result.crown_dieback, result.location_type,
+        result.site_type, result.overhead_utility_conflict, result.maintenance_flag,
+        result.sidewalk_damage, result.mulch_soil_condition, result.risk_flag,
+    ] if v is not None) + (1 if result.trunk_defects else 0)
+
+
+def parse_site_response(text: str, errors: list[str] | None = None) -> SiteResult | None:
     """Parse LLM response into a SiteResult.
 
     Args:
         text: Raw text from LLM response.
+        errors: If given, why the response was rejected is appended here
+            (fed back to the model by the repair re-prompt).
 
     Returns:
         SiteResult or None if parsing completely fails.
@@ -81,6 +113,8 @@ def parse_site_response(text: str) -> SiteResult | None:
     data = extract_json(text)
     if data is None:
         logger.warning("Failed to extract JSON from site assessment response")
+        if errors is not None:
+            errors.append("No JSON object found in the response")
         return None
 
     # Parse trunk defects
@@ -105,15 +139,11 @@ def parse_site_response(text: str) -> SiteResult | None:
         risk_flag=_safe_bool(data.get("riskFlag")),
     )
 
-    # Count how many fields we got
-    filled = sum(1 for v in [
-        result.condition_rating, result.crown_dieback, result.location_type,
-        result.site_type, result.overhead_utility_conflict, result.maintenance_flag,
-        result.sidewalk_damage, result.mulch_soil_condition, result.risk_flag,
-    ] if v is not None) + (1 if result.trunk_defects else 0)
-
+    filled = filled_fields(result)
     if filled == 0:
         logger.warning("Site assessment returned no usable fields")
+        if errors is not None:
+            errors.append("No field had a valid value (check key names and allowed values)")
         return None
 
     logger.info("Site assessment: %d/10 fields filled", filled)
@@ -121,22 +151,25 @@ def parse_site_response(text: str) -> SiteResult | None:
 
 
 async def analyze_site(
-    photos: list[tuple[bytes, str]],
+    photos: list[PreparedPhoto] | list[tuple[bytes, str]],
 ) -> SiteResult | None:
     """Run site assessment on tree photos.
 
     Args:
-        photos: List of (image_bytes, photo_type) tuples.
+        photos: PreparedPhotos or (image_bytes, photo_type) tuples.
 
     Returns:
         SiteResult or None if assessment fails.
     """
     prompt = PROMPT_PATH.read_text()
-    llm_images = [(img_bytes, "image/jpeg") for img_bytes, _ in photos]
+    prepared = as_prepared(photos)
 
     try:
-        response = await llm_query(prompt, images=llm_images)
-        result = parse_site_response(response.text)
+        result, _ = await cascade.run(
+            llm_query, "site", prompt, prepared, RESPONSE_SCHEMA,
+            parse=lambda response, errors: parse_site_response(response.text, errors),
+            accept=lambda r: filled_fields(r) >= settings.llm_cascade_site_min_fields,
+        )
         if result:
             logger.info(
                 "Site: condition=%s, location=%s, site=%s, maintenance=%s, risk=%s",
@@ -2,12 +2,17 @@
 
 import asyncio
 import logging
+from collections.abc import Awaitable
 from dataclasses import dataclass
 from pathlib import Path
 
+from src.analyzers import cascade
 from src.clients.plantnet import identify as plantnet_identify, PlantNetResult
 from src.clients.llm import query as llm_query, extract_json, LLMResponse
+from src.clients.response_schema import ResponseSchema, dataclass_schema
+from src.config import settings
 from src.utils.geocode import reverse_geocode
+from src.utils.images import PreparedPhoto, as_prepared
 
 logger = logging.getLogger(__name__)
 
@@ -40,11 +45,21 @@ class LLMSpecies:
     genus: str
 
 
-def _parse_llm_species(response: LLMResponse) -> LLMSpecies | None:
+# Genus is taken from the scientific name, not asked for
+RESPONSE_SCHEMA = ResponseSchema(
+    name="species_identification",
+    description="Record the identified tree species.",
+    schema=dataclass_schema(LLMSpecies, exclude=("genus",)),
+)
+
+
+def _parse_llm_species(response: LLMResponse, errors: list[str] | None = None) -> LLMSpecies | None:
     """Parse LLM response into a species identification.
 
     Args:
         response: Raw LLM response.
+        errors: If given, why the response was rejected is appended here
+            (fed back to the model by the repair re-prompt).
 
     Returns:
         LLMSpecies or None if parsing fails.
@@ -52,6 +67,8 @@ def _parse_llm_species(response: LLMResponse) -> LLMSpecies | None:
     data = extract_json(response.text)
     if data is None:
         logger.warning("Failed to parse species JSON from LLM response")
+        if errors is not None:
+            errors.append("No JSON object found in the response")
         return None
 
     common = data.get("common", "")
@@ -60,6 +77,8 @@ def _parse_llm_species(response: LLMResponse) -> LLMSpecies | None:
 
     if not scientific:
         logger.warning("LLM returned empty scientific name")
+        if errors is not None:
+            errors.append("scientific is empty; give the binomial name (Genus species)")
         return None
 
     genus = scientific.split()[0] if scientific else ""
@@ -72,6 +91,22 @@ def _parse_llm_species(response: LLMResponse) -> LLMSpecies | None:
     )
 
 
+def disagrees(plantnet: PlantNetResult | None, llm_species: LLMSpecies) -> bool:
+    """Whether Pl@ntNet's best match names a different species than the LLM.
+
+    Args:
+        plantnet: Pl@ntNet identification result (may be None).
+        llm_species: LLM species identification.
+
+    Returns:
+        True only when both named a species and they differ.
+    """
+    pn_best = plantnet.best_match if plantnet else None
+    if pn_best is None:
+        return False
+    return pn_best.scientific_name.lower().strip() != llm_species.scientific.lower().strip()
+
+
 def consensus(
     plantnet: PlantNetResult | None,
     llm_species: LLMSpecies | None,
@@ -199,26 +234,34 @@ def apply_geographic_boost(result: SpeciesResult, common_species: list[str]) ->
 
 
 async def analyze_species(
-    photos: list[tuple[bytes, str]],
+    photos: list[PreparedPhoto] | list[tuple[bytes, str]],
     latitude: float | None = None,
     longitude: float | None = None,
+    region: str | None = None,
+    llm_species: Awaitable[LLMSpecies | None] | None = None,
 ) -> SpeciesResult | None:
     """Run species identification pipeline.
 
-    Calls Pl@ntNet and LLM in parallel, then applies consensus logic.
+    Calls Pl@ntNet and LLM in parallel, then applies consensus logic. With
+    the cheap-first cascade on, a cheap-model answer that disagrees with
+    Pl@ntNet is re-asked of the strong model before consensus.
 
     Args:
-        photos: List of (image_bytes, photo_type) tuples.
+        photos: PreparedPhotos or (image_bytes, photo_type) tuples.
         latitude: GPS latitude for geographic context.
         longitude: GPS longitude for geographic context.
+        region: Already-resolved region; skips the reverse geocode when given.
+        llm_species: Pending LLM identification from another call (fused mode).
+            The species prompt is only sent if this resolves to None.
 
     Returns:
         SpeciesResult or None if identification fails completely.
     """
     # Resolve geographic region for prompt context
-    region = "unknown"
-    if latitude is not None and longitude is not None:
-        region = await reverse_geocode(latitude, longitude)
+    if region is None:
+        region = "unknown"
+        if latitude is not None and longitude is not None:
+            region = await reverse_geocode(latitude, longitude)
 
     # Build LLM prompt
     prompt_template = PROMPT_PATH.read_text()
@@ -228,28 +271,49 @@ async def analyze_species(
         region=region,
     )
 
-    # Prepare image data for LLM
-    llm_images = [(img_bytes, "image/jpeg") for img_bytes, _ in photos]
+    # Decoded/encoded once, shared by the LLM payload
+    prepared = as_prepared(photos)
 
     # Run both in parallel
     plantnet_result: PlantNetResult | None = None
     llm_result: LLMSpecies | None = None
+    llm_final = True  # False while llm_result is a cheap-model answer that could escalate
 
     async def _run_plantnet():
         nonlocal plantnet_result
         try:
-            plantnet_result = await plantnet_identify(photos)
+            plantnet_result = await plantnet_identify([(p.data, p.photo_type) for p in prepared])
         except Exception:
             logger.exception("Pl@ntNet identification failed")
 
     async def _run_llm():
-        nonlocal llm_result
+        nonlocal llm_result, llm_final
+        if llm_species is not None:
+            try:
+                llm_result = await llm_species
+            except Exception:
+                logger.exception("Fused species identification failed")
+            if llm_result is not None:
+                return
+            logger.info("No usable species from fused call — sending species prompt")
         try:
-            response = await llm_query(prompt, images=llm_images)
-            llm_result = _parse_llm_species(response)
+            llm_result, llm_final = await cascade.run(
+                llm_query, "species", prompt, prepared, RESPONSE_SCHEMA, _parse_llm_species,
+                accept=lambda s: s.confidence >= settings.llm_cascade_species_min_confidence,
+            )
         except Exception:
             logger.exception("LLM species identification failed")
 
     await asyncio.gather(_run_plantnet(), _run_llm())
 
+    if not llm_final and llm_result is not None and disagrees(plantnet_result, llm_result):
+        try:
+            strong = await cascade.escalate(
+                llm_query, "species", "disagreement", prompt, prepared, RESPONSE_SCHEMA, _parse_llm_species,
+            )
+            if strong is not None:
+                llm_result = strong
+        except Exception:
+            logger.exception("Escalated LLM species identification failed")
+
     return consensus(plantnet_result, llm_result)
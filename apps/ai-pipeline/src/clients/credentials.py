@@ -0,0 +1,218 @@
+"""Pools of API keys and endpoints per LLM provider, balanced on latency and quota.
+
+A pool is configured with one comma-separated setting per provider
+(ANTHROPIC_API_KEYS, OPENAI_API_KEYS, GOOGLE_API_KEYS). Each entry is:
+
+    key                      default endpoint, weight 1
+    key*3                    weight 3
+    key@https://host*2       own endpoint (scheme + host, no path), weight 2
+
+The single-key settings (ANTHROPIC_API_KEY, ...) still work; that key
+joins the pool with weight 1.
+
+Each request picks a credential by "power of two choices": two
+candidates are drawn by weight and the cheaper one wins. Cost is the
+key's EWMA latency scaled by its in-flight calls. It is divided by the
+share of quota the rate-limit headers say is left. A 401/403 ejects a
+key for AUTH_EJECT_S. A 429 ejects it until Retry-After, or for
+RATE_LIMIT_EJECT_S when there is none. If every key is ejected, the
+one that comes back soonest is used.
+"""
+
+import hashlib
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+from src.clients.rate_limit import parse_rate_limit_headers
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URLS = {
+    "anthropic": "https://api.anthropic.com",
+    "openai": "https://api.openai.com",
+    "google": "https://generativelanguage.googleapis.com",
+}
+
+MISSING_KEY_ERRORS = {
+    "anthropic": "Anthropic API key is required (set ANTHROPIC_API_KEY)",
+    "openai": "OpenAI API key is required (set OPENAI_API_KEY)",
+    "google": "Google API key is required (set GOOGLE_API_KEY)",
+}
+
+# Weight of the newest latency sample in the moving average
+EWMA_ALPHA = 0.3
+
+# Assumed latency for a key with no samples yet; low so new keys get tried
+INITIAL_LATENCY_S = 1.0
+
+AUTH_EJECT_S = 600.0
+RATE_LIMIT_EJECT_S = 30.0
+
+# Floor for the remaining-quota share, so an exhausted key is penalized rather than divided by zero
+MIN_QUOTA_SHARE = 0.05
+
+
+@dataclass
+class Credential:
+    """One API key and the endpoint it is used against."""
+
+    provider: str
+    key: str = field(repr=False)
+    base_url: str
+    weight: float = 1.0
+
+    @property
+    def id(self) -> str:
+        """Short stable identifier, safe for logs and metric labels."""
+        return hashlib.sha256(self.key.encode("utf-8")).hexdigest()[:8]
+
+
+@dataclass
+class _KeyState:
+    latency_s: float | None = None
+    in_flight: int = 0
+    quota_share: float = 1.0
+    ejected_until: float = 0.0
+
+
+def parse_credentials(provider: str, spec: str, single_key: str = "") -> list[Credential]:
+    """Parse a pool setting into credentials.
+
+    Args:
+        provider: "anthropic", "openai" or "google".
+        spec: Comma-separated "key[@base_url][*weight]" entries.
+        single_key: The provider's single-key setting, added if not already listed.
+
+    Returns:
+        Credentials in configuration order.
+    """
+    default_url = DEFAULT_BASE_URLS[provider]
+    credentials: list[Credential] = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        weight = 1.0
+        head, star, tail = entry.rpartition("*")
+        if star:
+            try:
+                weight = float(tail)
+                entry = head
+            except ValueError:
+                pass
+        key, _, base_url = entry.partition("@")
+        if weight <= 0:
+            logger.warning("Ignoring %s credential with non-positive weight", provider)
+            continue
+        credentials.append(Credential(provider, key, (base_url or default_url).rstrip("/"), weight))
+    if single_key and all(c.key != single_key for c in credentials):
+        credentials.insert(0, Credential(provider, single_key, default_url))
+    return credentials
+
+
+class CredentialPool:
+    """Picks a credential per request and learns from each outcome."""
+
+    def __init__(self, provider: str, credentials: list[Credential]) -> None:
+        if not credentials:
+            raise ValueError(MISSING_KEY_ERRORS.get(provider, f"No API key configured for {provider}"))
+        self.provider = provider
+        self.credentials = credentials
+        self._state = {c.id: _KeyState() for c in credentials}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.credentials)
+
+    def _cost(self, credential: Credential) -> float:
+        state = self._state[credential.id]
+        latency = state.latency_s if state.latency_s is not None else INITIAL_LATENCY_S
+        return latency * (state.in_flight + 1) / max(state.quota_share, MIN_QUOTA_SHARE)
+
+    def acquire(self) -> Credential:
+        """Choose a credential for one request and count it as in flight."""
+        with self._lock:
+            now = time.monotonic()
+            live = [c for c in self.credentials if self._state[c.id].ejected_until <= now]
+            if not live:
+                chosen = min(self.credentials, key=lambda c: self._state[c.id].ejected_until)
+            elif len(live) == 1:
+                chosen = live[0]
+            else:
+                weights = [c.weight for c in live]
+                a, b = random.choices(live, weights), random.choices(live, weights)
+                chosen = min(a[0], b[0], key=self._cost)
+            self._state[chosen.id].in_flight += 1
+        metrics.inc("llm_key_requests_total", provider=self.provider, key=chosen.id)
+        return chosen
+
+    def release(self, credential: Credential) -> None:
+        """The request on credential has finished, however it ended."""
+        with self._lock:
+            state = self._state[credential.id]
+            state.in_flight = max(0, state.in_flight - 1)
+
+    def observe(self, credential: Credential, latency_s: float | None = None, headers=None) -> None:
+        """Fold a completed call's latency and rate-limit headers into the key's state."""
+        quotas = parse_rate_limit_headers(self.provider, headers) if headers is not None else {}
+        with self._lock:
+            state = self._state[credential.id]
+            if latency_s is not None:
+                state.latency_s = latency_s if state.latency_s is None else (
+                    EWMA_ALPHA * latency_s + (1 - EWMA_ALPHA) * state.latency_s
+                )
+            shares = [remaining / limit for limit, remaining in quotas.values() if limit > 0]
+            if shares:
+                state.quota_share = min(shares)
+
+    def eject(self, credential: Credential, seconds: float, reason: str) -> None:
+        """Stop choosing credential for seconds (while any other key is available)."""
+        with self._lock:
+            state = self._state[credential.id]
+            state.ejected_until = max(state.ejected_until, time.monotonic() + seconds)
+        metrics.inc("llm_key_ejections_total", provider=self.provider, key=credential.id, reason=reason)
+        logger.warning("Ejecting %s key %s for %.0fs (%s)", self.provider, credential.id, seconds, reason)
+
+    def has_alternative(self, credential: Credential) -> bool:
+        """Whether some other key is currently usable."""
+        with self._lock:
+            now = time.monotonic()
+            return any(c.id != credential.id and self._state[c.id].ejected_until <= now for c in self.credentials)
+
+
+_pools: dict[str, tuple[tuple, CredentialPool]] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(provider: str, spec: str, single_key: str = "") -> CredentialPool:
+    """Return the process-wide pool for provider, rebuilt if its settings changed.
+
+    Args:
+        provider: "anthropic", "openai" or "google".
+        spec: The provider's pool setting (e.g. settings.anthropic_api_keys).
+        single_key: The provider's single-key setting.
+
+    Returns:
+        The CredentialPool.
+
+    Raises:
+        ValueError: If no key is configured for provider.
+    """
+    config = (spec, single_key)
+    with _pools_lock:
+        cached = _pools.get(provider)
+        if cached is not None and cached[0] == config:
+            return cached[1]
+        pool = CredentialPool(provider, parse_credentials(provider, spec, single_key))
+        _pools[provider] = (config, pool)
+        return pool
+
+
+def reset() -> None:
+    """Forget every pool. Intended for tests."""
+    with _pools_lock:
+        _pools.clear()
@@ -0,0 +1,121 @@
+"""Hedged requests — race a second call against one that is running slow.
+
+If the primary call hasn't finished after ``delay`` seconds (the caller
+picks a high latency percentile), a backup call is started. Whichever
+succeeds first wins and the other is cancelled. If one of them fails, the
+other is awaited.
+
+Hedges cost real money, so they draw from a budget. Every call adds
+``ratio`` of a token and every hedge spends a whole one. Over time, hedges
+stay under ``ratio`` of all calls. A short burst can go higher, up to
+``burst`` hedges.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Hedges that may be spent back-to-back once the budget has filled up
+DEFAULT_BURST = 10.0
+
+
+class HedgeBudget:
+    """Token budget capping hedges to a fraction of calls."""
+
+    def __init__(self, ratio: float, burst: float = DEFAULT_BURST) -> None:
+        self.ratio = max(0.0, ratio)
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        """Credit the budget for one primary call."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget if it's there."""
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+async def race(
+    primary: Callable[[], Awaitable[T]],
+    backup: Callable[[], Awaitable[T]],
+    delay: float,
+    may_hedge: Callable[[], bool] = lambda: True,
+    valid: Callable[[T], bool] = lambda result: True,
+) -> tuple[T, bool]:
+    """Run primary, starting backup if it is still running after delay.
+
+    Args:
+        primary: Starts the primary call.
+        backup: Starts the hedge call.
+        delay: Seconds to wait for primary before hedging.
+        may_hedge: Checked once delay has passed. Return False to skip the
+            hedge (e.g. when the budget is spent).
+        valid: Whether a result is good enough to win the race. An invalid
+            result is only returned if nothing better arrives.
+
+    Returns:
+        (result, True if the hedge produced it).
+
+    Raises:
+        Exception: The primary's error, if every call that ran failed.
+    """
+    first = asyncio.ensure_future(primary())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not may_hedge():
+            return await first, False
+
+        second = asyncio.ensure_future(backup())
+        tasks.append(second)
+        fallback: tuple[T, bool] | None = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task not in done or task.exception() is not None:
+                    continue
+                if valid(task.result()):
+                    return task.result(), task is second
+                fallback = fallback or (task.result(), task is second)
+        if fallback is not None:
+            return fallback
+        # Both failed; the primary's error is the one worth reporting
+        second.exception()
+        raise first.exception()  # type: ignore[misc]
+    finally:
+        losers = [task for task in tasks if not task.done()]
+        for task in losers:
+            task.cancel()
+        # Let the losers unwind (release slots, account their usage) before the winner is used
+        await asyncio.gather(*losers, return_exceptions=True)
+
+
+_budget: HedgeBudget | None = None
+
+
+def get_budget(ratio: float) -> HedgeBudget:
+    """Return the process-wide hedge budget, (re)built if ratio changed."""
+    global _budget
+    if _budget is None or _budget.ratio != max(0.0, ratio):
+        _budget = HedgeBudget(ratio)
+    return _budget
+
+
+def reset() -> None:
+    """Forget the hedge budget. Intended for tests."""
+    global _budget
+    _budget = None
@@ -0,0 +1,145 @@
+"""Shared outbound HTTP clients — one pooled, long-lived httpx.AsyncClient per upstream.
+
+Every LLM call, Pl@ntNet upload, result POST and geocode used to open its own
+client (or session) and pay DNS + TCP + TLS on each request and retry. Clients here
+keep connections alive across jobs, negotiate HTTP/2 where the server
+supports it, and are sized from the consumer's concurrency. run_consumer()
+configures the registry at startup and closes it on shutdown; scripts and
+tests get lazily created clients with default limits.
+
+LoopRedis does the same for the Redis-backed stores (LLM cache, rate
+limiter, spend): one client per event loop, with the stale one closed when
+the loop changes.
+"""
+
+import asyncio
+import importlib.util
+import logging
+
+import httpx
+import redis.asyncio as aioredis
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upstreams with a dedicated pool
+UPSTREAMS = ("anthropic", "openai", "google", "plantnet", "nominatim", "internal_api")
+
+# Each job fans out to at most this many concurrent calls to one upstream
+CALLS_PER_JOB = 5
+
+_limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+
+# upstream → (owning event loop, client); a client is only reused on the loop that created it
+_clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+
+def http2_available() -> bool:
+    """True if the optional h2 package is installed (httpx[http2])."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def configure(max_jobs: int) -> httpx.Limits:
+    """Size connection pools for the given job concurrency ceiling.
+
+    Must be called before clients are created (i.e. at consumer startup).
+
+    Args:
+        max_jobs: Highest number of jobs this process may run at once.
+
+    Returns:
+        The limits applied to every pool.
+    """
+    global _limits
+    max_connections = max(1, max_jobs) * CALLS_PER_JOB
+    _limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_s,
+    )
+    logger.info(
+        "HTTP pools: max_connections=%d per upstream, keepalive=%.0fs, http2=%s",
+        max_connections, settings.http_keepalive_expiry_s, settings.http2_enabled and http2_available(),
+    )
+    return _limits
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    """Return the pooled client for an upstream, creating it on first use.
+
+    Args:
+        upstream: One of UPSTREAMS (unknown names get their own pool too).
+
+    Returns:
+        A long-lived httpx.AsyncClient. Callers pass per-request timeouts.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(upstream)
+    if entry is not None:
+        owner, client = entry
+        if owner is loop and not client.is_closed:
+            return client
+
+    http2 = settings.http2_enabled and http2_available()
+    client = httpx.AsyncClient(http2=http2, limits=_limits)
+    _clients[upstream] = (loop, client)
+    logger.debug("Created HTTP client for %s (http2=%s)", upstream, http2)
+    return client
+
+
+async def close_all() -> None:
+    """Close every pooled client. Called once on consumer shutdown."""
+    entries = list(_clients.items())
+    _clients.clear()
+    for upstream, (_loop, client) in entries:
+        try:
+            await client.aclose()
+        except Exception:
+            logger.warning("Error closing HTTP client for %s", upstream, exc_info=True)
+    if entries:
+        logger.info("Closed %d HTTP client(s)", len(entries))
+
+
+class LoopRedis:
+    """A Redis client for REDIS_URL, bound to the event loop that uses it.
+
+    redis.asyncio connections belong to the loop that opened them. Used from
+    another loop (each asyncio.run() in scripts and tests), the client is
+    replaced and the old one is closed in the background, so its connection
+    pool isn't leaked.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name  # for log messages
+        self._entry: tuple[asyncio.AbstractEventLoop, aioredis.Redis] | None = None
+        self._closing: set[asyncio.Task] = set()
+
+    def get(self) -> aioredis.Redis:
+        """Return the client for the running loop, creating it on first use there."""
+        loop = asyncio.get_running_loop()
+        if self._entry is not None:
+            owner, client = self._entry
+            if owner is loop:
+                return client
+            if not owner.is_closed() and owner.is_running():
+                asyncio.run_coroutine_threadsafe(self._close(client), owner)
+            else:
+                task = loop.create_task(self._close(client))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+        client = aioredis.Redis.from_url(settings.redis_url)
+        self._entry = (loop, client)
+        return client
+
+    async def close(self) -> None:
+        """Close the current client, if one was opened."""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            await self._close(entry[1])
+
+    async def _close(self, client: aioredis.Redis) -> None:
+        try:
+            await client.aclose()
+        except Exception:
+            logger.warning("Error closing %s Redis client", self.name, exc_info=True)
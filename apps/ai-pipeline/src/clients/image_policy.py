@@ -0,0 +1,156 @@
+"""Per-provider, per-analyzer image policy — resolution, crop and detail level.
+
+Providers bill and process images differently: Anthropic scales anything past
+~1.15 MP down and charges ~w*h/750 tokens, OpenAI scales the short side to
+768px and bills 512px tiles (or a flat 85 tokens at detail=low), Gemini bills
+768px tiles. Analyzers need different amounts of detail too — a bark closeup
+for species ID needs far more pixels than the wide shot used to judge the
+site. The table below picks the smallest image that still serves each
+(provider, analyzer, photo_type), and the estimator reports what it costs.
+"""
+
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from src.utils.images import MAX_IMAGE_DIMENSION, PreparedPhoto
+
+ANY = "*"
+
+# Analyzers that send photos to the LLM (keys of the policy table)
+ANALYZERS = ("species", "health", "site", "measurements", "fused")
+
+
+@dataclass(frozen=True)
+class ImagePolicy:
+    """How one photo is sent to one provider for one analyzer."""
+
+    max_dim: int = MAX_IMAGE_DIMENSION
+    crop: float = 1.0  # fraction of each side kept around the centre
+    detail: str = "auto"  # OpenAI image detail: "low", "high" or "auto"; ignored elsewhere
+
+    @property
+    def tag(self) -> str:
+        """Short identity for cache keys."""
+        return f"{self.max_dim}/{self.crop:g}/{self.detail}"
+
+
+DEFAULT_POLICY = ImagePolicy()
+
+# (provider, analyzer, photo_type) → policy; ANY matches everything. Most
+# specific match wins: exact > analyzer only > photo type only > provider.
+POLICIES: dict[tuple[str, str, str], ImagePolicy] = {
+    # Anthropic — past ~1.15 MP images are downscaled server-side; 1232px keeps 4:3 just under (1232x924)
+    ("anthropic", ANY, ANY): ImagePolicy(max_dim=1232),
+    ("anthropic", "site", ANY): ImagePolicy(max_dim=1024),
+    ("anthropic", "site", "bark_closeup"): ImagePolicy(max_dim=768),
+    ("anthropic", "measurements", ANY): ImagePolicy(max_dim=1024),
+    ("anthropic", "measurements", "bark_closeup"): ImagePolicy(max_dim=768),
+    ("anthropic", ANY, "bark_closeup"): ImagePolicy(max_dim=1232, crop=0.8),
+    # OpenAI — the short side is scaled to 768px server-side, so 1024px covers 4:3 in full
+    ("openai", ANY, ANY): ImagePolicy(max_dim=1024, detail="high"),
+    ("openai", "site", ANY): ImagePolicy(max_dim=512, detail="low"),
+    ("openai", "measurements", "bark_closeup"): ImagePolicy(max_dim=512, detail="low"),
+    ("openai", ANY, "bark_closeup"): ImagePolicy(max_dim=1024, crop=0.8, detail="high"),
+    # Gemini — 768px tiles; 1536px is 2x2 tiles for a 4:3 photo
+    ("google", ANY, ANY): ImagePolicy(max_dim=1536),
+    ("google", "site", ANY): ImagePolicy(max_dim=768),
+    ("google", "measurements", "bark_closeup"): ImagePolicy(max_dim=768),
+    ("google", ANY, "bark_closeup"): ImagePolicy(max_dim=1536, crop=0.8),
+}
+
+
+def resolve_policy(provider: str, analyzer: str | None, photo_type: str) -> ImagePolicy:
+    """Find the most specific policy for a photo.
+
+    Args:
+        provider: LLM provider name.
+        analyzer: Analyzer making the call, or None for the provider default.
+        photo_type: Photo type (full_tree_angle1, bark_closeup, ...).
+
+    Returns:
+        The matching ImagePolicy, or DEFAULT_POLICY for unknown providers.
+    """
+    analyzer = analyzer or ANY
+    for key in (
+        (provider, analyzer, photo_type),
+        (provider, analyzer, ANY),
+        (provider, ANY, photo_type),
+        (provider, ANY, ANY),
+    ):
+        policy = POLICIES.get(key)
+        if policy is not None:
+            return policy
+    return DEFAULT_POLICY
+
+
+def encode_variants(provider: str, photo_type: str, shared_prefix: bool = False) -> list[tuple[int, float]]:
+    """(max_dim, crop) encodes the analyzers will request for a photo.
+
+    Args:
+        provider: LLM provider name.
+        photo_type: Photo type.
+        shared_prefix: Every analyzer uses the provider default (prompt caching).
+
+    Returns:
+        Distinct (max_dim, crop) pairs, for PreparedPhoto.warm().
+    """
+    analyzers: Sequence[str | None] = (None,) if shared_prefix else ANALYZERS
+    policies = {resolve_policy(provider, a, photo_type) for a in analyzers}
+    return sorted({(p.max_dim, p.crop) for p in policies})
+
+
+def estimate_image_tokens(provider: str, width: int, height: int, detail: str = "auto") -> int:
+    """Estimate input tokens for one image of the given (already fitted) size.
+
+    Args:
+        provider: LLM provider name.
+        width: Width in pixels as sent.
+        height: Height in pixels as sent.
+        detail: OpenAI detail level.
+
+    Returns:
+        Approximate token count.
+    """
+    if provider == "openai":
+        if detail == "low":
+            return 85
+        # Fit in 2048x2048, then scale the short side down to 768
+        scale = min(1.0, 2048 / max(width, height))
+        w, h = width * scale, height * scale
+        scale = min(1.0, 768 / min(w, h))
+        w, h = w * scale, h * scale
+        return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+    if provider == "google":
+        if width <= 384 and height <= 384:
+            return 258
+        return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+    # Anthropic (and the default): ~w*h/750, capped where the API downscales
+    return min(math.ceil(width * height / 750), 1600)
+
+
+def estimate_request_image_tokens(
+    provider: str,
+    photos: Sequence[PreparedPhoto],
+    analyzer: str | None = None,
+) -> int:
+    """Estimate image input tokens for one request under the policy table.
+
+    Undecodable photos are skipped — they are sent as-is and the provider
+    decides what they cost.
+
+    Args:
+        provider: LLM provider name.
+        photos: Photos in the request.
+        analyzer: Analyzer making the call.
+
+    Returns:
+        Approximate total image tokens.
+    """
+    total = 0
+    for photo in photos:
+        policy = resolve_policy(provider, analyzer, photo.photo_type)
+        size = photo.fitted_size(policy.max_dim, policy.crop)
+        if size is not None:
+            total += estimate_image_tokens(provider, *size, detail=policy.detail)
+    return total
@@ -0,0 +1,115 @@
+"""Streamed JSON request bodies with zero-copy base64 image segments.
+
+LLM payloads are mostly base64 image data. Handing httpx a dict means
+json.dumps builds another full copy of every image (and OpenAI's data URLs
+were an f-string copy before that). Payload builders instead put a
+Base64Segment where an image string goes; JSONBody serializes everything
+else normally and yields the memoized base64 bytes as-is between the
+quotes, so a request costs one copy of the images — the one already
+held by PreparedPhoto.
+"""
+
+import json
+from collections.abc import Iterator
+from typing import Any
+
+
+class Base64Segment:
+    """A JSON string made of an ASCII prefix and pre-encoded base64 bytes.
+
+    Base64 (and the data-URL prefixes we use) contain no characters JSON
+    needs escaped, so both parts are written straight into the body.
+    """
+
+    __slots__ = ("prefix", "data")
+
+    def __init__(self, data: bytes, prefix: str = "") -> None:
+        self.data = data
+        self.prefix = prefix
+
+    def __len__(self) -> int:
+        return len(self.prefix) + len(self.data)
+
+    def __str__(self) -> str:
+        return self.prefix + self.data.decode("ascii")
+
+    def __repr__(self) -> str:
+        return f"Base64Segment(prefix={self.prefix!r}, bytes={len(self.data)})"
+
+
+def iter_json(obj: Any) -> Iterator[bytes | memoryview]:
+    """Serialize obj as compact JSON, yielding Base64Segment data without copying.
+
+    Args:
+        obj: JSON-compatible value that may contain Base64Segments.
+
+    Yields:
+        Byte chunks whose concatenation is the JSON document.
+    """
+    if isinstance(obj, Base64Segment):
+        yield b'"' + obj.prefix.encode("ascii")
+        yield memoryview(obj.data)
+        yield b'"'
+    elif isinstance(obj, dict):
+        yield b"{"
+        for i, (key, value) in enumerate(obj.items()):
+            yield (b"," if i else b"") + json.dumps(str(key)).encode("utf-8") + b":"
+            yield from iter_json(value)
+        yield b"}"
+    elif isinstance(obj, (list, tuple)):
+        yield b"["
+        for i, value in enumerate(obj):
+            if i:
+                yield b","
+            yield from iter_json(value)
+        yield b"]"
+    else:
+        yield json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def materialize(obj: Any) -> Any:
+    """Copy of obj with Base64Segments turned into plain strings (logging, tests)."""
+    if isinstance(obj, Base64Segment):
+        return str(obj)
+    if isinstance(obj, dict):
+        return {k: materialize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [materialize(v) for v in obj]
+    return obj
+
+
+class JSONBody:
+    """application/json request body streamed from a payload with Base64Segments.
+
+    Framing is rendered once up front (small runs of punctuation and text
+    are merged); image bytes are yielded as memoryviews of the memoized
+    base64. Iterating again restarts the stream, so retries re-send the same
+    object.
+    """
+
+    def __init__(self, payload: Any) -> None:
+        self.payload = payload
+        self._chunks: list[bytes | memoryview] = []
+        pending = bytearray()
+        for chunk in iter_json(payload):
+            if isinstance(chunk, memoryview):
+                if pending:
+                    self._chunks.append(bytes(pending))
+                    pending.clear()
+                self._chunks.append(chunk)
+            else:
+                pending += chunk
+        if pending:
+            self._chunks.append(bytes(pending))
+        self.content_length = sum(len(c) for c in self._chunks)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"Content-Length": str(self.content_length)}
+
+    def __bytes__(self) -> bytes:
+        return b"".join(self._chunks)
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
@@ -5,22 +5,46 @@ Provider abstraction allows swapping between Claude, GPT-4o, and Gemini via conf
 """
 
 import asyncio
-import base64
-import io
 import json
 import logging
+import time
+from collections.abc import Awaitable, Callable, Sequence
 from dataclasses import dataclass
 from typing import Literal
 
 import httpx
-from PIL import Image
 
 from src.config import settings
+from src.clients import hedge, llm_batch, usage
+from src.clients.credentials import (
+    AUTH_EJECT_S,
+    DEFAULT_BASE_URLS,
+    RATE_LIMIT_EJECT_S,
+    Credential,
+    CredentialPool,
+    get_pool,
+)
+from src.clients.http import get_client
+from src.clients.json_body import Base64Segment, JSONBody
+from src.clients.image_policy import ImagePolicy, estimate_request_image_tokens, resolve_policy
+from src.clients.llm_cache import cache_key, get_cache
+from src.clients.llm_stream import read_stream
+from src.clients.rate_limit import get_limiter
+from src.clients.response_schema import ResponseSchema, to_gemini_schema
+from src.clients.routing import parse_route
+from src.utils import bulkhead, latency, metrics, timeouts
+from src.utils.circuit import CircuitOpenError, OPEN, get_breaker
+from src.utils.concurrency import record_upstream
+from src.utils.images import MAX_IMAGE_DIMENSION, EncodedImage, PreparedPhoto, encoding_tag
+from src.utils.jsonscan import scan_json_object
+from src.utils.retry import RetryPolicy, Retrier, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = 60.0
-MAX_RETRIES = 3
+TIMEOUT_POLICY = timeouts.TimeoutPolicy("llm", default_s=DEFAULT_TIMEOUT, floor_s=15.0, ceiling_s=120.0)
+DEFAULT_MAX_TOKENS = 1024
+RETRY_POLICY = RetryPolicy("llm", max_attempts=3, base_delay_s=1.0, max_delay_s=30.0)
 
 Provider = Literal["anthropic", "openai", "google"]
 
@@ -33,9 +57,30 @@ class LLMResponse:
     provider: str
     model: str
     usage: dict | None = None
-
-
-MAX_IMAGE_DIMENSION = 1568  # Anthropic recommended max
+    cache_read_tokens: int = 0  # input tokens served from the provider's prompt cache
+    cache_write_tokens: int = 0  # input tokens written to the provider's prompt cache
+    cache_key: str | None = None  # set when the response went through the LLM cache
+    cached: bool = False  # served from the cache (memory, Redis or a shared in-flight call)
+    ttft_s: float | None = None  # time to first token (streaming mode only)
+    generation_s: float | None = None  # first token → last token read (streaming mode only)
+
+    @property
+    def input_tokens(self) -> int | None:
+        """Billed input tokens from the provider's usage block, if reported."""
+        return self._usage_count(("input_tokens", "prompt_tokens", "promptTokenCount"))
+
+    @property
+    def output_tokens(self) -> int | None:
+        """Generated output tokens from the provider's usage block, if reported."""
+        return self._usage_count(("output_tokens", "completion_tokens", "candidatesTokenCount"))
+
+    def _usage_count(self, names: tuple[str, ...]) -> int | None:
+        # Anthropic, OpenAI and Gemini spell the same counter differently
+        for name in names:
+            value = (self.usage or {}).get(name)
+            if isinstance(value, int):
+                return value
+        return None
 
 
 def _resize_image(image_bytes: bytes, max_dim: int = MAX_IMAGE_DIMENSION) -> bytes:
@@ -43,19 +88,7 @@ def _resize_image(image_bytes: bytes, max_dim: int = MAX_IMAGE_DIMENSION) -> byt
 
     Returns JPEG bytes (re-encoded if resized, original if already small enough).
     """
-    img = Image.open(io.BytesIO(image_bytes))
-    w, h = img.size
-    if w <= max_dim and h <= max_dim:
-        return image_bytes
-    scale = min(max_dim / w, max_dim / h)
-    new_w, new_h = int(w * scale), int(h * scale)
-    img = img.resize((new_w, new_h), Image.LANCZOS)
-    if img.mode in ("RGBA", "P"):
-        img = img.convert("RGB")
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=85)
-    logger.debug("Resized image from %dx%d to %dx%d (%d→%d bytes)", w, h, new_w, new_h, len(image_bytes), buf.tell())
-    return buf.getvalue()
+    return PreparedPhoto(image_bytes).encoded(max_dim, "image/jpeg")
 
 
 def _encode_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> str:
@@ -68,80 +101,176 @@ def _encode_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> str:
     Returns:
         Base64-encoded string.
     """
-    resized = _resize_image(image_bytes)
-    return base64.b64encode(resized).decode("utf-8")
+    return PreparedPhoto(image_bytes, mime_type=mime_type).base64()
+
+
+LLMImages = Sequence[PreparedPhoto | tuple[bytes, str]]
+
+
+def _as_llm_images(images: LLMImages) -> list[PreparedPhoto]:
+    """Normalize query images: (image_bytes, mime_type) tuples or PreparedPhotos."""
+    return [
+        img if isinstance(img, PreparedPhoto) else PreparedPhoto(img[0], mime_type=img[1])
+        for img in images
+    ]
+
+
+def _policy_image(photo: PreparedPhoto, provider: str, analyzer: str | None) -> tuple[EncodedImage, ImagePolicy]:
+    """A photo encoded for upload under the (provider, analyzer, photo_type) policy."""
+    policy = resolve_policy(provider, analyzer, photo.photo_type)
+    return photo.for_llm(policy.max_dim, policy.crop), policy
 
 
 def _build_anthropic_payload(
     prompt: str,
-    images: list[tuple[bytes, str]],
+    images: LLMImages,
     model: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache_images: bool = False,
+    analyzer: str | None = None,
 ) -> dict:
     """Build Anthropic Messages API payload.
 
     Args:
         prompt: Text prompt.
-        images: List of (image_bytes, mime_type) tuples.
+        images: PreparedPhotos or (image_bytes, mime_type) tuples.
         model: Model name (e.g. claude-sonnet-4-5-20250929).
+        max_tokens: Output token limit.
+        cache_images: Put a cache_control breakpoint on the last image so the
+            image prefix is cached and reused by later calls with the same photos.
+        analyzer: Analyzer making the call; selects the image policy.
 
     Returns:
-        Request payload dict.
+        Request payload dict, image data as Base64Segments (send via JSONBody).
     """
     content: list[dict] = []
 
-    for img_bytes, mime_type in images:
+    for photo in _as_llm_images(images):
+        encoded, _ = _policy_image(photo, "anthropic", analyzer)
         content.append({
             "type": "image",
             "source": {
                 "type": "base64",
-                "media_type": mime_type or "image/jpeg",
-                "data": _encode_image(img_bytes, mime_type),
+                "media_type": encoded.mime_type,
+                "data": Base64Segment(encoded.base64),
             },
         })
 
+    if cache_images and content:
+        content[-1]["cache_control"] = {"type": "ephemeral"}
+
     content.append({"type": "text", "text": prompt})
 
     return {
         "model": model,
-        "max_tokens": 1024,
+        "max_tokens": max_tokens,
         "messages": [{"role": "user", "content": content}],
     }
 
 
 def _build_openai_payload(
     prompt: str,
-    images: list[tuple[bytes, str]],
+    images: LLMImages,
     model: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    analyzer: str | None = None,
 ) -> dict:
     """Build OpenAI Chat Completions API payload.
 
     Args:
         prompt: Text prompt.
-        images: List of (image_bytes, mime_type) tuples.
+        images: PreparedPhotos or (image_bytes, mime_type) tuples.
         model: Model name (e.g. gpt-4o).
+        max_tokens: Output token limit.
+        analyzer: Analyzer making the call; selects the image policy.
 
     Returns:
-        Request payload dict.
+        Request payload dict, image data as Base64Segments (send via JSONBody).
     """
     content: list[dict] = []
 
-    for img_bytes, mime_type in images:
-        b64 = _encode_image(img_bytes, mime_type)
-        mt = mime_type or "image/jpeg"
+    for photo in _as_llm_images(images):
+        encoded, policy = _policy_image(photo, "openai", analyzer)
         content.append({
             "type": "image_url",
-            "image_url": {"url": f"data:{mt};base64,{b64}"},
+            "image_url": {
+                "url": Base64Segment(encoded.base64, prefix=f"data:{encoded.mime_type};base64,"),
+                "detail": policy.detail,
+            },
         })
 
     content.append({"type": "text", "text": prompt})
 
     return {
         "model": model,
-        "max_tokens": 1024,
+        "max_tokens": max_tokens,
         "messages": [{"role": "user", "content": content}],
     }
 
 
+def prompt_caching(provider: str) -> bool:
+    """Whether the shared image prefix is cached at provider (LLM_PROMPT_CACHING).
+
+    Anthropic's cache prefix is tools → system → messages, and structured
+    output sends each analyzer its own forced tool. No analyzer could read
+    another's cache entry and every call would pay the cache-write premium,
+    so with LLM_STRUCTURED_OUTPUT on, Anthropic calls are sent uncached.
+    """
+    if not settings.llm_prompt_caching:
+        return False
+    return not (provider == "anthropic" and settings.llm_structured_output)
+
+
+def _apply_response_schema(payload: dict, provider: str, schema: ResponseSchema) -> None:
+    """Ask the provider to constrain its output to schema.
+
+    Anthropic gets a single tool it is forced to call, OpenAI a strict
+    json_schema response_format, Gemini a responseSchema. The parsers turn
+    each back into JSON text, so callers still read response.text.
+
+    Args:
+        payload: Request payload from a _build_*_payload function (modified in place).
+        provider: LLM provider name.
+        schema: Output schema.
+    """
+    if provider == "anthropic":
+        tool = {"name": schema.name, "input_schema": schema.schema}
+        if schema.description:
+            tool["description"] = schema.description
+        payload["tools"] = [tool]
+        payload["tool_choice"] = {"type": "tool", "name": schema.name}
+    elif provider == "openai":
+        payload["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": schema.name, "schema": schema.schema, "strict": True},
+        }
+    elif provider == "google":
+        payload["generationConfig"]["responseMimeType"] = "application/json"
+        payload["generationConfig"]["responseSchema"] = to_gemini_schema(schema.schema)
+
+
+def _apply_sampling(payload: dict, provider: str, temperature: float | None, stop: Sequence[str]) -> None:
+    """Set temperature and stop sequences in the provider's own fields.
+
+    Args:
+        payload: Request payload from a _build_*_payload function (modified in place).
+        provider: LLM provider name.
+        temperature: Sampling temperature; None keeps the provider default.
+        stop: Stop sequences; empty for none.
+    """
+    if provider == "google":
+        config = payload["generationConfig"]
+        if temperature is not None:
+            config["temperature"] = temperature
+        if stop:
+            config["stopSequences"] = list(stop)
+        return
+    if temperature is not None:
+        payload["temperature"] = temperature
+    if stop:
+        payload["stop_sequences" if provider == "anthropic" else "stop"] = list(stop)
+
+
 def _parse_anthropic_response(data: dict) -> LLMResponse:
     """Parse Anthropic Messages API response.
 
@@ -155,12 +284,18 @@ def _parse_anthropic_response(data: dict) -> LLMResponse:
     for block in data.get("content", []):
         if block.get("type") == "text":
             text_parts.append(block["text"])
+        elif block.get("type") == "tool_use":
+            # Structured output: the forced tool call's input is the result object
+            text_parts.append(json.dumps(block.get("input", {})))
 
+    usage = data.get("usage") or {}
     return LLMResponse(
         text="\n".join(text_parts),
         provider="anthropic",
         model=data.get("model", ""),
         usage=data.get("usage"),
+        cache_read_tokens=usage.get("cache_read_input_tokens") or 0,
+        cache_write_tokens=usage.get("cache_creation_input_tokens") or 0,
     )
 
 
@@ -174,44 +309,65 @@ def _parse_openai_response(data: dict) -> LLMResponse:
         LLMResponse with extracted text.
     """
     choices = data.get("choices", [])
-    text = choices[0]["message"]["content"] if choices else ""
-
+    message = choices[0]["message"] if choices else {}
+    refusal = message.get("refusal")
+    if refusal:
+        # Under a strict json_schema a refusal comes with null content; callers see an unparseable answer
+        logger.warning("OpenAI refused the request: %s", refusal)
+        metrics.inc("llm_refusals_total", provider="openai", model=data.get("model", ""))
+    text = message.get("content") or ""
+
+    usage = data.get("usage") or {}
     return LLMResponse(
         text=text,
         provider="openai",
         model=data.get("model", ""),
         usage=data.get("usage"),
+        # OpenAI caches long prompt prefixes automatically; reads are reported, writes aren't
+        cache_read_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
     )
 
 
+def _google_image_parts(images: LLMImages, analyzer: str | None = None) -> list[dict]:
+    parts = []
+    for photo in _as_llm_images(images):
+        encoded, _ = _policy_image(photo, "google", analyzer)
+        parts.append({"inline_data": {"mime_type": encoded.mime_type, "data": Base64Segment(encoded.base64)}})
+    return parts
+
+
 def _build_google_payload(
     prompt: str,
-    images: list[tuple[bytes, str]],
+    images: LLMImages,
     model: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cached_content: str | None = None,
+    analyzer: str | None = None,
 ) -> dict:
     """Build Google Gemini API payload.
 
     Args:
         prompt: Text prompt.
-        images: List of (image_bytes, mime_type) tuples.
+        images: PreparedPhotos or (image_bytes, mime_type) tuples.
         model: Model name (e.g. gemini-2.0-flash).
+        max_tokens: Output token limit.
+        cached_content: Name of a cachedContents resource already holding the
+            images; when given the images are not sent again.
+        analyzer: Analyzer making the call; selects the image policy.
 
     Returns:
-        Request payload dict.
+        Request payload dict, image data as Base64Segments (send via JSONBody).
     """
-    parts: list[dict] = []
-
-    for img_bytes, mime_type in images:
-        parts.append({
-            "inline_data": {
-                "mime_type": mime_type or "image/jpeg",
-                "data": _encode_image(img_bytes, mime_type),
-            }
-        })
-
+    parts = [] if cached_content else _google_image_parts(images, analyzer)
     parts.append({"text": prompt})
 
-    return {"contents": [{"parts": parts}]}
+    payload: dict = {
+        "contents": [{"role": "user", "parts": parts}],
+        "generationConfig": {"maxOutputTokens": max_tokens},
+    }
+    if cached_content:
+        payload["cachedContent"] = cached_content
+    return payload
 
 
 def _parse_google_response(data: dict) -> LLMResponse:
@@ -229,122 +385,674 @@ def _parse_google_response(data: dict) -> LLMResponse:
         parts = candidates[0].get("content", {}).get("parts", [])
         text = "".join(p.get("text", "") for p in parts)
 
+    usage = data.get("usageMetadata") or {}
     return LLMResponse(
         text=text,
         provider="google",
         model=data.get("modelVersion", ""),
         usage=data.get("usageMetadata"),
+        cache_read_tokens=usage.get("cachedContentTokenCount") or 0,
     )
 
 
 async def query(
     prompt: str,
-    images: list[tuple[bytes, str]] | None = None,
+    images: LLMImages | None = None,
     provider: Provider | None = None,
     model: str | None = None,
-    timeout: float = DEFAULT_TIMEOUT,
+    timeout: float | None = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    analyzer: str | None = None,
+    schema: ResponseSchema | None = None,
+    temperature: float | None = None,
+    stop: Sequence[str] = (),
 ) -> LLMResponse:
     """Send a multimodal query to the configured LLM provider.
 
+    Identical queries (same provider, model, prompt, images and generation
+    settings) are answered from the LLM response cache when it is enabled; concurrent
+    identical queries share one upstream call.
+
+    If the provider/model keeps failing (its circuit is open, or retries
+    run out on timeouts, connection errors, 429s or 5xx), the query moves
+    on to the next LLM_FAILOVER route. An open circuit fails over at once,
+    without waiting for a timeout.
+
+    Each HTTP attempt holds a slot in the provider's bulkhead (and the
+    provider/analyzer one) when LLM_MAX_CONCURRENT_CALLS(_PER_ANALYZER) is
+    set; calls beyond the limit queue instead of opening more connections.
+
+    Tokens and estimated cost are accounted to the current usage ledger
+    (see usage.py). Once a daily or contract budget is nearly spent the
+    query goes to LLM_BUDGET_ROUTE instead of provider/model.
+
     Args:
         prompt: Text prompt to send.
-        images: Optional list of (image_bytes, mime_type) tuples.
+        images: Optional PreparedPhotos or (image_bytes, mime_type) tuples.
         provider: Override provider ("anthropic" or "openai"). Uses settings if None.
         model: Override model name. Uses settings if None.
-        timeout: Request timeout in seconds.
+        timeout: Request timeout in seconds. None derives it per provider/model
+            from observed latency (ADAPTIVE_TIMEOUTS), else DEFAULT_TIMEOUT.
+        max_tokens: Output token limit.
+        analyzer: Calling analyzer ("species", "health", ...); picks the image
+            resolution/crop/detail from the policy table in image_policy.py.
+        schema: Output schema, enforced by the provider when
+            LLM_STRUCTURED_OUTPUT is on; ignored otherwise.
+        temperature: Sampling temperature; None keeps the provider default.
+        stop: Stop sequences.
 
     Returns:
-        LLMResponse with the model's text output.
+        LLMResponse with the model's text output (the JSON document in
+        structured-output mode).
 
     Raises:
         ValueError: If provider is unsupported or API key is missing.
         httpx.HTTPStatusError: If the API returns an error.
+        CircuitOpenError: If the last route's circuit is open.
     """
     prov = provider or settings.llm_provider
     mdl = model or settings.llm_model
-    imgs = images or []
+    scope = await usage.over_budget()
+    if scope is not None:
+        route = parse_route(settings.llm_budget_route)
+        if route is not None and route != (prov, mdl):
+            metrics.inc("llm_budget_downgrades_total", scope=scope.partition(":")[0], analyzer=analyzer or "default")
+            logger.info("LLM budget %s nearly spent, routing %s/%s to %s/%s", scope, prov, mdl, *route)
+            prov, mdl = route
+    imgs = _as_llm_images(images or [])
+    # A provider-cached image prefix must be byte-identical across analyzers
+    image_analyzer = None if prompt_caching(prov) else analyzer
+    if not settings.llm_structured_output:
+        schema = None
+
+    routes = _routes(prov, mdl)
+    for (route_prov, route_mdl), (next_prov, next_mdl) in zip(routes, routes[1:]):
+        try:
+            return await _query_route(
+                prompt, imgs, route_prov, route_mdl, timeout, max_tokens, image_analyzer, schema, analyzer,
+                temperature, stop,
+            )
+        except FAILOVER_ERRORS as e:
+            if not _should_fail_over(e):
+                raise
+            reason = _failover_reason(e)
+            metrics.inc("llm_failovers_total", provider=route_prov, to=next_prov, reason=reason)
+            logger.warning(
+                "LLM %s/%s unavailable (%s), failing over to %s/%s", route_prov, route_mdl, reason, next_prov, next_mdl,
+            )
+    prov, mdl = routes[-1]
+    return await _query_route(
+        prompt, imgs, prov, mdl, timeout, max_tokens, image_analyzer, schema, analyzer, temperature, stop,
+    )
+
+
+async def _query_route(
+    prompt: str,
+    imgs: list[PreparedPhoto],
+    prov: str,
+    mdl: str,
+    timeout: float | None,
+    max_tokens: int,
+    image_analyzer: str | None,
+    schema: ResponseSchema | None,
+    analyzer: str | None = None,
+    temperature: float | None = None,
+    stop: Sequence[str] = (),
+) -> LLMResponse:
+    """Query one provider/model, through the LLM response cache when it is enabled."""
+
+    async def upstream(call_prov: str, call_mdl: str) -> LLMResponse:
+        # Recorded per call, so a hedge that completes but loses the race is paid for too
+        result = await _query_upstream(
+            prompt, imgs, call_prov, call_mdl, timeout, max_tokens, image_analyzer, schema, caller=analyzer,
+            temperature=temperature, stop=stop,
+        )
+        await usage.record(result, call_prov, call_mdl, analyzer, len(imgs))
+        return result
+
+    async def fetch() -> LLMResponse:
+        session = llm_batch.current(prov)
+        if session is None:
+            return await _query_hedged(upstream, prov, mdl, analyzer)
+        result = await _query_batched(
+            session, prompt, imgs, prov, mdl, max_tokens, image_analyzer, schema, temperature, stop,
+        )
+        await usage.record(result, prov, mdl, analyzer, len(imgs), batched=True)
+        return result
+
+    cache = get_cache()
+    if cache is None:
+        return await fetch()
+
+    key = cache_key(
+        prov, mdl, prompt, _image_identities(imgs, prov, image_analyzer), max_tokens,
+        schema=schema.schema if schema else None, temperature=temperature, stop=stop,
+    )
+
+    async def _call() -> bytes:
+        return _serialize_response(await fetch())
+
+    value, source = await cache.get_or_call(key, _call)
+    result = _deserialize_response(value)
+    result.cache_key = key
+    result.cached = source != "upstream"
+    if result.cached:
+        logger.info("LLM response served from cache (%s, provider=%s, model=%s)", source, prov, mdl)
+        await usage.record(result, prov, mdl, analyzer, len(imgs))
+    return result
+
+
+async def _query_hedged(
+    upstream: Callable[[str, str], Awaitable[LLMResponse]],
+    prov: str,
+    mdl: str,
+    analyzer: str | None,
+) -> LLMResponse:
+    """Call upstream(prov, mdl), hedging it when LLM_HEDGING is on and the call runs slow.
+
+    Every completed call feeds the latency window for its provider and
+    analyzer. A hedge starts once the primary has run past
+    LLM_HEDGE_PERCENTILE of that window. It goes to LLM_HEDGE_ROUTE, or to
+    the same provider/model when that is empty. The first response holding
+    a JSON object wins.
+    """
+    label = analyzer or "default"
+
+    async def timed(call_prov: str, call_mdl: str) -> LLMResponse:
+        started = time.monotonic()
+        result = await upstream(call_prov, call_mdl)
+        latency.get_window(f"{call_prov}/{label}").add(time.monotonic() - started)
+        return result
+
+    if not settings.llm_hedging:
+        return await timed(prov, mdl)
+    budget = hedge.get_budget(settings.llm_hedge_budget_pct / 100)
+    budget.record_call()
+    delay = latency.get_window(f"{prov}/{label}").percentile(
+        settings.llm_hedge_percentile, settings.llm_hedge_min_samples,
+    )
+    if delay is None:
+        return await timed(prov, mdl)
+    hedge_prov, hedge_mdl = parse_route(settings.llm_hedge_route) or (prov, mdl)
+    hedged = False
+
+    def may_hedge() -> bool:
+        nonlocal hedged
+        hedged = budget.try_spend()
+        if hedged:
+            logger.info("LLM %s/%s slower than %.1fs, hedging to %s/%s", prov, mdl, delay, hedge_prov, hedge_mdl)
+            return True
+        metrics.inc("llm_hedges_total", provider=prov, analyzer=label, outcome="over_budget")
+        return False
+
+    result, hedge_won = await hedge.race(
+        lambda: timed(prov, mdl),
+        lambda: timed(hedge_prov, hedge_mdl),
+        delay,
+        may_hedge,
+        valid=lambda response: scan_json_object(response.text) is not None,
+    )
+    if hedged:
+        metrics.inc("llm_hedges_total", provider=prov, analyzer=label, outcome="won" if hedge_won else "lost")
+    return result
+
+
+# Errors after which query() moves on to the next route in LLM_FAILOVER
+FAILOVER_ERRORS = (CircuitOpenError, httpx.TimeoutException, httpx.RequestError, httpx.HTTPStatusError)
+
+
+def _routes(prov: str, mdl: str) -> list[tuple[str, str]]:
+    """The requested provider/model followed by the configured failover routes, without repeats."""
+    routes = [(prov, mdl)]
+    for entry in settings.llm_failover.split(","):
+        route = parse_route(entry)
+        if route is not None and route not in routes:
+            routes.append(route)
+    return routes
+
+
+def _should_fail_over(error: Exception) -> bool:
+    # Other 4xx mean the request itself is wrong; another provider won't fix it
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return True
+
+
+def _failover_reason(error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.HTTPStatusError):
+        return str(error.response.status_code)
+    return "connection"
+
+
+async def discard_cached(response: LLMResponse) -> None:
+    """Drop a response from the LLM cache so the next identical query goes upstream.
 
+    Analyzers call this when a response fails to parse, so a retried job
+    doesn't keep getting the same unusable answer.
+
+    Args:
+        response: A response returned by query().
+    """
+    cache = get_cache()
+    if cache is not None and response.cache_key:
+        await cache.discard(response.cache_key)
+
+
+def _image_identities(imgs: list[PreparedPhoto], provider: str, analyzer: str | None) -> list[str]:
+    """Photo digest plus the policy and encoding it's sent under — what the provider actually sees."""
+    encoding = encoding_tag()
+    return [
+        f"{img.digest}@{resolve_policy(provider, analyzer, img.photo_type).tag}/{encoding}"
+        for img in imgs
+    ]
+
+
+def _serialize_response(response: LLMResponse) -> bytes:
+    return json.dumps({
+        "text": response.text,
+        "provider": response.provider,
+        "model": response.model,
+        "usage": response.usage,
+        "cache_read_tokens": response.cache_read_tokens,
+        "cache_write_tokens": response.cache_write_tokens,
+        "ttft_s": response.ttft_s,
+        "generation_s": response.generation_s,
+    }).encode("utf-8")
+
+
+def _deserialize_response(value: bytes) -> LLMResponse:
+    data = json.loads(value)
+    return LLMResponse(
+        text=data["text"],
+        provider=data["provider"],
+        model=data["model"],
+        usage=data.get("usage"),
+        cache_read_tokens=data.get("cache_read_tokens", 0),
+        cache_write_tokens=data.get("cache_write_tokens", 0),
+        ttft_s=data.get("ttft_s"),
+        generation_s=data.get("generation_s"),
+    )
+
+
+GEMINI_CACHE_URL = f"{DEFAULT_BASE_URLS['google']}/v1beta/cachedContents"
+
+# Stop using a cachedContents resource this long before its server-side expiry
+GEMINI_CACHE_EXPIRY_MARGIN_S = 30.0
+
+# prefix key → (cachedContents name or None if the prefix can't be cached, local expiry)
+_gemini_contexts: dict[str, tuple[str | None, float]] = {}
+_gemini_pending: dict[str, asyncio.Future] = {}
+
+
+def _gemini_prefix_key(model: str, imgs: list[PreparedPhoto], analyzer: str | None, credential: Credential) -> str:
+    # Resources live in the key's project, so each key caches its own copy
+    return cache_key(f"google@{credential.id}", model, "", _image_identities(imgs, "google", analyzer), 0)
+
+
+async def _gemini_cached_content(
+    imgs: list[PreparedPhoto],
+    model: str,
+    credential: Credential,
+    timeout: float,
+    analyzer: str | None = None,
+) -> tuple[str | None, int]:
+    """Get (or create) a Gemini cachedContents resource holding these images.
+
+    The first analyzer call for an observation creates it; the others
+    reference it by name instead of re-sending the photos. Concurrent
+    callers share one creation. If Gemini refuses (e.g. the prefix is below
+    the model's minimum cacheable size) the prefix is remembered as
+    uncacheable until the TTL passes and callers send images inline.
+
+    Args:
+        imgs: Photos forming the shared prefix.
+        model: Gemini model name.
+        credential: Google API key and endpoint.
+        timeout: Request timeout in seconds.
+        analyzer: Image policy analyzer (None for the shared provider default).
+
+    Returns:
+        (resource name or None, tokens written to the cache by this call).
+    """
+    key = _gemini_prefix_key(model, imgs, analyzer, credential)
+    entry = _gemini_contexts.get(key)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0], 0
+
+    pending = _gemini_pending.get(key)
+    if pending is not None:
+        name = await asyncio.shield(pending)
+        return name, 0
+
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _gemini_pending[key] = future
+    name: str | None = None
+    written = 0
+    ttl = settings.llm_prompt_cache_ttl_s
+    try:
+        client = get_client("google")
+        body = JSONBody({
+            "model": f"models/{model}",
+            "contents": [{"role": "user", "parts": _google_image_parts(imgs, analyzer)}],
+            "ttl": f"{ttl}s",
+        })
+        response = await client.post(
+            f"{credential.base_url}/v1beta/cachedContents?key={credential.key}",
+            headers={"Content-Type": "application/json", **body.headers},
+            content=body,
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        name = data["name"]
+        written = (data.get("usageMetadata") or {}).get("totalTokenCount") or 0
+        logger.info("Created Gemini context cache %s (%d images, %d tokens)", name, len(imgs), written)
+    except asyncio.CancelledError:
+        _gemini_pending.pop(key, None)
+        future.set_result(None)
+        raise
+    except Exception as e:
+        logger.info("Gemini context cache unavailable, sending images inline: %s", e)
+
+    now = time.monotonic()
+    for stale in [k for k, (_, expires) in _gemini_contexts.items() if expires <= now]:
+        del _gemini_contexts[stale]
+    _gemini_contexts[key] = (name, now + ttl - GEMINI_CACHE_EXPIRY_MARGIN_S)
+    _gemini_pending.pop(key, None)
+    future.set_result(name)
+    return name, written
+
+
+def _credential_pool(prov: str) -> CredentialPool:
+    """The key pool for prov, from its *_API_KEYS pool setting and single *_API_KEY."""
+    return get_pool(prov, getattr(settings, f"{prov}_api_keys"), getattr(settings, f"{prov}_api_key"))
+
+
+def _endpoint(prov: str, mdl: str, credential: Credential, streaming: bool) -> tuple[str, dict[str, str]]:
+    """URL and auth headers for one request with credential."""
     if prov == "anthropic":
-        api_key = settings.anthropic_api_key
-        if not api_key:
-            raise ValueError("Anthropic API key is required (set ANTHROPIC_API_KEY)")
-        url = "https://api.anthropic.com/v1/messages"
-        headers = {
-            "x-api-key": api_key,
+        return f"{credential.base_url}/v1/messages", {
+            "x-api-key": credential.key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
         }
-        payload = _build_anthropic_payload(prompt, imgs, mdl)
-        parse_fn = _parse_anthropic_response
-
-    elif prov == "openai":
-        api_key = settings.openai_api_key
-        if not api_key:
-            raise ValueError("OpenAI API key is required (set OPENAI_API_KEY)")
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
+    if prov == "openai":
+        return f"{credential.base_url}/v1/chat/completions", {
+            "Authorization": f"Bearer {credential.key}",
             "Content-Type": "application/json",
         }
-        payload = _build_openai_payload(prompt, imgs, mdl)
-        parse_fn = _parse_openai_response
+    method = "streamGenerateContent?alt=sse&" if streaming else "generateContent?"
+    return (
+        f"{credential.base_url}/v1beta/models/{mdl}:{method}key={credential.key}",
+        {"Content-Type": "application/json"},
+    )
 
-    elif prov == "google":
-        api_key = settings.google_api_key
-        if not api_key:
-            raise ValueError("Google API key is required (set GOOGLE_API_KEY)")
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{mdl}:generateContent?key={api_key}"
-        headers = {"Content-Type": "application/json"}
-        payload = _build_google_payload(prompt, imgs, mdl)
-        parse_fn = _parse_google_response
 
-    else:
+async def _query_upstream(
+    prompt: str,
+    imgs: list[PreparedPhoto],
+    prov: str,
+    mdl: str,
+    timeout: float | None,
+    max_tokens: int,
+    analyzer: str | None = None,
+    schema: ResponseSchema | None = None,
+    caller: str | None = None,
+    temperature: float | None = None,
+    stop: Sequence[str] = (),
+) -> LLMResponse:
+    """Send one query to the provider, retrying transient failures.
+
+    analyzer picks the image policy (None when provider prompt caching needs
+    one shared image prefix). caller is always the calling analyzer and
+    scopes its bulkhead.
+    """
+    cache_write_tokens = 0
+    streaming = settings.llm_streaming
+    if prov not in DEFAULT_BASE_URLS:
         raise ValueError(f"Unsupported LLM provider: {prov}")
+    pool = _credential_pool(prov)
+
+    if prov == "anthropic":
+        payload = _build_anthropic_payload(
+            prompt, imgs, mdl, max_tokens, cache_images=prompt_caching("anthropic"), analyzer=analyzer,
+        )
+        parse_fn = _parse_anthropic_response
+    elif prov == "openai":
+        payload = _build_openai_payload(prompt, imgs, mdl, max_tokens, analyzer=analyzer)
+        parse_fn = _parse_openai_response
+    else:
+        # Built per key: a Gemini cachedContents resource belongs to the key's project
+        payload = None
+        parse_fn = _parse_google_response
+
+    def request_body(payload: dict) -> JSONBody:
+        _apply_sampling(payload, prov, temperature, stop)
+        if schema is not None:
+            _apply_response_schema(payload, prov, schema)
+        if streaming and prov == "anthropic":
+            payload["stream"] = True
+        elif streaming and prov == "openai":
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return JSONBody(payload)
+
+    shared_body = request_body(payload) if payload is not None else None
+    google_bodies: dict[str, JSONBody] = {}
+
+    image_tokens = estimate_request_image_tokens(prov, imgs, analyzer)
+    metrics.inc("llm_image_tokens_estimated_total", image_tokens, provider=prov, analyzer=analyzer or "default")
+    # ~4 characters per text token is close enough for reserving rate-limit capacity
+    input_estimate = image_tokens + len(prompt) // 4
+    limiter = get_limiter()
+    breaker = get_breaker(
+        f"{prov}/{mdl}", settings.llm_circuit_failure_threshold, settings.llm_circuit_reset_s,
+    )
+    # Provider first, then analyzer: every caller nests them in the same order
+    bulkheads = (
+        bulkhead.get_bulkhead(f"llm:{prov}", settings.llm_max_concurrent_calls),
+        bulkhead.get_bulkhead(f"llm:{prov}:{caller or 'default'}", settings.llm_max_concurrent_calls_per_analyzer),
+    )
 
     last_error: Exception | None = None
-    for attempt in range(1, MAX_RETRIES + 1):
+    retrier = Retrier(RETRY_POLICY)
+    for attempt in retrier:
+        if not breaker.allow():
+            raise CircuitOpenError(breaker.name) from last_error
+        credential = pool.acquire()
+        # Separate rate-limit buckets per key only when there are several
+        account = credential.id if len(pool) > 1 else ""
+        retry_headers = None
+        switch_key = False
+        attempt_timeout = timeout if timeout is not None else timeouts.timeout_for(TIMEOUT_POLICY, f"{prov}/{mdl}")
+        sent = False
+        reservation = None
+        billed_input = 0  # input tokens the provider counted if this attempt fails
         try:
             logger.info(
-                "LLM request attempt %d/%d (provider=%s, model=%s, images=%d)",
-                attempt, MAX_RETRIES, prov, mdl, len(imgs),
+                "LLM request attempt %d/%d (provider=%s, model=%s, key=%s, images=%d, ~%d image tokens)",
+                attempt, RETRY_POLICY.max_attempts, prov, mdl, credential.id, len(imgs), image_tokens,
+            )
+            url, headers = _endpoint(prov, mdl, credential, streaming)
+            body = shared_body
+            if body is None:
+                body = google_bodies.get(credential.id)
+                if body is None:
+                    cached_content = None
+                    if prompt_caching("google") and imgs:
+                        cached_content, written = await _gemini_cached_content(
+                            imgs, mdl, credential, attempt_timeout, analyzer,
+                        )
+                        cache_write_tokens += written
+                    body = google_bodies[credential.id] = request_body(_build_google_payload(
+                        prompt, imgs, mdl, max_tokens, cached_content=cached_content, analyzer=analyzer,
+                    ))
+            headers.update(body.headers)
+            reservation = await limiter.reserve(prov, mdl, input_estimate, max_tokens, account) if limiter else None
+            async with bulkhead.hold(*bulkheads):
+                started = time.monotonic()
+                sent = True
+                client = get_client(prov)
+                if streaming:
+                    async with client.stream(
+                        "POST", url, headers=headers, content=body, timeout=attempt_timeout,
+                    ) as response:
+                        if response.is_error:
+                            await response.aread()  # error bodies carry the details (e.g. Gemini quotas)
+                        response.raise_for_status()
+                        billed_input = input_estimate  # accepted: the prompt counts even if the answer doesn't parse
+                        streamed = await read_stream(response, prov, started)
+                else:
+                    response = await client.post(url, headers=headers, content=body, timeout=attempt_timeout)
+                    response.raise_for_status()
+                    billed_input = input_estimate
+            elapsed = time.monotonic() - started
+            record_upstream(prov, latency_s=elapsed)
+            timeouts.observe(TIMEOUT_POLICY, elapsed, f"{prov}/{mdl}")
+            breaker.record_success()
+            pool.observe(credential, elapsed, response.headers)
+            if limiter:
+                # Calibrate from the 2xx headers before parsing, which can still fail
+                await limiter.observe(prov, mdl, response, account)
+
+            result = parse_fn(streamed.data if streaming else response.json())
+            if limiter:
+                await limiter.settle(reservation, result.input_tokens, result.output_tokens)
+                reservation = None
+            if streaming:
+                result.ttft_s, result.generation_s = streamed.ttft_s, streamed.generation_s
+                metrics.inc("llm_streams_total", provider=prov, outcome="early" if streamed.early else "complete")
+                if streamed.ttft_s is not None:
+                    metrics.inc("llm_ttft_seconds_total", streamed.ttft_s, provider=prov)
+                    metrics.inc("llm_generation_seconds_total", streamed.generation_s, provider=prov)
+            result.cache_write_tokens += cache_write_tokens
+            if result.cache_read_tokens:
+                metrics.inc("llm_prompt_cache_tokens_total", result.cache_read_tokens, provider=prov, kind="read")
+            if result.cache_write_tokens:
+                metrics.inc("llm_prompt_cache_tokens_total", result.cache_write_tokens, provider=prov, kind="write")
+            logger.info(
+                "LLM response received (%d chars, prompt cache read=%d write=%d tokens)",
+                len(result.text), result.cache_read_tokens, result.cache_write_tokens,
             )
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(url, headers=headers, json=payload)
-                response.raise_for_status()
-
-            result = parse_fn(response.json())
-            logger.info("LLM response received (%d chars)", len(result.text))
             return result
 
         except httpx.TimeoutException as e:
-            last_error = e
-            logger.warning("LLM request timed out (attempt %d/%d)", attempt, MAX_RETRIES)
+            last_error, reason = e, "timeout"
+            if isinstance(e, httpx.ReadTimeout):
+                billed_input = input_estimate  # sent and being processed when we gave up
+            record_upstream(prov, error=True)
+            timeouts.observe(TIMEOUT_POLICY, time.monotonic() - started, f"{prov}/{mdl}")
+            breaker.record_failure()
+            logger.warning(
+                "LLM request timed out after %.0fs (attempt %d/%d)", attempt_timeout, attempt, RETRY_POLICY.max_attempts,
+            )
         except httpx.HTTPStatusError as e:
-            last_error = e
-            if e.response.status_code == 429:
-                logger.warning("LLM rate limited (attempt %d/%d)", attempt, MAX_RETRIES)
-            elif e.response.status_code >= 500:
-                logger.warning("LLM server error %d (attempt %d/%d)", e.response.status_code, attempt, MAX_RETRIES)
+            last_error, reason = e, str(e.response.status_code)
+            status = e.response.status_code
+            retry_headers = e.response.headers
+            if limiter:
+                await limiter.observe(prov, mdl, e.response, account)
+            if status == 429:
+                record_upstream(prov, rate_limited=True)
+                breaker.release()  # throttled, not down
+                logger.warning("LLM rate limited (attempt %d/%d)", attempt, RETRY_POLICY.max_attempts)
+                if len(pool) > 1:
+                    pool.eject(credential, retry_after_seconds(e.response.headers) or RATE_LIMIT_EJECT_S, "429")
+                    switch_key = pool.has_alternative(credential)
+            elif status >= 500:
+                record_upstream(prov, error=True)
+                breaker.record_failure()
+                logger.warning("LLM server error %d (attempt %d/%d)", status, attempt, RETRY_POLICY.max_attempts)
             else:
-                raise
+                breaker.record_success()  # the upstream is up; the request was rejected
+                if status not in (401, 403) or len(pool) == 1:
+                    raise
+                pool.eject(credential, AUTH_EJECT_S, str(status))
+                if not pool.has_alternative(credential):
+                    raise
+                switch_key = True
         except httpx.RequestError as e:
-            last_error = e
-            logger.warning("LLM request failed (attempt %d/%d): %s", attempt, MAX_RETRIES, e)
+            last_error, reason = e, "connection"
+            record_upstream(prov, error=True)
+            breaker.record_failure()
+            logger.warning("LLM request failed (attempt %d/%d): %s", attempt, RETRY_POLICY.max_attempts, e)
+        except asyncio.CancelledError:
+            # A losing hedge or an abandoned observation: the provider bills the prompt it already read
+            if sent:
+                billed_input = input_estimate
+                await usage.record_abandoned(prov, mdl, caller, input_estimate, len(imgs))
+            raise
+        finally:
+            pool.release(credential)
+            if reservation is not None:
+                # Failed attempt: give back the capacity the provider never counted
+                await limiter.settle(reservation, billed_input, 0)
+
+        if attempt < RETRY_POLICY.max_attempts and breaker.state == OPEN:
+            # Don't back off against an upstream that's down; let query() fail over now
+            raise CircuitOpenError(breaker.name) from last_error
+        if switch_key:
+            # The next attempt goes to another key; the old key's Retry-After doesn't apply
+            if not await retrier.backoff(reason, delay=0):
+                break
+        elif not await retrier.backoff(reason, retry_headers):
+            break
+
+    logger.error("LLM query failed after %d attempts", attempt)
+    raise last_error  # type: ignore[misc]
 
-        if attempt < MAX_RETRIES:
-            wait = 2 ** attempt
-            logger.info("Retrying in %ds...", wait)
-            await asyncio.sleep(wait)
 
-    logger.error("LLM query failed after %d attempts", MAX_RETRIES)
-    raise last_error  # type: ignore[misc]
+async def _query_batched(
+    session: llm_batch.BatchSession,
+    prompt: str,
+    imgs: list[PreparedPhoto],
+    prov: str,
+    mdl: str,
+    max_tokens: int,
+    analyzer: str | None,
+    schema: ResponseSchema | None,
+    temperature: float | None,
+    stop: Sequence[str],
+) -> LLMResponse:
+    """Send one query through the provider's batch API instead of live (see llm_batch)."""
+    if prov == "anthropic":
+        payload = _build_anthropic_payload(
+            prompt, imgs, mdl, max_tokens, cache_images=prompt_caching("anthropic"), analyzer=analyzer,
+        )
+        parse_fn = _parse_anthropic_response
+    else:
+        payload = _build_openai_payload(prompt, imgs, mdl, max_tokens, analyzer=analyzer)
+        parse_fn = _parse_openai_response
+    _apply_sampling(payload, prov, temperature, stop)
+    if schema is not None:
+        _apply_response_schema(payload, prov, schema)
+
+    # The pool only picks the key to bill; a queued batch request isn't load on it
+    pool = _credential_pool(prov)
+    credential = pool.acquire()
+    pool.release(credential)
+    _, headers = _endpoint(prov, mdl, credential, streaming=False)
+    metrics.inc("llm_batched_queries_total", provider=prov, analyzer=analyzer or "default")
+    logger.info("LLM request queued for batch (provider=%s, model=%s, images=%d)", prov, mdl, len(imgs))
+    result = parse_fn(await session.submit(prov, credential.base_url, headers, bytes(JSONBody(payload))))
+    if result.cache_read_tokens:
+        metrics.inc("llm_prompt_cache_tokens_total", result.cache_read_tokens, provider=prov, kind="read")
+    if result.cache_write_tokens:
+        metrics.inc("llm_prompt_cache_tokens_total", result.cache_write_tokens, provider=prov, kind="write")
+    return result
 
 
 def extract_json(text: str) -> dict | None:
     """Extract JSON from LLM response text.
 
     Handles cases where the model wraps JSON in markdown code blocks
-    or includes extra prose.
+    or includes extra prose. One linear pass (see src/utils/jsonscan.py)
+    finds the first balanced {...} that parses, at any nesting depth;
+    braces inside strings and escaped quotes are respected.
 
     Args:
         text: Raw text from LLM response.
@@ -352,27 +1060,17 @@ def extract_json(text: str) -> dict | None:
     Returns:
         Parsed dict, or None if no valid JSON found.
     """
-    # Try direct parse first
-    try:
-        return json.loads(text.strip())
-    except json.JSONDecodeError:
-        pass
-
-    # Try extracting from code blocks
-    import re
-    patterns = [
-        r"```json\s*\n(.*?)\n```",
-        r"```\s*\n(.*?)\n```",
-        r"\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}",
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            try:
-                candidate = match.group(1) if match.lastindex else match.group(0)
-                return json.loads(candidate.strip())
-            except (json.JSONDecodeError, IndexError):
-                continue
-
-    logger.warning("Failed to extract JSON from LLM response: %s", text[:200])
-    return None
+    # Try direct parse first — the common case with structured output
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        try:
+            data = json.loads(stripped)
+            if isinstance(data, dict):
+                return data
+        except (json.JSONDecodeError, RecursionError):
+            pass
+
+    data = scan_json_object(text)
+    if data is None:
+        logger.warning("Failed to extract JSON from LLM response: %s", text[:200])
+    return data
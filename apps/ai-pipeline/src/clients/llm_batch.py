@@ -0,0 +1,261 @@
+"""Provider batch APIs — run LLM requests as Anthropic Message Batches / OpenAI Batch jobs.
+
+Bulk reprocessing (see src/reprocess.py) doesn't need answers in seconds.
+It needs them cheaply and without eating the interactive rate limits.
+Inside ``collect()``, every ``llm.query()`` for a batch-capable provider
+hands its request body to the session instead of sending it. The caller
+awaits as usual. The session gathers requests for LLM_BATCH_FLUSH_S (or
+until LLM_BATCH_MAX_REQUESTS), submits them as one provider batch job,
+polls every LLM_BATCH_POLL_S and resolves each caller with its response
+body. The analyzers' parsers, consensus and post_ai_result run unchanged.
+
+Dependent calls (measurements after species, cascade escalations, repair
+re-prompts) simply land in a later job. Providers without a batch API
+here (Gemini) are queried live.
+
+Per-request failures in a job raise ``BatchRequestError`` for that caller
+only. Job-level failures raise it for every request in the job.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+import httpx
+
+from src.config import settings
+from src.clients.http import get_client
+from src.utils import metrics
+from src.utils.retry import RetryPolicy, Retrier
+
+logger = logging.getLogger(__name__)
+
+BATCH_PROVIDERS = ("anthropic", "openai")
+RETRY_POLICY = RetryPolicy("llm_batch", max_attempts=5, base_delay_s=2.0, max_delay_s=60.0)
+REQUEST_TIMEOUT = 120.0
+
+# Anthropic processing_status / OpenAI status values after which a job won't change
+ANTHROPIC_DONE = ("ended",)
+OPENAI_DONE = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchRequestError(Exception):
+    """A request in a provider batch job failed, expired or was cancelled."""
+
+
+@dataclass
+class _Pending:
+    custom_id: str
+    body: bytes  # provider request payload, JSON
+    future: asyncio.Future
+
+
+@dataclass
+class _Queue:
+    base_url: str
+    headers: dict[str, str]
+    pending: list[_Pending] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+
+class BatchSession:
+    """Collects LLM requests and runs them as provider batch jobs."""
+
+    def __init__(self, flush_s: float, max_requests: int, poll_s: float) -> None:
+        self.flush_s = flush_s
+        self.max_requests = max(1, max_requests)
+        self.poll_s = poll_s
+        self._ids = itertools.count(1)
+        self._queues: dict[tuple[str, str], _Queue] = {}
+        self._jobs: set[asyncio.Task] = set()
+
+    async def submit(self, provider: str, base_url: str, headers: dict[str, str], body: bytes) -> dict:
+        """Queue one request and wait for its response body.
+
+        Args:
+            provider: "anthropic" or "openai".
+            base_url: API base URL of the credential to bill.
+            headers: Auth headers for that credential.
+            body: The request payload as it would be sent live (JSON bytes).
+
+        Returns:
+            The provider's response body (Messages / Chat Completions format).
+
+        Raises:
+            BatchRequestError: If the request or its job failed.
+        """
+        queue = self._queues.get((provider, base_url))
+        if queue is None:
+            queue = self._queues[(provider, base_url)] = _Queue(base_url, headers)
+        future = asyncio.get_running_loop().create_future()
+        queue.pending.append(_Pending(f"req-{next(self._ids)}", body, future))
+        if len(queue.pending) >= self.max_requests:
+            self._flush(provider, base_url)
+        elif queue.timer is None:
+            queue.timer = asyncio.get_running_loop().call_later(self.flush_s, self._flush, provider, base_url)
+        return await future
+
+    def _flush(self, provider: str, base_url: str) -> None:
+        queue = self._queues[(provider, base_url)]
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        requests, queue.pending = queue.pending, []
+        if not requests:
+            return
+        job = asyncio.ensure_future(self._run(provider, queue, requests))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _run(self, provider: str, queue: _Queue, requests: list[_Pending]) -> None:
+        started = time.monotonic()
+        metrics.inc("llm_batch_jobs_total", provider=provider)
+        metrics.inc("llm_batch_requests_total", len(requests), provider=provider)
+        try:
+            runner = _run_anthropic if provider == "anthropic" else _run_openai
+            results = await runner(queue.base_url, queue.headers, requests, self.poll_s)
+        except Exception as e:
+            logger.exception("%s batch job of %d requests failed", provider, len(requests))
+            metrics.inc("llm_batch_failures_total", len(requests), provider=provider, reason="job")
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(BatchRequestError(f"{provider} batch job failed: {e}"))
+            return
+
+        logger.info("%s batch job of %d requests done in %.0fs", provider, len(requests), time.monotonic() - started)
+        for request in requests:
+            if request.future.done():
+                continue
+            result = results.get(request.custom_id)
+            if isinstance(result, dict):
+                request.future.set_result(result)
+            else:
+                metrics.inc("llm_batch_failures_total", provider=provider, reason="request")
+                request.future.set_exception(BatchRequestError(result or f"{request.custom_id} missing from batch output"))
+
+    async def close(self) -> None:
+        """Submit whatever is still queued and wait for every job to finish."""
+        for provider, base_url in list(self._queues):
+            self._flush(provider, base_url)
+        while self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+
+_session: contextvars.ContextVar[BatchSession | None] = contextvars.ContextVar("llm_batch_session", default=None)
+
+
+def current(provider: str) -> BatchSession | None:
+    """The batch session requests to provider should go through, or None to query live."""
+    session = _session.get()
+    return session if session is not None and provider in BATCH_PROVIDERS else None
+
+
+@contextlib.asynccontextmanager
+async def collect() -> AsyncIterator[BatchSession]:
+    """Send llm.query() calls made inside the block (and tasks it starts) through provider batch jobs."""
+    session = BatchSession(settings.llm_batch_flush_s, settings.llm_batch_max_requests, settings.llm_batch_poll_s)
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+        await session.close()
+
+
+async def _request(provider: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """One batch API call, retried on timeouts, connection errors, 429 and 5xx."""
+    client = get_client(provider)
+    retrier = Retrier(RETRY_POLICY)
+    for attempt in retrier:
+        retry_headers = None
+        try:
+            response = await client.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 429 and e.response.status_code < 500:
+                raise
+            reason, retry_headers = str(e.response.status_code), e.response.headers
+            logger.warning("%s batch API HTTP %d (attempt %d)", provider, e.response.status_code, attempt)
+            error: Exception = e
+        except (httpx.TimeoutException, httpx.RequestError) as e:
+            reason = "timeout" if isinstance(e, httpx.TimeoutException) else "connection"
+            logger.warning("%s batch API request failed (attempt %d): %s", provider, attempt, e)
+            error = e
+        if not await retrier.backoff(reason, retry_headers):
+            break
+    raise error
+
+
+def _jsonl(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def _run_anthropic(
+    base_url: str, headers: dict[str, str], requests: list[_Pending], poll_s: float,
+) -> dict[str, dict | str]:
+    """Run one Message Batch; custom_id → Messages response body or error text."""
+    body = b'{"requests":[' + b",".join(
+        b'{"custom_id":' + json.dumps(r.custom_id).encode() + b',"params":' + r.body + b"}" for r in requests
+    ) + b"]}"
+    response = await _request("anthropic", "POST", f"{base_url}/v1/messages/batches", headers=headers, content=body)
+    batch = response.json()
+    logger.info("Submitted Anthropic message batch %s (%d requests)", batch["id"], len(requests))
+    while batch.get("processing_status") not in ANTHROPIC_DONE:
+        await asyncio.sleep(poll_s)
+        batch = (await _request("anthropic", "GET", f"{base_url}/v1/messages/batches/{batch['id']}", headers=headers)).json()
+
+    results: dict[str, dict | str] = {}
+    lines = (await _request("anthropic", "GET", batch["results_url"], headers=headers)).text
+    for line in _jsonl(lines):
+        result = line.get("result", {})
+        if result.get("type") == "succeeded":
+            results[line["custom_id"]] = result["message"]
+        else:
+            results[line["custom_id"]] = f"Anthropic batch request {result.get('type')}: {result.get('error')}"
+    return results
+
+
+async def _run_openai(
+    base_url: str, headers: dict[str, str], requests: list[_Pending], poll_s: float,
+) -> dict[str, dict | str]:
+    """Run one OpenAI Batch; custom_id → Chat Completions response body or error text."""
+    auth = {"Authorization": headers["Authorization"]}
+    lines = b"\n".join(
+        b'{"custom_id":' + json.dumps(r.custom_id).encode()
+        + b',"method":"POST","url":"/v1/chat/completions","body":' + r.body + b"}"
+        for r in requests
+    )
+    upload = await _request(
+        "openai", "POST", f"{base_url}/v1/files", headers=auth,
+        data={"purpose": "batch"}, files={"file": ("batch.jsonl", lines, "application/jsonl")},
+    )
+    batch = (await _request(
+        "openai", "POST", f"{base_url}/v1/batches", headers=auth,
+        json={"input_file_id": upload.json()["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+    )).json()
+    logger.info("Submitted OpenAI batch %s (%d requests)", batch["id"], len(requests))
+    while batch.get("status") not in OPENAI_DONE:
+        await asyncio.sleep(poll_s)
+        batch = (await _request("openai", "GET", f"{base_url}/v1/batches/{batch['id']}", headers=auth)).json()
+
+    results: dict[str, dict | str] = {}
+    for key in ("error_file_id", "output_file_id"):
+        if not batch.get(key):
+            continue
+        content = (await _request("openai", "GET", f"{base_url}/v1/files/{batch[key]}/content", headers=auth)).text
+        for line in _jsonl(content):
+            response = line.get("response") or {}
+            if line.get("error") is None and response.get("status_code") == 200:
+                results[line["custom_id"]] = response["body"]
+            else:
+                results[line["custom_id"]] = f"OpenAI batch request failed: {line.get('error') or response.get('body')}"
+    if not results:
+        raise BatchRequestError(f"OpenAI batch {batch['id']} ended {batch.get('status')} without output")
+    return results
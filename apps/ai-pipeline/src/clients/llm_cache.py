@@ -0,0 +1,265 @@
+"""Content-addressed LLM response cache — in-process LRU, optional Redis tier, singleflight.
+
+A query is keyed by a SHA-256 over (provider, model, prompt, image digests,
+max_tokens), so a retried BullMQ job or a duplicate enqueue of the same
+observation gets the earlier answer instead of paying for it again.
+
+Tiers, checked in order:
+  1. memory — per-process LRU bounded by the total size of stored responses
+  2. redis  — optional, shared across replicas, zlib-compressed with a TTL
+  3. upstream — concurrent identical misses share one call (singleflight)
+
+Only responses the caller accepts are kept: analyzers discard() a response
+their parser rejects so the next attempt asks the model again.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+
+import redis.asyncio as aioredis
+
+from src.clients.http import LoopRedis
+from src.config import settings
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "ai-pipeline:llm-cache:"
+
+# Bump to invalidate every stored entry after a change to what a key covers
+KEY_VERSION = 3
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    prompt: str,
+    image_digests: Sequence[str],
+    max_tokens: int,
+    schema: dict | None = None,
+    temperature: float | None = None,
+    stop: Sequence[str] = (),
+) -> str:
+    """Hash everything that determines an LLM answer into a cache key.
+
+    Args:
+        provider: LLM provider name.
+        model: Model name.
+        prompt: Full prompt text.
+        image_digests: Content digests of the attached images, in order.
+        max_tokens: Output token limit.
+        schema: Structured-output schema, if the provider was asked to follow one.
+        temperature: Sampling temperature, if not the provider default.
+        stop: Stop sequences.
+
+    Returns:
+        Hex SHA-256 digest.
+    """
+    material = json.dumps(
+        [KEY_VERSION, provider, model, prompt, list(image_digests), max_tokens, schema, temperature, list(stop)],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU of bytes values, evicted by total stored size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size(self) -> int:
+        """Total bytes currently stored."""
+        return self._size
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                metrics.inc("llm_cache_evictions_total")
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+class LLMCache:
+    """Two-tier response cache with in-flight de-duplication.
+
+    Values are opaque bytes (the caller serializes responses); the Redis
+    tier stores them zlib-compressed. Redis failures degrade to a miss.
+    """
+
+    def __init__(self, max_bytes: int, redis_enabled: bool = False, ttl_s: int = 86400) -> None:
+        self.memory = LRUCache(max_bytes)
+        self.redis_enabled = redis_enabled
+        self.ttl_s = ttl_s
+        self._inflight: dict[str, asyncio.Future[bytes]] = {}
+        self._redis = LoopRedis("LLM cache")
+
+    def _redis_client(self) -> aioredis.Redis | None:
+        return self._redis.get() if self.redis_enabled else None
+
+    async def _redis_get(self, key: str) -> bytes | None:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            stored = await client.get(REDIS_KEY_PREFIX + key)
+            return zlib.decompress(stored) if stored is not None else None
+        except Exception as e:
+            logger.warning("LLM cache Redis read failed: %s", e)
+            return None
+
+    async def _redis_set(self, key: str, value: bytes) -> None:
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            await client.set(REDIS_KEY_PREFIX + key, zlib.compress(value), ex=self.ttl_s)
+        except Exception as e:
+            logger.warning("LLM cache Redis write failed: %s", e)
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[bytes]]) -> tuple[bytes, str]:
+        """Return the cached value for key, or run call() once and store its result.
+
+        Concurrent callers with the same key wait on a single call(); if it
+        raises, every waiter gets the exception and nothing is stored.
+
+        Args:
+            key: Cache key from cache_key().
+            call: Produces the serialized value on a miss.
+
+        Returns:
+            (value, source) where source is "memory", "redis", "inflight" or "upstream".
+        """
+        while True:
+            value = self.memory.get(key)
+            if value is not None:
+                metrics.inc("llm_cache_requests_total", tier="memory", result="hit")
+                return value, "memory"
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                value = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    continue  # the leading caller was cancelled, not us — take over
+                raise
+            metrics.inc("llm_cache_requests_total", tier="inflight", result="hit")
+            return value, "inflight"
+
+        future: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._redis_get(key)
+            if value is not None:
+                metrics.inc("llm_cache_requests_total", tier="redis", result="hit")
+                self.memory.put(key, value)
+                source = "redis"
+            else:
+                metrics.inc("llm_cache_requests_total", tier="all", result="miss")
+                value = await call()
+                self.memory.put(key, value)
+                await self._redis_set(key, value)
+                source = "upstream"
+            future.set_result(value)
+            return value, source
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it so an un-awaited future doesn't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            metrics.set_gauge("llm_cache_memory_bytes", self.memory.size)
+
+    async def discard(self, key: str) -> None:
+        """Drop a key from both tiers (e.g. its response failed to parse)."""
+        self.memory.pop(key)
+        metrics.inc("llm_cache_discards_total")
+        client = self._redis_client()
+        if client is not None:
+            try:
+                await client.delete(REDIS_KEY_PREFIX + key)
+            except Exception as e:
+                logger.warning("LLM cache Redis delete failed: %s", e)
+
+    async def close(self) -> None:
+        """Close the Redis connection, if one was opened."""
+        await self._redis.close()
+
+
+_cache: LLMCache | None = None
+
+
+def get_cache() -> LLMCache | None:
+    """Return the process-wide cache built from settings, or None if disabled."""
+    global _cache
+    if not settings.llm_cache_enabled:
+        return None
+    if _cache is None:
+        _cache = LLMCache(
+            max_bytes=settings.llm_cache_max_bytes,
+            redis_enabled=settings.llm_cache_redis,
+            ttl_s=settings.llm_cache_ttl_s,
+        )
+        logger.info(
+            "LLM cache: memory=%d bytes, redis=%s (ttl=%ds)",
+            settings.llm_cache_max_bytes, settings.llm_cache_redis, settings.llm_cache_ttl_s,
+        )
+    return _cache
+
+
+async def close() -> None:
+    """Close and forget the process-wide cache. Called on consumer shutdown."""
+    global _cache
+    cache, _cache = _cache, None
+    if cache is not None:
+        await cache.close()
+
+
+def reset() -> None:
+    """Forget the process-wide cache without closing it. Intended for tests."""
+    global _cache
+    _cache = None
@@ -0,0 +1,194 @@
+"""Server-sent-event streaming for LLM responses, with early stop on complete JSON.
+
+Every analyzer wants one JSON object, but models often add a sentence or
+two of commentary after it — output we wait for and pay for. In streaming
+mode the text deltas are fed to a JSONObjectScanner and the connection is
+closed the moment the top-level object closes; the provider stops
+generating when the client goes away.
+
+Each provider's events are folded back into the shape of its non-streaming
+response, so llm.py parses both modes with the same _parse_* function and
+callers get the same LLMResponse either way.
+"""
+
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+import httpx
+
+from src.utils.jsonscan import JSONObjectScanner
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_sse(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """Decode an SSE stream into the JSON payloads of its data: fields.
+
+    Args:
+        lines: Lines of the response body (httpx Response.aiter_lines()).
+
+    Yields:
+        One parsed dict per event; comments, keep-alives and OpenAI's
+        terminating "[DONE]" are skipped.
+    """
+    data: list[str] = []
+    async for line in lines:
+        if line.startswith("data:"):
+            data.append(line[5:].removeprefix(" "))
+            continue
+        if line or not data:
+            continue  # event:/id:/comment lines, or a blank line with nothing pending
+        payload, data = "\n".join(data), []
+        if payload == "[DONE]":
+            return
+        yield json.loads(payload)
+    if data and data != ["[DONE]"]:
+        yield json.loads("\n".join(data))
+
+
+class StreamAccumulator:
+    """Collects text deltas and metadata from one provider's stream events."""
+
+    def __init__(self, provider: str) -> None:
+        self.provider = provider
+        self.model = ""
+        self.usage: dict | None = None
+        self.parts: list[str] = []
+
+    def feed(self, event: dict) -> str:
+        """Absorb one event.
+
+        Args:
+            event: Parsed SSE data payload.
+
+        Returns:
+            Text generated in this event ("" if none).
+
+        Raises:
+            httpx.RemoteProtocolError: The provider reported an error mid-stream
+                (e.g. Anthropic overloaded_error) — retried like a dropped connection.
+        """
+        if "error" in event:
+            error = event["error"]
+            message = error.get("message", error) if isinstance(error, dict) else error
+            raise httpx.RemoteProtocolError(f"{self.provider} stream error: {message}")
+
+        if self.provider == "anthropic":
+            kind = event.get("type")
+            if kind == "message_start":
+                message = event.get("message") or {}
+                self.model = message.get("model", "")
+                self.usage = dict(message.get("usage") or {})
+            elif kind == "message_delta" and event.get("usage"):
+                self.usage = {**(self.usage or {}), **event["usage"]}
+            elif kind == "content_block_delta":
+                delta = event.get("delta") or {}
+                if delta.get("type") == "text_delta":
+                    return self._add(delta.get("text", ""))
+                if delta.get("type") == "input_json_delta":
+                    # Structured output arrives as the forced tool call's input
+                    return self._add(delta.get("partial_json", ""))
+            return ""
+
+        if self.provider == "openai":
+            self.model = event.get("model") or self.model
+            if event.get("usage"):
+                self.usage = event["usage"]
+            choices = event.get("choices") or []
+            if choices:
+                return self._add((choices[0].get("delta") or {}).get("content") or "")
+            return ""
+
+        # google — each chunk carries its own parts and the running usage
+        self.model = event.get("modelVersion") or self.model
+        if event.get("usageMetadata"):
+            self.usage = event["usageMetadata"]
+        candidates = event.get("candidates") or []
+        if candidates:
+            parts = (candidates[0].get("content") or {}).get("parts") or []
+            return self._add("".join(p.get("text", "") for p in parts))
+        return ""
+
+    def _add(self, text: str) -> str:
+        if text:
+            self.parts.append(text)
+        return text
+
+    def response_data(self, text: str) -> dict:
+        """The equivalent non-streaming response body, for the provider's parser.
+
+        Args:
+            text: Final text (possibly cut short after the JSON object).
+
+        Returns:
+            Dict shaped like the provider's non-streaming response.
+        """
+        if self.provider == "anthropic":
+            return {"content": [{"type": "text", "text": text}], "model": self.model, "usage": self.usage}
+        if self.provider == "openai":
+            return {"choices": [{"message": {"content": text}}], "model": self.model, "usage": self.usage}
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "modelVersion": self.model,
+            "usageMetadata": self.usage,
+        }
+
+
+@dataclass
+class StreamedResponse:
+    """A fully or partly read stream, folded back into a response body."""
+
+    data: dict  # shaped like the provider's non-streaming response
+    ttft_s: float | None  # request start → first text; None if no text arrived
+    generation_s: float  # first text → last text read
+    early: bool  # stopped once the JSON object closed, before the stream ended
+
+
+async def read_stream(response: httpx.Response, provider: str, started: float) -> StreamedResponse:
+    """Read a streaming response until it ends or its JSON object is complete.
+
+    Returning early leaves the rest unread; the caller closing the response
+    (leaving client.stream()) drops the connection and cancels generation.
+    Usage reported only at the end of a stream (Anthropic output tokens,
+    OpenAI usage) is missing from a response cut short.
+
+    Args:
+        response: Open streaming response with a 2xx status.
+        provider: LLM provider name.
+        started: time.monotonic() when the request was sent.
+
+    Returns:
+        StreamedResponse for the provider's _parse_* function.
+    """
+    acc = StreamAccumulator(provider)
+    scanner = JSONObjectScanner()
+    first_text_at: float | None = None
+    last_text_at = started
+    early = False
+
+    async for event in iter_sse(response.aiter_lines()):
+        delta = acc.feed(event)
+        if not delta:
+            continue
+        last_text_at = time.monotonic()
+        if first_text_at is None:
+            first_text_at = last_text_at
+        if scanner.feed(delta) is not None:
+            early = True
+            break
+
+    text = "".join(acc.parts)
+    if early:
+        trailing = len(text) - scanner.end
+        text = text[:scanner.end]
+        logger.debug("JSON complete, closing %s stream (%d trailing chars dropped)", provider, trailing)
+
+    return StreamedResponse(
+        data=acc.response_data(text),
+        ttft_s=first_text_at - started if first_text_at is not None else None,
+        generation_s=last_text_at - first_text_at if first_text_at is not None else 0.0,
+        early=early,
+    )
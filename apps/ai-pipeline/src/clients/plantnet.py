@@ -1,12 +1,17 @@
-"""Pl@ntNet API v2 client for plant species identification."""
+"""Pl@ntNet API v2 client for plant species identification (native async, pooled connections)."""
 
-import asyncio
 import logging
+import time
+import uuid
 from dataclasses import dataclass
 
-import requests
+import httpx
 
 from src.config import settings
+from src.clients.http import get_client
+from src.utils import bulkhead, metrics, timeouts
+from src.utils.concurrency import record_upstream
+from src.utils.retry import RetryPolicy, Retrier
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +25,8 @@ ORGAN_MAP: dict[str, str] = {
 }
 
 DEFAULT_TIMEOUT = 30.0
-MAX_RETRIES = 3
+TIMEOUT_POLICY = timeouts.TimeoutPolicy("plantnet", default_s=DEFAULT_TIMEOUT, floor_s=5.0, ceiling_s=60.0)
+RETRY_POLICY = RetryPolicy("plantnet", max_attempts=3, base_delay_s=1.0, max_delay_s=30.0)
 
 
 @dataclass
@@ -80,25 +86,66 @@ def _parse_response(data: dict) -> PlantNetResult:
     )
 
 
+class _MultipartBody:
+    """multipart/form-data body streamed straight from the caller's image bytes.
+
+    Part headers are rendered once; image bytes are yielded as memoryviews of
+    the original buffers, so neither building the body nor re-sending it on a
+    retry copies the photos. Iterating again restarts the stream.
+    """
+
+    def __init__(self, fields: list[tuple[str, str]], files: list[tuple[str, str, bytes, str]]) -> None:
+        self.boundary = uuid.uuid4().hex
+        self._chunks: list[bytes | memoryview] = []
+        for name, value in fields:
+            self._chunks.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        for name, filename, data, content_type in files:
+            self._chunks.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n".encode()
+            )
+            self._chunks.append(memoryview(data))
+            self._chunks.append(b"\r\n")
+        self._chunks.append(f"--{self.boundary}--\r\n".encode())
+        self.content_length = sum(len(c) for c in self._chunks)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(self.content_length),
+        }
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
 async def identify(
     photos: list[tuple[bytes, str]],
     api_key: str | None = None,
-    timeout: float = DEFAULT_TIMEOUT,
+    timeout: float | None = None,
 ) -> PlantNetResult:
     """Send photos to Pl@ntNet for species identification.
 
+    Each attempt holds a slot in the Pl@ntNet bulkhead when
+    PLANTNET_MAX_CONCURRENT_CALLS is set.
+
     Args:
         photos: List of (image_bytes, photo_type) tuples.
             photo_type should be one of: full_tree_angle1, full_tree_angle2, bark_closeup.
         api_key: Pl@ntNet API key. Uses settings if not provided.
-        timeout: Request timeout in seconds.
+        timeout: Request timeout in seconds. None derives it from observed
+            latency (ADAPTIVE_TIMEOUTS), else DEFAULT_TIMEOUT.
 
     Returns:
         PlantNetResult with ranked species identifications.
 
     Raises:
-        requests.HTTPError: If the API returns an error status.
-        requests.Timeout: If the request times out.
+        httpx.HTTPStatusError: If the API returns an error status.
+        httpx.TimeoutException: If the request times out.
         ValueError: If no photos are provided or API key is missing.
     """
     key = api_key or settings.plantnet_api_key
@@ -118,39 +165,41 @@ async def identify(
         "api-key": key,
     }
 
-    # Build multipart data - stored as (bytes, filename) for each request
-    photo_data: list[tuple[bytes, str]] = []
-    for i, (img_bytes, _pt) in enumerate(photos):
-        photo_data.append((img_bytes, f"photo_{i}.jpg"))
-
-    data_list: list[tuple[str, str]] = [("organs", organ) for organ in organs]
-
-    def _sync_post() -> requests.Response:
-        """Synchronous POST using requests - works around Python 3.14 httpx multipart bug."""
-        # Build files list for requests library
-        files_list = [
-            ("images", (filename, img_bytes, "image/jpeg"))
-            for img_bytes, filename in photo_data
-        ]
-        return requests.post(
-            PLANTNET_URL,
-            params=params,
-            files=files_list,
-            data=data_list,
-            timeout=timeout,
-        )
+    # Built once and re-streamed on every attempt
+    body = _MultipartBody(
+        fields=[("organs", organ) for organ in organs],
+        files=[
+            ("images", f"photo_{i}.jpg", img_bytes, "image/jpeg")
+            for i, (img_bytes, _pt) in enumerate(photos)
+        ],
+    )
 
     last_error: Exception | None = None
-    for attempt in range(1, MAX_RETRIES + 1):
+    retrier = Retrier(RETRY_POLICY)
+    for attempt in retrier:
+        retry_headers = None
+        attempt_timeout = timeout if timeout is not None else timeouts.timeout_for(TIMEOUT_POLICY)
         try:
             logger.info(
-                "Pl@ntNet request attempt %d/%d (%d photos, organs=%s)",
-                attempt, MAX_RETRIES, len(photos), organs,
+                "Pl@ntNet request attempt %d/%d (%d photos, organs=%s, %d bytes)",
+                attempt, RETRY_POLICY.max_attempts, len(photos), organs, body.content_length,
             )
-            # Use asyncio.to_thread to run sync requests in thread pool
-            # This works around a Python 3.14 + httpx multipart bug
-            response = await asyncio.to_thread(_sync_post)
+            async with bulkhead.hold(bulkhead.get_bulkhead("plantnet", settings.plantnet_max_concurrent_calls)):
+                started = time.monotonic()
+                client = get_client("plantnet")
+                response = await client.post(
+                    PLANTNET_URL,
+                    params=params,
+                    content=body,
+                    headers=body.headers,
+                    timeout=attempt_timeout,
+                )
+            elapsed = time.monotonic() - started
             response.raise_for_status()
+            record_upstream("plantnet", latency_s=elapsed)
+            timeouts.observe(TIMEOUT_POLICY, elapsed)
+            metrics.inc("plantnet_request_seconds_total", elapsed)
+            logger.info("Pl@ntNet responded in %.2fs (status=%d)", elapsed, response.status_code)
             result_data = response.json()
 
             result = _parse_response(result_data)
@@ -172,31 +221,34 @@ async def identify(
 
             return result
 
-        except requests.Timeout as e:
-            last_error = e
-            logger.warning("Pl@ntNet request timed out (attempt %d/%d)", attempt, MAX_RETRIES)
-        except requests.HTTPError as e:
-            last_error = e
-            if e.response is not None:
-                if e.response.status_code == 429:
-                    logger.warning("Pl@ntNet rate limited (attempt %d/%d)", attempt, MAX_RETRIES)
-                elif e.response.status_code >= 500:
-                    logger.warning("Pl@ntNet server error %d (attempt %d/%d)", e.response.status_code, attempt, MAX_RETRIES)
-                else:
-                    # Client errors (400, 401, etc.) — don't retry
-                    raise
+        except httpx.TimeoutException as e:
+            last_error, reason = e, "timeout"
+            record_upstream("plantnet", error=True)
+            timeouts.observe(TIMEOUT_POLICY, time.monotonic() - started)
+            logger.warning(
+                "Pl@ntNet request timed out after %.2fs (attempt %d/%d)",
+                time.monotonic() - started, attempt, RETRY_POLICY.max_attempts,
+            )
+        except httpx.HTTPStatusError as e:
+            last_error, reason = e, str(e.response.status_code)
+            retry_headers = e.response.headers
+            if e.response.status_code == 429:
+                record_upstream("plantnet", rate_limited=True)
+                logger.warning("Pl@ntNet rate limited (attempt %d/%d)", attempt, RETRY_POLICY.max_attempts)
+            elif e.response.status_code >= 500:
+                record_upstream("plantnet", error=True)
+                logger.warning("Pl@ntNet server error %d (attempt %d/%d)", e.response.status_code, attempt, RETRY_POLICY.max_attempts)
             else:
+                # Client errors (400, 401, etc.) — don't retry
                 raise
-        except requests.RequestException as e:
-            last_error = e
-            logger.warning("Pl@ntNet request failed (attempt %d/%d): %s", attempt, MAX_RETRIES, e)
+        except httpx.RequestError as e:
+            last_error, reason = e, "connection"
+            record_upstream("plantnet", error=True)
+            logger.warning("Pl@ntNet request failed (attempt %d/%d): %s", attempt, RETRY_POLICY.max_attempts, e)
 
-        # Exponential backoff before retry
-        if attempt < MAX_RETRIES:
-            wait = 2 ** attempt
-            logger.info("Retrying in %ds...", wait)
-            await asyncio.sleep(wait)
+        if not await retrier.backoff(reason, retry_headers):
+            break
 
     # All retries exhausted
-    logger.error("Pl@ntNet identification failed after %d attempts", MAX_RETRIES)
+    logger.error("Pl@ntNet identification failed after %d attempts", attempt)
     raise last_error  # type: ignore[misc]
@@ -0,0 +1,434 @@
+"""Cluster-wide token-bucket rate limiting for LLM providers, calibrated from response headers.
+
+Without this every replica and every concurrent job discovers a provider's
+limits by getting a 429, and they all back off and retry on their own.
+Here each (provider, model) has one bucket per limited dimension —
+requests, input tokens, output tokens, or total tokens for OpenAI — that
+refills continuously at limit/60 per second. A call reserves its estimated
+cost in every bucket before it is sent, and waits when any of them would
+go negative.
+
+Buckets learn their limits and current level from what the provider reports:
+  - Anthropic: anthropic-ratelimit-{requests,input-tokens,output-tokens}-{limit,remaining}
+  - OpenAI:    x-ratelimit-{limit,remaining}-{requests,tokens}
+  - Gemini:    the QuotaFailure / RetryInfo details of a 429 (no headers on success)
+Dimensions without a known limit are not enforced. A 429 also blocks the
+(provider, model) until its Retry-After passes. Once the real usage is known,
+the unused part of the reservation is refunded. A failed attempt refunds its
+tokens too, except for the prompt when the request timed out or was
+cancelled after it was sent.
+
+State lives in Redis (Lua scripts, atomic across replicas) when shared, or in
+process otherwise. Redis failures fail open: the call goes ahead, and a
+429 is still handled by the retry loop.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import httpx
+import redis.asyncio as aioredis
+
+from src.clients.http import LoopRedis
+from src.config import settings
+from src.utils import metrics
+from src.utils.retry import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "ai-pipeline:ratelimit:"
+
+# Learned limits are forgotten after a day without traffic
+BUCKET_TTL_S = 86400
+
+# Bucket dimensions. OpenAI limits input+output together as "tokens".
+DIMENSIONS = ("requests", "input_tokens", "output_tokens", "tokens")
+
+_ANTHROPIC_HEADERS = {"requests": "requests", "input_tokens": "input-tokens", "output_tokens": "output-tokens"}
+_OPENAI_HEADERS = {"requests": "requests", "tokens": "tokens"}
+
+# Gemini quotaId fragments → dimension (e.g. GenerateContentInputTokensPerModelPerMinute-FreeTier)
+_GEMINI_QUOTAS = (("InputTokensPerModelPerMinute", "input_tokens"), ("RequestsPerMinute", "requests"))
+
+
+def parse_rate_limit_headers(provider: str, headers: Mapping[str, str]) -> dict[str, tuple[float, float]]:
+    """Read per-minute limits and remaining capacity from a response's headers.
+
+    Args:
+        provider: LLM provider name.
+        headers: Response headers.
+
+    Returns:
+        {dimension: (limit, remaining)} for every dimension the provider reported.
+    """
+    if provider == "anthropic":
+        names = {dim: (f"anthropic-ratelimit-{h}-limit", f"anthropic-ratelimit-{h}-remaining")
+                 for dim, h in _ANTHROPIC_HEADERS.items()}
+    elif provider == "openai":
+        names = {dim: (f"x-ratelimit-limit-{h}", f"x-ratelimit-remaining-{h}")
+                 for dim, h in _OPENAI_HEADERS.items()}
+    else:
+        return {}
+
+    found: dict[str, tuple[float, float]] = {}
+    for dim, (limit_name, remaining_name) in names.items():
+        try:
+            limit = float(headers[limit_name])
+            remaining = float(headers[remaining_name])
+        except (KeyError, ValueError):
+            continue
+        if limit > 0:
+            found[dim] = (limit, remaining)
+    return found
+
+
+def parse_gemini_quota(body: object) -> tuple[dict[str, tuple[float, float]], float | None]:
+    """Read exhausted quotas and the suggested delay from a Gemini 429 body.
+
+    Args:
+        body: Decoded JSON error body.
+
+    Returns:
+        ({dimension: (limit, 0)}, retry delay in seconds or None).
+    """
+    found: dict[str, tuple[float, float]] = {}
+    delay: float | None = None
+    details = body.get("error", {}).get("details", []) if isinstance(body, dict) else []
+    for detail in details if isinstance(details, list) else []:
+        kind = detail.get("@type", "")
+        if kind.endswith("google.rpc.QuotaFailure"):
+            for violation in detail.get("violations", []):
+                quota_id = violation.get("quotaId", "")
+                for fragment, dim in _GEMINI_QUOTAS:
+                    if fragment in quota_id:
+                        try:
+                            found[dim] = (float(violation["quotaValue"]), 0.0)
+                        except (KeyError, ValueError):
+                            pass
+        elif kind.endswith("google.rpc.RetryInfo"):
+            raw = str(detail.get("retryDelay", ""))
+            try:
+                delay = float(raw.removesuffix("s"))
+            except ValueError:
+                pass
+    return found, delay
+
+
+@dataclass
+class Reservation:
+    """Capacity taken for one call, settled against actual usage afterwards."""
+
+    provider: str
+    model: str
+    amounts: dict[str, float] = field(default_factory=dict)
+    account: str = ""
+
+
+def _amounts(provider: str, input_tokens: int, output_tokens: int) -> dict[str, float]:
+    amounts = {"requests": 1.0, "input_tokens": float(input_tokens), "output_tokens": float(output_tokens)}
+    if provider == "openai":
+        amounts = {"requests": 1.0, "tokens": float(input_tokens + output_tokens)}
+    return amounts
+
+
+# KEYS[1] = block key, KEYS[2..] = buckets; ARGV[i] = amount for KEYS[i + 1].
+# Returns "0" after taking every amount, else the seconds to wait (nothing taken).
+_TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local blocked = redis.call('PTTL', KEYS[1])
+if blocked > 0 then return tostring(blocked / 1000) end
+local wait = 0
+local levels = {}
+for i = 2, #KEYS do
+  local h = redis.call('HMGET', KEYS[i], 'limit', 'tokens', 'ts')
+  local limit = tonumber(h[1])
+  if limit and limit > 0 then
+    local amount = math.min(tonumber(ARGV[i - 1]), limit)
+    local tokens = math.min(limit, (tonumber(h[2]) or limit) + (now - (tonumber(h[3]) or now)) * limit / 60)
+    levels[i] = tokens - amount
+    if tokens < amount then wait = math.max(wait, (amount - tokens) * 60 / limit) end
+  end
+end
+if wait > 0 then return tostring(wait) end
+for i, level in pairs(levels) do
+  redis.call('HSET', KEYS[i], 'tokens', tostring(level), 'ts', tostring(now))
+end
+return '0'
+"""
+
+# KEYS[1] = bucket; ARGV = limit ('' keeps the stored one), remaining ('' = unknown), refund, ttl.
+_ADJUST_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local h = redis.call('HMGET', KEYS[1], 'limit', 'tokens', 'ts')
+local limit = tonumber(ARGV[1]) or tonumber(h[1])
+if not limit or limit <= 0 then return 0 end
+local tokens = math.min(limit, (tonumber(h[2]) or limit) + (now - (tonumber(h[3]) or now)) * limit / 60)
+tokens = math.min(limit, tokens + tonumber(ARGV[3]))
+local remaining = tonumber(ARGV[2])
+if remaining then tokens = math.min(tokens, remaining) end
+redis.call('HSET', KEYS[1], 'limit', tostring(limit), 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return 1
+"""
+
+
+class LocalBuckets:
+    """In-process bucket store with the same semantics as the Redis scripts."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, list[float]] = {}  # key → [limit, tokens, ts]
+        self._blocked: dict[str, float] = {}  # block key → monotonic deadline
+
+    def _level(self, key: str, now: float) -> list[float] | None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            limit, tokens, ts = bucket
+            bucket[1] = min(limit, tokens + (now - ts) * limit / 60)
+            bucket[2] = now
+        return bucket
+
+    async def take(self, block_key: str, amounts: dict[str, float]) -> float:
+        now = time.monotonic()
+        blocked = self._blocked.get(block_key, 0.0) - now
+        if blocked > 0:
+            return blocked
+        wait = 0.0
+        granted = []
+        for key, amount in amounts.items():
+            bucket = self._level(key, now)
+            if bucket is None:
+                continue
+            amount = min(amount, bucket[0])
+            if bucket[1] < amount:
+                wait = max(wait, (amount - bucket[1]) * 60 / bucket[0])
+            granted.append((bucket, amount))
+        if wait > 0:
+            return wait
+        for bucket, amount in granted:
+            bucket[1] -= amount
+        return 0.0
+
+    async def adjust(self, key: str, limit: float | None, remaining: float | None, refund: float) -> None:
+        now = time.monotonic()
+        bucket = self._level(key, now)
+        if bucket is None:
+            if limit is None:
+                return
+            bucket = self._buckets[key] = [limit, limit, now]
+        elif limit is not None:
+            bucket[0] = limit
+        bucket[1] = min(bucket[0], bucket[1] + refund)
+        if remaining is not None:
+            bucket[1] = min(bucket[1], remaining)
+
+    async def block(self, block_key: str, seconds: float) -> None:
+        deadline = time.monotonic() + seconds
+        self._blocked[block_key] = max(self._blocked.get(block_key, 0.0), deadline)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBuckets:
+    """Bucket store shared by every replica through Redis."""
+
+    def __init__(self) -> None:
+        self._redis = LoopRedis("rate limiter")
+        # (client, take script, adjust script); scripts are registered per client
+        self._scripts: tuple[aioredis.Redis, object, object] | None = None
+
+    def _client(self):
+        client = self._redis.get()
+        if self._scripts is None or self._scripts[0] is not client:
+            self._scripts = (client, client.register_script(_TAKE_SCRIPT), client.register_script(_ADJUST_SCRIPT))
+        return self._scripts
+
+    async def take(self, block_key: str, amounts: dict[str, float]) -> float:
+        _, take, _ = self._client()
+        wait = await take(keys=[block_key, *amounts], args=[str(a) for a in amounts.values()])
+        return float(wait)
+
+    async def adjust(self, key: str, limit: float | None, remaining: float | None, refund: float) -> None:
+        _, _, adjust = self._client()
+        await adjust(
+            keys=[key],
+            args=["" if limit is None else str(limit), "" if remaining is None else str(remaining),
+                  str(refund), str(BUCKET_TTL_S)],
+        )
+
+    async def block(self, block_key: str, seconds: float) -> None:
+        client, _, _ = self._client()
+        await client.set(block_key, "1", px=max(1, int(seconds * 1000)))
+
+    async def close(self) -> None:
+        self._scripts = None
+        await self._redis.close()
+
+
+class RateLimiter:
+    """Reserve, calibrate and refund per-(provider, model) capacity.
+
+    Deployments with several API keys for a provider pass ``account`` (the
+    key's id) so each key gets its own buckets.
+    """
+
+    def __init__(self, shared: bool = True, max_wait_s: float = 60.0) -> None:
+        self.buckets: LocalBuckets | RedisBuckets = RedisBuckets() if shared else LocalBuckets()
+        self.max_wait_s = max_wait_s
+
+    @staticmethod
+    def _key(provider: str, model: str, dim: str, account: str = "") -> str:
+        scope = f"{provider}:{account}:{model}" if account else f"{provider}:{model}"
+        return f"{REDIS_KEY_PREFIX}{scope}:{dim}"
+
+    @classmethod
+    def _block_key(cls, provider: str, model: str, account: str = "") -> str:
+        return cls._key(provider, model, "blocked", account)
+
+    async def reserve(
+        self, provider: str, model: str, input_tokens: int, output_tokens: int, account: str = "",
+    ) -> Reservation:
+        """Wait until the call's estimated cost fits, then take it.
+
+        Gives up waiting after max_wait_s and lets the call through; the
+        provider's 429 remains the backstop.
+
+        Args:
+            provider: LLM provider name.
+            model: Model name.
+            input_tokens: Estimated input tokens (prompt + images).
+            output_tokens: Output token limit of the call.
+            account: API key id when the provider has several keys.
+
+        Returns:
+            The Reservation to settle() once usage is known.
+        """
+        amounts = _amounts(provider, input_tokens, output_tokens)
+        reservation = Reservation(provider, model, amounts, account)
+        keyed = {self._key(provider, model, dim, account): amount for dim, amount in amounts.items()}
+        block_key = self._block_key(provider, model, account)
+        waited = 0.0
+        while True:
+            try:
+                wait = await self.buckets.take(block_key, keyed)
+            except Exception as e:
+                logger.warning("Rate limiter unavailable, not limiting: %s", e)
+                reservation.amounts = {}
+                return reservation
+            if wait <= 0:
+                break
+            if waited + wait > self.max_wait_s:
+                logger.warning(
+                    "Rate limit wait for %s/%s would exceed %.0fs, sending anyway", provider, model, self.max_wait_s,
+                )
+                reservation.amounts = {}
+                break
+            # Jitter so waiters don't all retry the bucket at the same instant
+            wait *= 1 + random.random() * 0.1
+            waited += wait
+            await asyncio.sleep(wait)
+
+        if waited:
+            metrics.inc("llm_rate_limit_waits_total", provider=provider)
+            metrics.inc("llm_rate_limit_wait_seconds_total", waited, provider=provider)
+            logger.info("Waited %.1fs for %s/%s rate limit capacity", waited, provider, model)
+        return reservation
+
+    async def settle(self, reservation: Reservation, input_tokens: int | None, output_tokens: int | None) -> None:
+        """Refund the part of a reservation the call didn't use.
+
+        Args:
+            reservation: From reserve().
+            input_tokens: Actual input tokens, or None if unknown.
+            output_tokens: Actual output tokens, or None if unknown.
+        """
+        if not reservation.amounts or input_tokens is None or output_tokens is None:
+            return
+        actual = _amounts(reservation.provider, input_tokens, output_tokens)
+        for dim, reserved in reservation.amounts.items():
+            refund = reserved - actual.get(dim, reserved)
+            if refund > 0:
+                await self._adjust(
+                    reservation.provider, reservation.model, dim, None, None, refund, reservation.account,
+                )
+
+    async def observe(self, provider: str, model: str, response: httpx.Response, account: str = "") -> None:
+        """Calibrate buckets from a response; on 429, block the model until Retry-After.
+
+        Args:
+            provider: LLM provider name.
+            model: Model name.
+            response: Provider response (headers are always read; a Gemini 429 body too).
+            account: API key id when the provider has several keys.
+        """
+        observed = parse_rate_limit_headers(provider, response.headers)
+        delay = retry_after_seconds(response.headers)
+        if provider == "google" and response.status_code == 429:
+            try:
+                body = response.json()
+            except Exception:
+                body = None
+            quotas, retry_delay = parse_gemini_quota(body)
+            observed.update(quotas)
+            delay = delay if delay is not None else retry_delay
+
+        for dim, (limit, remaining) in observed.items():
+            await self._adjust(provider, model, dim, limit, remaining, 0.0, account)
+            metrics.set_gauge("llm_rate_limit_per_minute", limit, provider=provider, model=model, dimension=dim)
+
+        if response.status_code == 429:
+            seconds = delay if delay is not None else 1.0
+            metrics.inc("llm_rate_limit_blocks_total", provider=provider)
+            try:
+                await self.buckets.block(self._block_key(provider, model, account), seconds)
+            except Exception as e:
+                logger.warning("Rate limiter unavailable, block not recorded: %s", e)
+
+    async def _adjust(
+        self,
+        provider: str,
+        model: str,
+        dim: str,
+        limit: float | None,
+        remaining: float | None,
+        refund: float,
+        account: str = "",
+    ) -> None:
+        try:
+            await self.buckets.adjust(self._key(provider, model, dim, account), limit, remaining, refund)
+        except Exception as e:
+            logger.warning("Rate limiter unavailable, bucket not updated: %s", e)
+
+    async def close(self) -> None:
+        await self.buckets.close()
+
+
+_limiter: RateLimiter | None = None
+
+
+def get_limiter() -> RateLimiter | None:
+    """Return the process-wide limiter built from settings, or None if disabled."""
+    global _limiter
+    if not settings.llm_rate_limiting:
+        return None
+    if _limiter is None:
+        _limiter = RateLimiter(shared=settings.llm_rate_limit_shared, max_wait_s=settings.llm_rate_limit_max_wait_s)
+        logger.info(
+            "LLM rate limiting: %s buckets, max wait %.0fs",
+            "Redis" if settings.llm_rate_limit_shared else "in-process", settings.llm_rate_limit_max_wait_s,
+        )
+    return _limiter
+
+
+async def close() -> None:
+    """Close and forget the process-wide limiter. Called on consumer shutdown."""
+    global _limiter
+    limiter, _limiter = _limiter, None
+    if limiter is not None:
+        await limiter.close()
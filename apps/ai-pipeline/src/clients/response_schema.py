@@ -0,0 +1,127 @@
+"""JSON schemas for provider-native structured output, generated from result dataclasses.
+
+Each analyzer's wire format is its result dataclass with camelCase keys,
+minus the fields computed locally (imperial conversions, free-text notes,
+genus). dataclass_schema() derives the schema from the type hints, with
+enum sets (VALID_OBSERVATIONS, VALID_SITE_TYPES, ...) constraining the
+string fields, so the schema can't drift from the parser's expectations.
+
+Schemas are written in the strict subset OpenAI accepts — every property
+required, nullable fields typed ["<type>", "null"], no additional
+properties — which Anthropic tool input_schema takes as-is. Gemini's
+responseSchema is an OpenAPI subset and gets a converted copy.
+"""
+
+import dataclasses
+import types
+import typing
+from collections.abc import Collection, Mapping
+from dataclasses import dataclass
+
+_JSON_TYPES: dict[type, str] = {str: "string", float: "number", int: "integer", bool: "boolean"}
+
+
+@dataclass(frozen=True)
+class ResponseSchema:
+    """A named output schema for one analyzer call."""
+
+    name: str  # tool / schema name: letters, digits, underscores
+    schema: dict
+    description: str = ""
+
+
+def camel_case(name: str) -> str:
+    """snake_case field name → camelCase wire key (dbh_cm → dbhCm)."""
+    head, *rest = name.split("_")
+    return head + "".join(part.capitalize() for part in rest)
+
+
+def _type_schema(hint: object, enum: Collection[str] | None) -> dict:
+    nullable = False
+    if isinstance(hint, types.UnionType) or typing.get_origin(hint) is typing.Union:
+        args = [a for a in typing.get_args(hint) if a is not type(None)]
+        nullable = len(args) < len(typing.get_args(hint))
+        if len(args) != 1:
+            raise TypeError(f"Unsupported union for a response schema: {hint}")
+        hint = args[0]
+
+    if typing.get_origin(hint) is list:
+        (item,) = typing.get_args(hint)
+        schema: dict = {"type": "array", "items": _type_schema(item, enum)}
+    elif hint in _JSON_TYPES:
+        schema = {"type": _JSON_TYPES[hint]}  # type: ignore[index]
+        if enum is not None:
+            schema["enum"] = sorted(enum)  # sorted: the schema is part of the cache key
+    else:
+        raise TypeError(f"Unsupported type for a response schema: {hint}")
+
+    if nullable:
+        schema["type"] = [schema["type"], "null"]
+        if "enum" in schema:
+            schema["enum"] = [*schema["enum"], None]
+    return schema
+
+
+def dataclass_schema(
+    cls: type,
+    exclude: Collection[str] = (),
+    enums: Mapping[str, Collection[str]] | None = None,
+) -> dict:
+    """Build a strict object schema from a result dataclass.
+
+    Args:
+        cls: Result dataclass.
+        exclude: Fields the model doesn't produce (computed after parsing).
+        enums: Field name → allowed string values (for str or list[str] fields).
+
+    Returns:
+        JSON schema with camelCase properties, all required.
+    """
+    enums = enums or {}
+    hints = typing.get_type_hints(cls)
+    properties = {
+        camel_case(f.name): _type_schema(hints[f.name], enums.get(f.name))
+        for f in dataclasses.fields(cls)
+        if f.name not in exclude
+    }
+    return object_schema(properties)
+
+
+def object_schema(properties: dict[str, dict]) -> dict:
+    """Strict object schema over the given properties (all required)."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def to_gemini_schema(schema: dict) -> dict:
+    """Convert a strict JSON schema to Gemini's OpenAPI-style responseSchema.
+
+    Gemini marks nullability with "nullable" instead of a type list and
+    rejects additionalProperties.
+
+    Args:
+        schema: Schema from dataclass_schema() / object_schema().
+
+    Returns:
+        Equivalent Gemini schema.
+    """
+    converted: dict = {}
+    for key, value in schema.items():
+        if key == "additionalProperties":
+            continue
+        if key == "type" and isinstance(value, list):
+            converted["type"] = next(t for t in value if t != "null")
+            converted["nullable"] = "null" in value
+        elif key == "enum":
+            converted["enum"] = [v for v in value if v is not None]
+        elif key == "properties":
+            converted["properties"] = {name: to_gemini_schema(s) for name, s in value.items()}
+        elif key == "items":
+            converted["items"] = to_gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
@@ -0,0 +1,84 @@
+"""Per-analyzer LLM routing — provider, model and output budget per analyzer.
+
+Analyzers need different things from the LLM. Species benefits from the
+strong model, while site assessment does fine on a fast model with a
+300-token cap. LLM_ROUTES is a JSON object keyed by analyzer ("species",
+"health", "site", "measurements", "fused"), with "*" for every analyzer:
+
+    LLM_ROUTES='{"*": {"temperature": 0},
+                 "site": {"provider": "anthropic", "model": "claude-haiku-4-5", "max_tokens": 300}}'
+
+Each entry may set provider, model, max_tokens, temperature, stop (a list
+of stop sequences) and timeout. The analyzer's entry overrides "*". Fields
+set in neither keep query()'s defaults: LLM_PROVIDER, LLM_MODEL, 1024
+tokens, the stage timeout and the provider's default temperature.
+
+Single-route settings (LLM_FAILOVER entries, LLM_HEDGE_ROUTE,
+LLM_CASCADE_ROUTE, LLM_BUDGET_ROUTE) are "provider:model" strings, read
+with parse_route().
+"""
+
+import logging
+from dataclasses import dataclass, fields
+from typing import Any
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+ANY = "*"
+
+
+@dataclass(frozen=True)
+class AnalyzerRoute:
+    """Where and how one analyzer's LLM calls go. None means query()'s default."""
+
+    provider: str | None = None
+    model: str | None = None
+    max_tokens: int | None = None
+    temperature: float | None = None
+    stop: tuple[str, ...] = ()
+    timeout: float | None = None
+
+    def query_kwargs(self) -> dict[str, Any]:
+        """Keyword arguments for llm.query(), with unset fields left out."""
+        return {f.name: getattr(self, f.name) for f in fields(self) if getattr(self, f.name) not in (None, ())}
+
+
+_FIELDS = {f.name for f in fields(AnalyzerRoute)}
+
+
+def route_for(analyzer: str) -> AnalyzerRoute:
+    """Resolve LLM_ROUTES for one analyzer.
+
+    Args:
+        analyzer: Analyzer name ("species", "health", ...).
+
+    Returns:
+        The merged "*" and analyzer entries.
+
+    Raises:
+        ValueError: If an entry has a field AnalyzerRoute doesn't know.
+    """
+    merged: dict[str, Any] = {}
+    for key in (ANY, analyzer):
+        entry = settings.llm_routes.get(key) or {}
+        unknown = set(entry) - _FIELDS
+        if unknown:
+            raise ValueError(f"Unknown LLM_ROUTES field(s) for {key!r}: {', '.join(sorted(unknown))}")
+        merged.update(entry)
+    if isinstance(merged.get("stop"), str):
+        merged["stop"] = [merged["stop"]]
+    if "stop" in merged:
+        merged["stop"] = tuple(merged["stop"] or ())
+    return AnalyzerRoute(**merged)
+
+
+def parse_route(entry: str) -> tuple[str, str] | None:
+    """Parse a "provider:model" setting entry; None (with a warning if non-blank) when malformed."""
+    route_prov, sep, route_mdl = entry.strip().partition(":")
+    if sep and route_prov and route_mdl:
+        return route_prov, route_mdl
+    if entry.strip():
+        logger.warning("Ignoring malformed LLM route %r (expected provider:model)", entry)
+    return None
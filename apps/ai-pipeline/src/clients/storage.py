@@ -35,6 +35,7 @@ class ObservationRecord:
     latitude: float
     longitude: float
     status: str
+    contract_id: str | None = None  # contract of the tree's zone, for LLM budgets
 
 
 @dataclass
@@ -81,7 +82,11 @@ async def fetch_observation(pool: asyncpg.Pool, observation_id: str) -> Observat
         ObservationRecord or None if not found.
     """
     row = await pool.fetchrow(
-        "SELECT id, tree_id, latitude, longitude, status FROM observations WHERE id = $1",
+        "SELECT o.id, o.tree_id, o.latitude, o.longitude, o.status, z.contract_id "
+        "FROM observations o "
+        "LEFT JOIN trees t ON t.id = o.tree_id "
+        "LEFT JOIN contract_zones z ON z.id = t.contract_zone_id "
+        "WHERE o.id = $1",
         uuid.UUID(observation_id),
     )
     if row is None:
@@ -94,6 +99,7 @@ async def fetch_observation(pool: asyncpg.Pool, observation_id: str) -> Observat
         latitude=row["latitude"],
         longitude=row["longitude"],
         status=row["status"],
+        contract_id=str(row["contract_id"]) if row.get("contract_id") else None,
     )
 
 
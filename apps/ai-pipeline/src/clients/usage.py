@@ -0,0 +1,389 @@
+"""LLM token and cost accounting per observation, analyzer and provider, with daily budgets.
+
+Every LLM response is normalized to the same counters, whatever provider
+sent it: uncached input tokens, output tokens, prompt-cache reads and
+writes, and the number of images. Anthropic reports cache tokens apart
+from input_tokens. OpenAI and Gemini include them in the prompt count,
+so they are subtracted here. The estimated cost comes from PRICES
+(USD per million tokens, longest model-prefix match, LLM_PRICES
+overrides). Batch-API calls are billed at BATCH_DISCOUNT.
+
+Answers served from the LLM response cache count as calls but cost
+nothing. Every upstream call is counted, including a hedge that lost the
+race. A call cancelled after its request was sent (the losing hedge still
+in flight) is counted at its estimated input tokens.
+
+run_pipeline opens a ``track()`` ledger per observation. Every
+``llm.query()`` made inside it adds to the ledger's totals by analyzer
+and by provider/model. The totals are posted with the AI result as
+``usage``, and the API stores them in ``observations.ai_usage``. They are
+also exported as ``llm_tokens_total`` and ``llm_cost_usd_total`` metrics.
+
+Budgets: LLM_DAILY_BUDGET_USD caps all spend per UTC day, and
+LLM_CONTRACT_DAILY_BUDGETS_USD caps each contract's spend per day (the
+contract of the observed tree's zone). Once spend passes
+LLM_BUDGET_THRESHOLD of an applicable budget, queries go to
+LLM_BUDGET_ROUTE instead of the model they asked for. Spend lives in
+Redis (shared by every replica) or in process, like the rate limiter's
+buckets. Redis failures fail open.
+"""
+
+import contextlib
+import contextvars
+import datetime
+import logging
+from collections.abc import Iterator
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING
+
+import redis.asyncio as aioredis
+
+from src.clients.http import LoopRedis
+from src.config import settings
+from src.utils import metrics
+
+if TYPE_CHECKING:
+    from src.clients.llm import LLMResponse
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "ai-pipeline:spend:"
+SPEND_TTL_S = 2 * 24 * 3600
+
+# Provider batch APIs bill half the live price
+BATCH_DISCOUNT = 0.5
+
+
+@dataclass(frozen=True)
+class Price:
+    """USD per million tokens."""
+
+    input: float
+    output: float
+    cache_read: float
+    cache_write: float
+
+
+# Longest matching model prefix wins; LLM_PRICES entries override or extend these
+PRICES: dict[str, Price] = {
+    "claude-opus-4": Price(15.0, 75.0, 1.50, 18.75),
+    "claude-sonnet-4": Price(3.0, 15.0, 0.30, 3.75),
+    "claude-haiku-4-5": Price(1.0, 5.0, 0.10, 1.25),
+    "claude-3-5-haiku": Price(0.8, 4.0, 0.08, 1.00),
+    "gpt-4o-mini": Price(0.15, 0.60, 0.075, 0.15),
+    "gpt-4o": Price(2.50, 10.0, 1.25, 2.50),
+    "gpt-4.1-mini": Price(0.40, 1.60, 0.10, 0.40),
+    "gpt-4.1": Price(2.0, 8.0, 0.50, 2.0),
+    "gemini-2.0-flash": Price(0.10, 0.40, 0.025, 0.10),
+    "gemini-2.5-flash": Price(0.30, 2.50, 0.075, 0.30),
+    "gemini-2.5-pro": Price(1.25, 10.0, 0.31, 1.25),
+}
+
+
+def price_for(model: str) -> Price | None:
+    """The price of model, or None if neither PRICES nor LLM_PRICES knows it."""
+    table = dict(PRICES)
+    for prefix, entry in settings.llm_prices.items():
+        # Cache reads/writes default to the input price when the override leaves them out
+        input_price = entry.get("input", 0.0)
+        table[prefix] = Price(
+            input_price, entry.get("output", 0.0),
+            entry.get("cache_read", input_price), entry.get("cache_write", input_price),
+        )
+    matches = [prefix for prefix in table if model.startswith(prefix)]
+    return table[max(matches, key=len)] if matches else None
+
+
+@dataclass
+class Usage:
+    """Normalized token counts and estimated cost for one or more LLM calls."""
+
+    calls: int = 0
+    cached_calls: int = 0  # answered from the LLM response cache, no tokens billed
+    input_tokens: int = 0  # billed at the full input price (prompt-cache reads/writes excluded)
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    images: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, other: "Usage") -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def as_dict(self) -> dict:
+        """camelCase counters for the AI result payload."""
+        return {
+            "calls": self.calls,
+            "cachedCalls": self.cached_calls,
+            "inputTokens": self.input_tokens,
+            "outputTokens": self.output_tokens,
+            "cacheReadTokens": self.cache_read_tokens,
+            "cacheWriteTokens": self.cache_write_tokens,
+            "images": self.images,
+            "costUsd": round(self.cost_usd, 6),
+        }
+
+
+def normalize(response: "LLMResponse", model: str, images: int, batched: bool = False) -> Usage:
+    """Normalize one response's usage block and price it.
+
+    Args:
+        response: The LLM response.
+        model: Model to price when the response doesn't name one.
+        images: Images sent with the request.
+        batched: Whether it went through a provider batch API.
+
+    Returns:
+        Usage for one call.
+    """
+    if response.cached:
+        return Usage(calls=1, cached_calls=1, images=images)
+
+    cache_read, cache_write = response.cache_read_tokens, response.cache_write_tokens
+    prompt = response.input_tokens or 0
+    if response.provider != "anthropic":
+        # OpenAI prompt_tokens and Gemini promptTokenCount include the cached prefix
+        prompt = max(0, prompt - cache_read)
+    usage = Usage(
+        calls=1,
+        input_tokens=prompt,
+        output_tokens=response.output_tokens or 0,
+        cache_read_tokens=cache_read,
+        cache_write_tokens=cache_write,
+        images=images,
+    )
+
+    price = price_for(response.model or model) or price_for(model)
+    if price is None:
+        metrics.inc("llm_unpriced_calls_total", provider=response.provider, model=response.model or model)
+        return usage
+    usage.cost_usd = (
+        usage.input_tokens * price.input
+        + usage.output_tokens * price.output
+        + usage.cache_read_tokens * price.cache_read
+        + usage.cache_write_tokens * price.cache_write
+    ) / 1_000_000 * (BATCH_DISCOUNT if batched else 1.0)
+    return usage
+
+
+@dataclass
+class UsageLedger:
+    """Usage for one observation, by analyzer and by provider/model."""
+
+    contract_id: str | None = None
+    total: Usage = field(default_factory=Usage)
+    by_analyzer: dict[str, Usage] = field(default_factory=dict)
+    by_model: dict[str, Usage] = field(default_factory=dict)
+
+    def add(self, usage: Usage, analyzer: str, model_key: str) -> None:
+        self.total.add(usage)
+        self.by_analyzer.setdefault(analyzer, Usage()).add(usage)
+        self.by_model.setdefault(model_key, Usage()).add(usage)
+
+    def as_dict(self) -> dict:
+        """Totals plus the byAnalyzer and byModel breakdowns, for the AI result payload."""
+        return {
+            **self.total.as_dict(),
+            "byAnalyzer": {name: u.as_dict() for name, u in sorted(self.by_analyzer.items())},
+            "byModel": {name: u.as_dict() for name, u in sorted(self.by_model.items())},
+        }
+
+
+_ledger: contextvars.ContextVar[UsageLedger | None] = contextvars.ContextVar("llm_usage_ledger", default=None)
+
+
+@contextlib.contextmanager
+def track(contract_id: str | None = None) -> Iterator[UsageLedger]:
+    """Account LLM calls made inside the block (and tasks it starts) to one ledger.
+
+    Args:
+        contract_id: Contract the work is billed to, for its budget.
+    """
+    ledger = UsageLedger(contract_id=contract_id)
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+async def record(
+    response: "LLMResponse", provider: str, model: str, analyzer: str | None, images: int, batched: bool = False,
+) -> Usage:
+    """Account one LLM call: current ledger, metrics and budget spend.
+
+    Args:
+        response: The LLM response.
+        provider: Provider the call went to.
+        model: Model the call asked for.
+        analyzer: Calling analyzer.
+        images: Images sent with the request.
+        batched: Whether it went through a provider batch API.
+
+    Returns:
+        The call's normalized usage.
+    """
+    usage = normalize(response, model, images, batched)
+    await _account(usage, provider, model, analyzer)
+    return usage
+
+
+async def record_abandoned(provider: str, model: str, analyzer: str | None, input_tokens: int, images: int) -> Usage:
+    """Account a call cancelled after its request was sent (e.g. a losing hedge).
+
+    The provider still bills the prompt it read, but no response says how
+    much, so the caller's input estimate is priced at the input rate.
+
+    Args:
+        provider: Provider the call went to.
+        model: Model the call asked for.
+        analyzer: Calling analyzer.
+        input_tokens: Estimated input tokens of the request.
+        images: Images sent with the request.
+
+    Returns:
+        The call's estimated usage.
+    """
+    usage = Usage(calls=1, input_tokens=input_tokens, images=images)
+    price = price_for(model)
+    if price is not None:
+        usage.cost_usd = input_tokens * price.input / 1_000_000
+    metrics.inc("llm_abandoned_calls_total", provider=provider, analyzer=analyzer or "default")
+    await _account(usage, provider, model, analyzer)
+    return usage
+
+
+async def _account(usage: Usage, provider: str, model: str, analyzer: str | None) -> None:
+    """Add one call's usage to the metrics, the current ledger and budget spend."""
+    analyzer = analyzer or "default"
+    labels = {"provider": provider, "model": model, "analyzer": analyzer}
+    for kind in ("input", "output", "cache_read", "cache_write"):
+        count = getattr(usage, f"{kind}_tokens")
+        if count:
+            metrics.inc("llm_tokens_total", count, kind=kind, **labels)
+    if usage.cost_usd:
+        metrics.inc("llm_cost_usd_total", usage.cost_usd, **labels)
+
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.add(usage, analyzer, f"{provider}/{model}")
+    if usage.cost_usd and _budgets(ledger):
+        await get_spend().add(_scopes(ledger), usage.cost_usd)
+
+
+def _budgets(ledger: UsageLedger | None) -> dict[str, float]:
+    """Applicable budget scope → USD per day."""
+    budgets = {}
+    if settings.llm_daily_budget_usd > 0:
+        budgets["daily"] = settings.llm_daily_budget_usd
+    contract_id = ledger.contract_id if ledger is not None else None
+    if contract_id and settings.llm_contract_daily_budgets_usd.get(contract_id, 0) > 0:
+        budgets[f"contract:{contract_id}"] = settings.llm_contract_daily_budgets_usd[contract_id]
+    return budgets
+
+
+def _scopes(ledger: UsageLedger | None) -> list[str]:
+    scopes = ["daily"]
+    if ledger is not None and ledger.contract_id:
+        scopes.append(f"contract:{ledger.contract_id}")
+    return scopes
+
+
+async def over_budget() -> str | None:
+    """The budget scope ("daily" or "contract:<id>") whose spend has passed LLM_BUDGET_THRESHOLD, if any."""
+    budgets = _budgets(_ledger.get())
+    if not budgets or not settings.llm_budget_route:
+        return None
+    spent = await get_spend().get(list(budgets))
+    for scope, budget in budgets.items():
+        if spent.get(scope, 0.0) >= budget * settings.llm_budget_threshold:
+            return scope
+    return None
+
+
+def _day() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+class LocalSpend:
+    """Spend per (day, scope) in this process."""
+
+    def __init__(self) -> None:
+        self._spent: dict[str, float] = {}
+
+    async def add(self, scopes: list[str], cost: float) -> None:
+        day = _day()
+        for key in list(self._spent):
+            if not key.startswith(day):
+                del self._spent[key]
+        for scope in scopes:
+            key = f"{day}:{scope}"
+            self._spent[key] = self._spent.get(key, 0.0) + cost
+
+    async def get(self, scopes: list[str]) -> dict[str, float]:
+        day = _day()
+        return {scope: self._spent.get(f"{day}:{scope}", 0.0) for scope in scopes}
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisSpend:
+    """Spend per (day, scope) shared by every replica through Redis."""
+
+    def __init__(self) -> None:
+        self._redis = LoopRedis("spend store")
+        self._fallback = LocalSpend()
+
+    def _client(self) -> aioredis.Redis:
+        return self._redis.get()
+
+    async def add(self, scopes: list[str], cost: float) -> None:
+        day = _day()
+        try:
+            async with self._client().pipeline(transaction=False) as pipe:
+                for scope in scopes:
+                    pipe.incrbyfloat(f"{REDIS_KEY_PREFIX}{day}:{scope}", cost)
+                    pipe.expire(f"{REDIS_KEY_PREFIX}{day}:{scope}", SPEND_TTL_S)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Spend store unavailable, counting in process: %s", e)
+            await self._fallback.add(scopes, cost)
+
+    async def get(self, scopes: list[str]) -> dict[str, float]:
+        day = _day()
+        try:
+            values = await self._client().mget([f"{REDIS_KEY_PREFIX}{day}:{scope}" for scope in scopes])
+        except Exception as e:
+            logger.warning("Spend store unavailable, using in-process spend: %s", e)
+            return await self._fallback.get(scopes)
+        return {scope: float(value or 0.0) for scope, value in zip(scopes, values)}
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+_spend: LocalSpend | RedisSpend | None = None
+
+
+def get_spend() -> LocalSpend | RedisSpend:
+    """Return the process-wide spend store built from settings."""
+    global _spend
+    if _spend is None:
+        _spend = RedisSpend() if settings.llm_budget_shared else LocalSpend()
+    return _spend
+
+
+async def close() -> None:
+    """Close and forget the spend store. Called on consumer shutdown."""
+    global _spend
+    spend, _spend = _spend, None
+    if spend is not None:
+        await spend.close()
+
+
+def reset() -> None:
+    """Forget recorded spend (tests)."""
+    global _spend
+    _spend = None
@@ -1,5 +1,7 @@
 """Configuration — all env vars and settings loaded via pydantic-settings."""
 
+from typing import Any
+
 from pydantic_settings import BaseSettings
 
 
@@ -23,6 +25,11 @@ class Settings(BaseSettings):
     anthropic_api_key: str = ""
     openai_api_key: str = ""
     google_api_key: str = ""
+    # Key pools, balanced per request (see src/clients/credentials.py): comma-separated
+    # "key[@https://endpoint][*weight]"; the single key above joins its provider's pool
+    anthropic_api_keys: str = ""
+    openai_api_keys: str = ""
+    google_api_keys: str = ""
 
     # Internal API
     internal_api_key: str = ""
@@ -31,10 +38,106 @@ class Settings(BaseSettings):
     # LLM config
     llm_provider: str = "anthropic"  # "anthropic", "openai", or "google"
     llm_model: str = "claude-sonnet-4-5-20250929"
+    llm_analysis_mode: str = "separate"  # "separate" (one call per analyzer) or "fused" (one call for all four)
+    # Per-analyzer overrides (see src/clients/routing.py): JSON object keyed by analyzer or "*", e.g.
+    # {"site": {"model": "claude-haiku-4-5", "max_tokens": 300}, "species": {"temperature": 0}}
+    llm_routes: dict[str, dict[str, Any]] = {}
+
+    # LLM image encoding (see PreparedPhoto.for_llm in src/utils/images.py)
+    llm_image_max_bytes: int = 350_000  # per-image budget before base64
+    llm_image_webp: bool = True  # prefer WebP over JPEG when it fits the budget
+
+    # Provider prompt caching of the shared image prefix (Anthropic cache_control, Gemini cachedContents)
+    llm_prompt_caching: bool = False
+    llm_prompt_cache_ttl_s: int = 300  # Gemini cachedContents TTL
+
+    # Provider-native structured output: analyzers send their JSON schema
+    # (Anthropic forced tool use, OpenAI json_schema, Gemini responseSchema)
+    llm_structured_output: bool = False
+
+    # Stream responses over SSE and stop reading once the JSON object closes (see src/clients/llm_stream.py)
+    llm_streaming: bool = False
+
+    # Cluster-wide LLM rate limiting, calibrated from provider headers (see src/clients/rate_limit.py)
+    llm_rate_limiting: bool = False
+    llm_rate_limit_shared: bool = True  # buckets in redis_url, shared by every replica
+    llm_rate_limit_max_wait_s: float = 60.0  # past this, send anyway and let a 429 decide
+
+    # Circuit breakers per provider/model and ordered failover (see src/utils/circuit.py)
+    llm_failover: str = ""  # comma-separated "provider:model" routes tried after llm_provider/llm_model
+    llm_circuit_failure_threshold: int = 5  # consecutive timeouts/5xx that open a circuit
+    llm_circuit_reset_s: float = 30.0  # how long an open circuit refuses calls before probing
+
+    # Hedged requests: race a second call against one slower than the percentile (see src/clients/hedge.py)
+    llm_hedging: bool = False
+    llm_hedge_percentile: float = 95.0  # of recent latencies per provider and analyzer
+    llm_hedge_min_samples: int = 20  # don't hedge until the window has this many calls
+    llm_hedge_route: str = ""  # "provider:model" for the hedge; empty = same provider/model
+    llm_hedge_budget_pct: float = 5.0  # hedges as a percentage of calls
+
+    # Cheap-first cascade (see src/analyzers/cascade.py): ask this model first and
+    # escalate to llm_provider/llm_model when its answer is unusable or unsure
+    llm_cascade_route: str = ""  # "provider:model", e.g. "anthropic:claude-haiku-4-5"; empty = off
+    llm_cascade_species_min_confidence: float = 0.7
+    llm_cascade_health_min_confidence: float = 0.6
+    llm_cascade_site_min_fields: int = 6  # of the 10 site fields
+
+    # Text-only repair re-prompt when an answer fails validation (see src/analyzers/repair.py)
+    llm_repair: bool = False
+
+    # Provider batch jobs for bulk reprocessing (see src/clients/llm_batch.py and src/reprocess.py)
+    llm_batch_flush_s: float = 5.0  # gather requests this long before submitting a job
+    llm_batch_max_requests: int = 10000  # submit early at this many requests
+    llm_batch_poll_s: float = 60.0
+    reprocess_concurrency: int = 200  # observations in flight during a reprocess run
+
+    # Token/cost accounting and budgets (see src/clients/usage.py). Prices: USD per million tokens by
+    # model prefix, overriding usage.PRICES, e.g. {"claude-sonnet-4": {"input": 3, "output": 15}}
+    llm_prices: dict[str, dict[str, float]] = {}
+    llm_daily_budget_usd: float = 0.0  # all LLM spend per UTC day; 0 = no budget
+    llm_contract_daily_budgets_usd: dict[str, float] = {}  # contract ID → USD per UTC day
+    llm_budget_threshold: float = 0.9  # fraction of a budget after which queries take llm_budget_route
+    llm_budget_route: str = ""  # cheaper "provider:model"
+    llm_budget_shared: bool = True  # spend in redis_url, shared by every replica
+
+    # LLM response cache (see src/clients/llm_cache.py)
+    llm_cache_enabled: bool = True
+    llm_cache_max_bytes: int = 64 * 1024 * 1024  # in-process LRU budget
+    llm_cache_redis: bool = False  # shared tier in redis_url, for multi-replica deployments
+    llm_cache_ttl_s: int = 7 * 24 * 3600
+
+    # Outbound HTTP (pooled clients, see src/clients/http.py)
+    http2_enabled: bool = True
+    http_keepalive_expiry_s: float = 30.0
+
+    # Retries (see src/utils/retry.py): retries may add at most this percentage to first attempts
+    retry_budget_pct: float = 20.0
+
+    # Adaptive timeouts (see src/utils/timeouts.py): quantile of recent latency × multiplier,
+    # clamped per stage; the fixed per-stage defaults apply until min_samples are seen
+    adaptive_timeouts: bool = False
+    timeout_quantile: float = 99.0
+    timeout_multiplier: float = 2.0
+    timeout_min_samples: int = 50
+
+    # Bulkheads (see src/utils/bulkhead.py): concurrent outbound calls, queued FIFO beyond the limit; 0 = unlimited
+    llm_max_concurrent_calls: int = 0  # per provider
+    llm_max_concurrent_calls_per_analyzer: int = 0  # per provider and analyzer, inside the provider limit
+    plantnet_max_concurrent_calls: int = 0
 
     # Operational
     log_level: str = "INFO"
     max_concurrent_jobs: int = 3
+    metrics_interval_s: float = 60.0
+
+    # Adaptive concurrency (AIMD) — starts at max_concurrent_jobs
+    adaptive_concurrency: bool = False
+    min_concurrent_jobs: int = 1
+    max_adaptive_concurrent_jobs: int = 12
+    concurrency_adjust_interval_s: float = 15.0
+    concurrency_target_latency_s: float = 20.0
+    concurrency_max_rate_limited: float = 0.05  # fraction of upstream calls answered 429
+    concurrency_max_error_rate: float = 0.10
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
@@ -3,6 +3,8 @@
 import asyncio
 import json
 import logging
+import socket
+import time
 from typing import Any
 
 import redis.asyncio as aioredis
@@ -11,6 +13,9 @@ from bullmq import Worker
 import asyncpg
 
 from src.config import settings
+from src.clients import http, llm_cache, rate_limit, usage
+from src.utils import metrics
+from src.utils.concurrency import AdaptiveConcurrency, install as install_controller
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +31,12 @@ DLQ_KEY = "ai-pipeline:dead-letter"
 # Max attempts before sending to DLQ
 MAX_JOB_ATTEMPTS = 3
 
+# Per-worker metrics snapshot, published every settings.metrics_interval_s
+METRICS_KEY_PREFIX = "ai-pipeline:metrics"
+
+# Jobs currently inside process_job on this worker
+_in_flight = 0
+
 
 async def send_to_dlq(
     observation_id: str,
@@ -65,7 +76,7 @@ async def process_job(job: Any, token: str | None = None) -> Any:
     Returns:
         The observation ID that was processed.
     """
-    global _db_pool
+    global _db_pool, _in_flight
 
     data: dict = job.data
     observation_id = data.get("observationId")
@@ -82,7 +93,17 @@ async def process_job(job: Any, token: str | None = None) -> Any:
     # Import here to avoid circular imports
     from src.pipeline import run_pipeline
 
-    success = await run_pipeline(observation_id, _db_pool)
+    _in_flight += 1
+    metrics.set_gauge("consumer_jobs_in_flight", _in_flight)
+    started = time.monotonic()
+    try:
+        success = await run_pipeline(observation_id, _db_pool)
+    finally:
+        _in_flight -= 1
+        metrics.set_gauge("consumer_jobs_in_flight", _in_flight)
+        metrics.inc("consumer_job_seconds_total", time.monotonic() - started)
+
+    metrics.inc("consumer_jobs_total", outcome="success" if success else "failure")
     if not success:
         attempt = getattr(job, "attemptsMade", 1)
         if attempt >= MAX_JOB_ATTEMPTS:
@@ -112,6 +133,24 @@ def _parse_redis_url(url: str) -> tuple[str, int]:
     return stripped, 6379
 
 
+async def publish_metrics(client: aioredis.Redis, key: str) -> None:
+    """Log the metrics snapshot and mirror it into a Redis hash.
+
+    Args:
+        client: Redis client used for the publish.
+        key: Hash key for this worker's snapshot.
+    """
+    snapshot = metrics.snapshot()
+    logger.info("Metrics: %s", json.dumps(snapshot, sort_keys=True))
+    if not snapshot:
+        return
+    try:
+        await client.hset(key, mapping=snapshot)
+        await client.expire(key, int(settings.metrics_interval_s * 3))
+    except Exception:
+        logger.warning("Failed to publish metrics to %s", key, exc_info=True)
+
+
 async def run_consumer() -> None:
     """Start the BullMQ consumer loop. Runs until cancelled."""
     global _db_pool
@@ -125,21 +164,67 @@ async def run_consumer() -> None:
     _db_pool = await get_db_pool()
     logger.info("Database pool initialized")
 
+    if settings.llm_prompt_caching and settings.llm_structured_output:
+        logger.warning(
+            "LLM_PROMPT_CACHING has no effect on Anthropic calls while LLM_STRUCTURED_OUTPUT is on "
+            "(each analyzer's tool precedes the cached photos)",
+        )
+
+    controller: AdaptiveConcurrency | None = None
+    if settings.adaptive_concurrency:
+        controller = AdaptiveConcurrency(
+            initial=settings.max_concurrent_jobs,
+            minimum=settings.min_concurrent_jobs,
+            maximum=settings.max_adaptive_concurrent_jobs,
+            target_latency_s=settings.concurrency_target_latency_s,
+            max_rate_limited=settings.concurrency_max_rate_limited,
+            max_error_rate=settings.concurrency_max_error_rate,
+        )
+        install_controller(controller)
+    concurrency = controller.limit if controller else settings.max_concurrent_jobs
+    metrics.set_gauge("consumer_concurrency_limit", concurrency)
+
+    # Pools sized for the highest concurrency this worker can reach
+    http.configure(controller.maximum if controller else concurrency)
+
     worker = Worker(
         QUEUE_NAME,
         process_job,
-        {"connection": {"host": host, "port": port}},
+        {"connection": {"host": host, "port": port}, "concurrency": concurrency},
+    )
+
+    logger.info(
+        "Consumer started with concurrency=%d (adaptive=%s), waiting for jobs...",
+        concurrency, controller is not None,
     )
 
-    logger.info("Consumer started, waiting for jobs...")
+    metrics_client = aioredis.Redis(host=host, port=port, decode_responses=True)
+    metrics_key = f"{METRICS_KEY_PREFIX}:{socket.gethostname()}"
+    loop = asyncio.get_running_loop()
+    next_adjust = loop.time() + settings.concurrency_adjust_interval_s
+    next_publish = loop.time() + settings.metrics_interval_s
 
     try:
         while True:
             await asyncio.sleep(1)
+            now = loop.time()
+            if controller is not None and now >= next_adjust:
+                # BullMQ re-reads opts["concurrency"] before fetching each job
+                worker.opts["concurrency"] = controller.adjust(_in_flight)
+                next_adjust = now + settings.concurrency_adjust_interval_s
+            if now >= next_publish:
+                await publish_metrics(metrics_client, metrics_key)
+                next_publish = now + settings.metrics_interval_s
     except asyncio.CancelledError:
         logger.info("Consumer shutting down...")
     finally:
+        install_controller(None)
         await worker.close()
+        await metrics_client.aclose()
+        await http.close_all()
+        await llm_cache.close()
+        await rate_limit.close()
+        await usage.close()
         if _db_pool is not None:
             await _db_pool.close()
             _db_pool = None
@@ -3,11 +3,16 @@
 import asyncio
 import json
 import logging
+import time
 from dataclasses import dataclass, asdict
 
 import httpx
 
 from src.config import settings
+from src.clients import usage
+from src.clients.http import get_client
+from src.clients.image_policy import encode_variants
+from src.clients.llm import prompt_caching
 from src.clients.storage import (
     fetch_observation_photos,
     ObservationRecord,
@@ -17,12 +22,21 @@ from src.analyzers.species import analyze_species, SpeciesResult
 from src.analyzers.health import analyze_health, HealthResult
 from src.analyzers.measurements import analyze_measurements, MeasurementResult
 from src.analyzers.site import analyze_site, SiteResult
+from src.analyzers.fused import analyze_fused
+from src.utils.geocode import reverse_geocode
+from src.utils.images import PreparedPhoto, prepare_photos
 from src.utils.quality import filter_quality_photos
+from src.utils import metrics, timeouts
+from src.utils.retry import RetryPolicy, Retrier
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = 30.0
-MAX_RETRIES = 3
+TIMEOUT_POLICY = timeouts.TimeoutPolicy("internal_api", default_s=DEFAULT_TIMEOUT, floor_s=2.0, ceiling_s=30.0)
+RETRY_POLICY = RetryPolicy("internal_api", max_attempts=3, base_delay_s=1.0, max_delay_s=30.0)
+
+# Providers whose prompt cache has to be written by one call before others can read it
+PROMPT_CACHING_PROVIDERS = ("anthropic", "google")
 
 
 @dataclass
@@ -33,6 +47,7 @@ class AIResult:
     health: dict | None = None
     measurements: dict | None = None
     site: dict | None = None
+    usage: dict | None = None  # LLM tokens and estimated cost (see src/clients/usage.py)
 
 
 def _build_ai_result(
@@ -109,14 +124,15 @@ def _build_ai_result(
 async def post_ai_result(
     observation_id: str,
     result: AIResult,
-    timeout: float = DEFAULT_TIMEOUT,
+    timeout: float | None = None,
 ) -> bool:
     """POST AI results to the Fastify API.
 
     Args:
         observation_id: UUID of the observation.
         result: Assembled AIResult payload.
-        timeout: Request timeout in seconds.
+        timeout: Request timeout in seconds. None derives it from observed
+            latency (ADAPTIVE_TIMEOUTS), else DEFAULT_TIMEOUT.
 
     Returns:
         True if the POST succeeded, False otherwise.
@@ -132,17 +148,23 @@ async def post_ai_result(
         "measurements": result.measurements,
         "site": result.site,
     }
-
-    last_error: Exception | None = None
-    for attempt in range(1, MAX_RETRIES + 1):
+    if result.usage is not None:
+        payload["usage"] = result.usage
+
+    retrier = Retrier(RETRY_POLICY)
+    for attempt in retrier:
+        retry_headers = None
+        attempt_timeout = timeout if timeout is not None else timeouts.timeout_for(TIMEOUT_POLICY)
+        started = time.monotonic()
         try:
             logger.info(
                 "Posting AI result for observation %s (attempt %d/%d)",
-                observation_id, attempt, MAX_RETRIES,
+                observation_id, attempt, RETRY_POLICY.max_attempts,
             )
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(url, headers=headers, json=payload)
-                response.raise_for_status()
+            client = get_client("internal_api")
+            response = await client.post(url, headers=headers, json=payload, timeout=attempt_timeout)
+            response.raise_for_status()
+            timeouts.observe(TIMEOUT_POLICY, time.monotonic() - started)
 
             logger.info(
                 "AI result posted successfully for observation %s (status=%d)",
@@ -151,17 +173,18 @@ async def post_ai_result(
             return True
 
         except httpx.HTTPStatusError as e:
-            last_error = e
+            reason = str(e.response.status_code)
+            retry_headers = e.response.headers
             if e.response.status_code == 401:
                 logger.error(
                     "Auth failed posting AI result (check INTERNAL_API_KEY): %d",
                     e.response.status_code,
                 )
                 return False
-            if e.response.status_code >= 500:
+            if e.response.status_code == 429 or e.response.status_code >= 500:
                 logger.warning(
-                    "Server error %d posting AI result (attempt %d/%d)",
-                    e.response.status_code, attempt, MAX_RETRIES,
+                    "HTTP %d posting AI result (attempt %d/%d)",
+                    e.response.status_code, attempt, RETRY_POLICY.max_attempts,
                 )
             else:
                 logger.error(
@@ -170,28 +193,133 @@ async def post_ai_result(
                 )
                 return False
         except (httpx.TimeoutException, httpx.RequestError) as e:
-            last_error = e
+            reason = "timeout" if isinstance(e, httpx.TimeoutException) else "connection"
+            if isinstance(e, httpx.TimeoutException):
+                timeouts.observe(TIMEOUT_POLICY, time.monotonic() - started)
             logger.warning(
                 "Request error posting AI result (attempt %d/%d): %s",
-                attempt, MAX_RETRIES, e,
+                attempt, RETRY_POLICY.max_attempts, e,
             )
 
-        if attempt < MAX_RETRIES:
-            wait = 2 ** attempt
-            await asyncio.sleep(wait)
+        if not await retrier.backoff(reason, retry_headers):
+            break
 
     logger.error(
         "Failed to post AI result for observation %s after %d attempts",
-        observation_id, MAX_RETRIES,
+        observation_id, attempt,
     )
     return False
 
 
+AnalyzerResults = tuple[
+    SpeciesResult | None, HealthResult | None, MeasurementResult | None, SiteResult | None,
+]
+
+
+async def _analyze_separate(photos: list[PreparedPhoto], observation: ObservationRecord) -> AnalyzerResults:
+    """One LLM call per analyzer: species + health + site in parallel, then measurements.
+
+    With llm_prompt_caching on (Anthropic/Gemini), health runs first to write
+    the shared image prefix to the provider cache before species and site fan out.
+
+    Args:
+        photos: Quality-filtered photos.
+        observation: Observation record (for GPS context).
+
+    Returns:
+        Tuple of (species, health, measurements, site) results.
+    """
+    species_result: SpeciesResult | None = None
+    health_result: HealthResult | None = None
+    site_result: SiteResult | None = None
+    region: str | None = None
+
+    async def _run_species():
+        nonlocal species_result
+        species_result = await analyze_species(
+            photos,
+            latitude=observation.latitude,
+            longitude=observation.longitude,
+            region=region,
+        )
+
+    async def _run_health():
+        nonlocal health_result
+        health_result = await analyze_health(photos)
+
+    async def _run_site():
+        nonlocal site_result
+        site_result = await analyze_site(photos)
+
+    if prompt_caching(settings.llm_provider) and settings.llm_provider in PROMPT_CACHING_PROVIDERS:
+        # Health goes first and writes the shared image prefix to the provider's
+        # cache; species and site then read it instead of paying for the images again
+        region_task = asyncio.ensure_future(reverse_geocode(observation.latitude, observation.longitude))
+        await _run_health()
+        region = await region_task
+        await asyncio.gather(_run_species(), _run_site())
+    else:
+        await asyncio.gather(_run_species(), _run_health(), _run_site())
+
+    # Measurements run after species for allometric context
+    species_name = species_result.scientific if species_result else None
+    measurement_result = await analyze_measurements(photos, species_scientific=species_name)
+
+    return species_result, health_result, measurement_result, site_result
+
+
+async def _analyze_fused(photos: list[PreparedPhoto], observation: ObservationRecord) -> AnalyzerResults:
+    """One combined LLM call for all four analyzers, with per-section fallback.
+
+    Pl@ntNet runs alongside the fused call. Any section the fused response
+    doesn't deliver is re-run through its dedicated analyzer.
+
+    Args:
+        photos: Quality-filtered photos.
+        observation: Observation record (for GPS context).
+
+    Returns:
+        Tuple of (species, health, measurements, site) results.
+    """
+    region = await reverse_geocode(observation.latitude, observation.longitude)
+    fused_task = asyncio.ensure_future(
+        analyze_fused(photos, observation.latitude, observation.longitude, region=region)
+    )
+
+    async def _fused_species():
+        return (await fused_task).species
+
+    species_result = await analyze_species(
+        photos,
+        latitude=observation.latitude,
+        longitude=observation.longitude,
+        region=region,
+        llm_species=_fused_species(),
+    )
+    fused = await fused_task
+
+    async def _health_or_fallback():
+        return fused.health if fused.health is not None else await analyze_health(photos)
+
+    async def _site_or_fallback():
+        return fused.site if fused.site is not None else await analyze_site(photos)
+
+    health_result, site_result = await asyncio.gather(_health_or_fallback(), _site_or_fallback())
+
+    measurement_result = fused.measurements
+    if measurement_result is None:
+        species_name = species_result.scientific if species_result else None
+        measurement_result = await analyze_measurements(photos, species_scientific=species_name)
+
+    return species_result, health_result, measurement_result, site_result
+
+
 async def run_pipeline(observation_id: str, pool) -> bool:
     """Run the full AI pipeline for an observation.
 
-    1. Fetch observation + photos from DB/MinIO
+    1. Fetch observation + photos from DB/MinIO, decode and quality-check once
     2. Run species + health + site analyzers in parallel
+       (or one fused call for all four when llm_analysis_mode="fused")
     3. Run measurements (after species, for allometric context)
     4. Assemble and POST results
 
@@ -216,16 +344,22 @@ async def run_pipeline(observation_id: str, pool) -> bool:
         logger.error("No photos for observation %s — aborting pipeline", observation_id)
         return False
 
-    # Prepare photo tuples for analyzers: (bytes, photo_type)
-    raw_photos = [(p.data, p.record.photo_type) for p in downloaded_photos]
-
     logger.info(
         "Fetched observation %s: %d photos, lat=%.4f, lon=%.4f",
-        observation_id, len(raw_photos), observation.latitude, observation.longitude,
+        observation_id, len(downloaded_photos), observation.latitude, observation.longitude,
+    )
+
+    # Decode each photo once (off the event loop); quality metrics and LLM
+    # encodings are memoized on the PreparedPhoto and shared by every analyzer
+    prepared = await prepare_photos(
+        [(p.data, p.record.photo_type) for p in downloaded_photos],
+        variants=lambda photo: encode_variants(
+            settings.llm_provider, photo.photo_type, shared_prefix=prompt_caching(settings.llm_provider),
+        ),
     )
 
     # Quality filter
-    photos, quality_issues = filter_quality_photos(raw_photos)
+    photos, quality_issues = filter_quality_photos(prepared)
     if quality_issues:
         logger.warning("Quality issues for %s: %s", observation_id, quality_issues)
     if not photos:
@@ -235,35 +369,27 @@ async def run_pipeline(observation_id: str, pool) -> bool:
         )
         return False
 
-    # Step 2: Run species + health + site in parallel
-    species_result: SpeciesResult | None = None
-    health_result: HealthResult | None = None
-    site_result: SiteResult | None = None
-
-    async def _run_species():
-        nonlocal species_result
-        species_result = await analyze_species(
-            photos,
-            latitude=observation.latitude,
-            longitude=observation.longitude,
-        )
-
-    async def _run_health():
-        nonlocal health_result
-        health_result = await analyze_health(photos)
-
-    async def _run_site():
-        nonlocal site_result
-        site_result = await analyze_site(photos)
-
-    await asyncio.gather(_run_species(), _run_health(), _run_site())
-
-    # Step 3: Run measurements (after species for allometric context)
-    species_name = species_result.scientific if species_result else None
-    measurement_result = await analyze_measurements(photos, species_scientific=species_name)
+    # Steps 2-3: LLM analyzers (+ Pl@ntNet inside species)
+    with usage.track(observation.contract_id) as ledger:
+        if settings.llm_analysis_mode == "fused":
+            species_result, health_result, measurement_result, site_result = await _analyze_fused(
+                photos, observation,
+            )
+        else:
+            species_result, health_result, measurement_result, site_result = await _analyze_separate(
+                photos, observation,
+            )
+    metrics.inc("observation_llm_cost_usd_total", ledger.total.cost_usd)
+    metrics.inc("observations_costed_total")
+    logger.info(
+        "LLM usage for %s: %d calls, %d input + %d output tokens, ~$%.4f",
+        observation_id, ledger.total.calls, ledger.total.input_tokens, ledger.total.output_tokens,
+        ledger.total.cost_usd,
+    )
 
     # Step 4: Assemble and POST
     ai_result = _build_ai_result(species_result, health_result, measurement_result, site_result)
+    ai_result.usage = ledger.as_dict()
 
     # Check if we got anything useful
     if (ai_result.species is None and ai_result.health is None
@@ -0,0 +1,75 @@
+"""Bulk reprocessing — rerun the pipeline for many observations through provider batch jobs.
+
+Re-analysing a backlog (a new model, a prompt change, an import) doesn't
+need live latency. This runs run_pipeline for each observation inside
+llm_batch.collect(), so their Anthropic/OpenAI calls go out as batch jobs
+at batch pricing and off the interactive rate limits. The responses go
+through the same parsers and results are posted with post_ai_result as
+usual.
+
+Usage:
+    python -m src.reprocess <observation_id> [...]
+    python -m src.reprocess < ids.txt
+"""
+
+import asyncio
+import logging
+import sys
+
+from src.config import settings
+from src.clients import llm_batch
+from src.pipeline import run_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+async def reprocess(observation_ids: list[str], pool) -> dict[str, bool]:
+    """Run the pipeline for observation_ids with their LLM calls batched.
+
+    Args:
+        observation_ids: UUIDs of the observations to process.
+        pool: asyncpg connection pool.
+
+    Returns:
+        Observation ID → whether its results were posted.
+    """
+    limit = asyncio.Semaphore(max(1, settings.reprocess_concurrency))
+
+    async def one(observation_id: str) -> bool:
+        async with limit:
+            try:
+                return await run_pipeline(observation_id, pool)
+            except Exception:
+                logger.exception("Reprocessing observation %s failed", observation_id)
+                return False
+
+    async with llm_batch.collect():
+        results = await asyncio.gather(*(one(i) for i in observation_ids))
+
+    succeeded = sum(results)
+    logger.info("Reprocessed %d observations (%d failed)", succeeded, len(results) - succeeded)
+    return dict(zip(observation_ids, results))
+
+
+async def _main(observation_ids: list[str]) -> int:
+    from src.clients.storage import get_db_pool
+
+    pool = await get_db_pool()
+    try:
+        results = await reprocess(observation_ids, pool)
+    finally:
+        await pool.close()
+    return 0 if all(results.values()) else 1
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=settings.log_level,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    observation_ids = sys.argv[1:] or [line.strip() for line in sys.stdin if line.strip()]
+    sys.exit(asyncio.run(_main(observation_ids)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Bulkheads — caps on concurrent outbound calls per upstream.
+
+One observation fans out to four LLM calls and a Pl@ntNet call at once,
+so N concurrent jobs open N × 5 upstream connections. A bulkhead is an
+async semaphore that the clients hold around each HTTP attempt:
+
+    async with bulkhead.hold(get_bulkhead("llm:anthropic", 8), get_bulkhead("llm:anthropic:species", 2)):
+        response = await client.post(...)
+
+Calls beyond the limit queue in FIFO order (asyncio.Semaphore is fair)
+instead of opening more sockets. Retry backoff happens outside the
+bulkhead, so a sleeping retry doesn't hold a slot. Each bulkhead is
+separate, so a slow Pl@ntNet fills only its own slots and leaves the LLM
+capacity alone.
+
+Time spent queueing is exported as ``bulkhead_wait_seconds_total`` next to
+``bulkhead_calls_total``. Current occupancy is exported as the
+``bulkhead_queued`` and ``bulkhead_in_flight`` gauges.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import AsyncIterator
+
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Queue waits longer than this are logged
+SLOW_WAIT_S = 1.0
+
+
+class Bulkhead:
+    """Async semaphore with queue-wait accounting."""
+
+    def __init__(self, name: str, limit: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.queued = 0
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def _publish(self) -> None:
+        metrics.set_gauge("bulkhead_queued", self.queued, bulkhead=self.name)
+        metrics.set_gauge("bulkhead_in_flight", self.in_flight, bulkhead=self.name)
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one slot for the duration of the block, queueing if all are taken."""
+        queued_at = time.monotonic()
+        self.queued += 1
+        self._publish()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        waited = time.monotonic() - queued_at
+        self.in_flight += 1
+        self._publish()
+        metrics.inc("bulkhead_calls_total", bulkhead=self.name)
+        metrics.inc("bulkhead_wait_seconds_total", waited, bulkhead=self.name)
+        if waited >= SLOW_WAIT_S:
+            logger.info("Waited %.1fs for bulkhead %s (limit %d)", waited, self.name, self.limit)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self._publish()
+
+
+@contextlib.asynccontextmanager
+async def hold(*bulkheads: Bulkhead | None) -> AsyncIterator[None]:
+    """Hold a slot in each bulkhead, acquired in the order given.
+
+    Args:
+        *bulkheads: Bulkheads to enter; None entries (unlimited) are skipped.
+            Callers must always pass nested scopes in the same order.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        for bulkhead in bulkheads:
+            if bulkhead is not None:
+                await stack.enter_async_context(bulkhead.slot())
+        yield
+
+
+_bulkheads: dict[str, Bulkhead] = {}
+
+
+def get_bulkhead(name: str, limit: int) -> Bulkhead | None:
+    """Return the process-wide bulkhead for name, or None if limit is 0 (unlimited).
+
+    Args:
+        name: Scope, e.g. "llm:anthropic", "llm:anthropic:species" or "plantnet".
+        limit: Maximum concurrent calls; the bulkhead is rebuilt if it changes.
+
+    Returns:
+        The Bulkhead, or None when unlimited.
+    """
+    if limit <= 0:
+        return None
+    bulkhead = _bulkheads.get(name)
+    if bulkhead is None or bulkhead.limit != limit:
+        bulkhead = _bulkheads[name] = Bulkhead(name, limit)
+    return bulkhead
+
+
+def reset() -> None:
+    """Forget every bulkhead. Intended for tests."""
+    _bulkheads.clear()
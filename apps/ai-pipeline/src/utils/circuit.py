@@ -0,0 +1,130 @@
+"""Circuit breakers — stop calling an upstream that keeps failing, probe it later.
+
+closed     calls flow; consecutive failures are counted
+open       calls are refused without touching the network until reset_timeout_s passes
+half_open  one probe call is let through; success closes, failure reopens
+
+Breakers are keyed by name (e.g. "anthropic/claude-sonnet-4-5-20250929").
+Every transition is logged and published as metrics, so the consumer's
+snapshot shows which upstreams are currently cut off.
+"""
+
+import logging
+import threading
+import time
+
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for circuit_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(f"Circuit open for {name}")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_s = reset_timeout_s
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+        self._lock = threading.Lock()
+        metrics.set_gauge("circuit_state", STATE_VALUES[CLOSED], circuit=name)
+
+    def _transition(self, state: str, reason: str) -> None:
+        previous, self.state = self.state, state
+        metrics.set_gauge("circuit_state", STATE_VALUES[state], circuit=self.name)
+        metrics.inc("circuit_transitions_total", circuit=self.name, to=state)
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit %s: %s → %s (%s)", self.name, previous, state, reason)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now. In half-open, claims the probe slot."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self._opened_at < self.reset_timeout_s:
+                    return False
+                self._transition(HALF_OPEN, f"{self.reset_timeout_s:.0f}s elapsed")
+            # Half-open: one probe at a time; a probe that never reported is abandoned after the timeout
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout_s:
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self) -> None:
+        """The upstream answered (any non-failure response)."""
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+            if self.state != CLOSED:
+                self._transition(CLOSED, "probe succeeded")
+
+    def record_failure(self) -> None:
+        """A timeout, connection error or 5xx."""
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self.state == HALF_OPEN:
+                self._opened_at = time.monotonic()
+                self._transition(OPEN, "probe failed")
+            elif self.state == CLOSED and self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(OPEN, f"{self._failures} consecutive failures")
+
+    def release(self) -> None:
+        """An outcome that says nothing about health (e.g. 429); frees a half-open probe slot."""
+        with self._lock:
+            self._probe_started = None
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0) -> CircuitBreaker:
+    """Return the process-wide breaker for name, creating it on first use.
+
+    Args:
+        name: Upstream identity, e.g. "anthropic/claude-sonnet-4-5-20250929".
+        failure_threshold: Consecutive failures that open a new breaker.
+        reset_timeout_s: Seconds a new breaker stays open before probing.
+
+    Returns:
+        The CircuitBreaker for name.
+    """
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout_s)
+        return breaker
+
+
+def states() -> dict[str, str]:
+    """Current state of every breaker, by name."""
+    with _registry_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+def reset() -> None:
+    """Forget every breaker. Intended for tests."""
+    with _registry_lock:
+        _breakers.clear()
@@ -0,0 +1,152 @@
+"""Adaptive job concurrency — AIMD controller driven by upstream call outcomes.
+
+The consumer starts at ``max_concurrent_jobs`` and periodically asks the
+controller for a new limit. Clients report every upstream call through
+``record_upstream()``; the controller backs off multiplicatively when the
+window shows rate limiting, errors or slow calls, and probes upward one job
+at a time while the worker is saturated and upstreams are healthy.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Don't react to a window with fewer calls than this
+MIN_WINDOW_SAMPLES = 5
+
+
+@dataclass
+class UpstreamWindow:
+    """Upstream call outcomes observed since the last adjustment."""
+
+    latencies: list[float] = field(default_factory=list)
+    rate_limited: int = 0
+    errors: int = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.latencies) + self.rate_limited + self.errors
+
+    def p90_latency(self) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+
+
+class AdaptiveConcurrency:
+    """Additive-increase / multiplicative-decrease job concurrency limit."""
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 12,
+        target_latency_s: float = 20.0,
+        max_rate_limited: float = 0.05,
+        max_error_rate: float = 0.10,
+        decrease_factor: float = 0.7,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = max(self.minimum, min(initial, self.maximum))
+        self.target_latency_s = target_latency_s
+        self.max_rate_limited = max_rate_limited
+        self.max_error_rate = max_error_rate
+        self.decrease_factor = decrease_factor
+        self._window = UpstreamWindow()
+        self._lock = threading.Lock()
+        metrics.set_gauge("consumer_concurrency_limit", self.limit)
+
+    def record(self, latency_s: float | None = None, rate_limited: bool = False, error: bool = False) -> None:
+        """Record the outcome of one upstream call.
+
+        Args:
+            latency_s: Wall time of a successful call.
+            rate_limited: True if the upstream answered 429.
+            error: True for timeouts, connection errors and 5xx responses.
+        """
+        with self._lock:
+            if rate_limited:
+                self._window.rate_limited += 1
+            elif error:
+                self._window.errors += 1
+            elif latency_s is not None:
+                self._window.latencies.append(latency_s)
+
+    def adjust(self, in_flight: int) -> int:
+        """Close the current window and compute the next concurrency limit.
+
+        Args:
+            in_flight: Jobs currently being processed by this worker.
+
+        Returns:
+            The new limit (unchanged if the window is too small to judge).
+        """
+        with self._lock:
+            window, self._window = self._window, UpstreamWindow()
+
+        if window.total < MIN_WINDOW_SAMPLES:
+            return self.limit
+
+        rate_limited = window.rate_limited / window.total
+        error_rate = window.errors / window.total
+        p90 = window.p90_latency()
+
+        previous = self.limit
+        reason = ""
+        if rate_limited > self.max_rate_limited:
+            reason = f"429 rate {rate_limited:.0%}"
+        elif error_rate > self.max_error_rate:
+            reason = f"error rate {error_rate:.0%}"
+        elif p90 is not None and p90 > self.target_latency_s:
+            reason = f"p90 latency {p90:.1f}s"
+
+        if reason:
+            self.limit = max(self.minimum, min(previous - 1, int(previous * self.decrease_factor)))
+        elif in_flight >= previous:
+            self.limit = min(self.maximum, previous + 1)
+            reason = "saturated and healthy"
+
+        metrics.set_gauge("consumer_concurrency_limit", self.limit)
+        if self.limit != previous:
+            metrics.inc("consumer_concurrency_adjustments_total", direction="up" if self.limit > previous else "down")
+            logger.info(
+                "Concurrency limit %d → %d (%s; calls=%d, in_flight=%d)",
+                previous, self.limit, reason, window.total, in_flight,
+            )
+        return self.limit
+
+
+# Installed by the consumer when adaptive concurrency is enabled
+_controller: AdaptiveConcurrency | None = None
+
+
+def install(controller: AdaptiveConcurrency | None) -> None:
+    """Set (or clear) the process-wide controller that receives upstream samples."""
+    global _controller
+    _controller = controller
+
+
+def record_upstream(
+    upstream: str,
+    latency_s: float | None = None,
+    rate_limited: bool = False,
+    error: bool = False,
+) -> None:
+    """Report one upstream call outcome to metrics and the active controller.
+
+    Args:
+        upstream: Upstream name (e.g. "anthropic", "plantnet").
+        latency_s: Wall time of a successful call.
+        rate_limited: True if the upstream answered 429.
+        error: True for timeouts, connection errors and 5xx responses.
+    """
+    outcome = "rate_limited" if rate_limited else "error" if error else "ok"
+    metrics.inc("upstream_calls_total", upstream=upstream, outcome=outcome)
+    if _controller is not None:
+        _controller.record(latency_s=latency_s, rate_limited=rate_limited, error=error)
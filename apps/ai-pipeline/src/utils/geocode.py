@@ -1,14 +1,19 @@
 """Reverse geocoding utility using Nominatim API."""
 
 import logging
+import time
 
 import httpx
 
+from src.clients.http import get_client
+from src.utils import timeouts
+
 logger = logging.getLogger(__name__)
 
 NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
 USER_AGENT = "UrbanPulseMapping/1.0"
 TIMEOUT = 5.0
+TIMEOUT_POLICY = timeouts.TimeoutPolicy("nominatim", default_s=TIMEOUT, floor_s=1.0, ceiling_s=10.0)
 
 
 async def reverse_geocode(latitude: float, longitude: float) -> str:
@@ -21,19 +26,22 @@ async def reverse_geocode(latitude: float, longitude: float) -> str:
     Returns:
         Location string like "Austin, Texas, US" or "unknown" on failure.
     """
+    started = time.monotonic()
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            response = await client.get(
-                NOMINATIM_URL,
-                params={
-                    "lat": latitude,
-                    "lon": longitude,
-                    "format": "json",
-                },
-                headers={"User-Agent": USER_AGENT},
-            )
-            response.raise_for_status()
-            data = response.json()
+        client = get_client("nominatim")
+        response = await client.get(
+            NOMINATIM_URL,
+            params={
+                "lat": latitude,
+                "lon": longitude,
+                "format": "json",
+            },
+            headers={"User-Agent": USER_AGENT},
+            timeout=timeouts.timeout_for(TIMEOUT_POLICY),
+        )
+        response.raise_for_status()
+        timeouts.observe(TIMEOUT_POLICY, time.monotonic() - started)
+        data = response.json()
 
         address = data.get("address", {})
         city = address.get("city") or address.get("town") or address.get("village") or ""
@@ -45,6 +53,10 @@ async def reverse_geocode(latitude: float, longitude: float) -> str:
             return ", ".join(parts)
         return "unknown"
 
+    except httpx.TimeoutException:
+        timeouts.observe(TIMEOUT_POLICY, time.monotonic() - started)
+        logger.warning("Reverse geocode timed out for %.4f, %.4f", latitude, longitude)
+        return "unknown"
     except Exception:
         logger.exception("Reverse geocode failed for %.4f, %.4f", latitude, longitude)
         return "unknown"
@@ -0,0 +1,386 @@
+"""Decode-once photo preparation — shared image derivatives for every analyzer.
+
+A PreparedPhoto is built once per downloaded photo in run_pipeline. It keeps
+the decoded image and memoizes everything derived from it (resized encodes,
+base64 strings, grayscale plane, quality metrics) so the quality filter, the
+four analyzers and the LLM payload builders never decode the same bytes twice.
+
+LLM payloads go through for_llm(), which rotates per EXIF orientation, drops
+EXIF/XMP metadata and searches JPEG/WebP quality for the best image that fits
+a per-image byte budget — upload size is most of a call's time on the wire.
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import threading
+from collections.abc import Callable, Iterable, Sequence
+
+from dataclasses import dataclass, field
+
+from PIL import Image, ImageOps
+
+from src.config import settings
+from src.utils.quality import QualityCheck, check_image_quality
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_DIMENSION = 1568  # Anthropic recommended max
+JPEG_QUALITY = 85
+
+# MIME type → Pillow encoder name
+PIL_FORMATS: dict[str, str] = {
+    "image/jpeg": "JPEG",
+    "image/png": "PNG",
+    "image/webp": "WEBP",
+}
+
+# Quality search range for budgeted LLM encodes
+MIN_QUALITY = 40
+MAX_QUALITY = 90
+QUALITY_STEP = 5
+
+# libwebp effort (0-6): 2 is ~2x faster than the default 4 for ~1% larger output
+WEBP_METHOD = 2
+
+# Image.info keys that carry metadata we never send upstream (ICC profiles are kept)
+METADATA_KEYS = ("exif", "xmp", "XML:com.adobe.xmp", "comment", "photoshop", "iptc")
+
+_UNSET = object()
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """An image encoded for an LLM request."""
+
+    data: bytes
+    mime_type: str
+    quality: int | None = None  # encoder quality chosen, None if passed through
+    base64: bytes = field(default=b"", repr=False)  # ASCII, written into request bodies as-is
+
+
+def llm_formats() -> tuple[str, ...]:
+    """MIME types the budgeted encoder may choose from, in order of preference."""
+    return ("image/webp", "image/jpeg") if settings.llm_image_webp else ("image/jpeg",)
+
+
+def encoding_tag() -> str:
+    """Identity of the current LLM encoding settings, for cache keys."""
+    return f"{settings.llm_image_max_bytes}/{','.join(llm_formats())}"
+
+
+class PreparedPhoto:
+    """One photo plus lazily computed, memoized derivatives.
+
+    Derivatives are computed on first access and safe to request from
+    worker threads; run_pipeline warms the common ones off the event loop.
+    """
+
+    def __init__(self, data: bytes, photo_type: str = "unknown", mime_type: str = "image/jpeg") -> None:
+        self.data = data
+        self.photo_type = photo_type
+        self.mime_type = mime_type or "image/jpeg"
+        self._lock = threading.RLock()
+        self._image: Image.Image | None | object = _UNSET
+        self._decode_error: Exception | None = None
+        self._grayscale: Image.Image | None = None
+        self._quality: QualityCheck | None = None
+        self._encoded: dict[tuple[int, str, float], bytes] = {}
+        self._b64: dict[tuple[int, str, float], str] = {}
+        self._for_llm: dict[tuple[int, float, int, tuple[str, ...]], EncodedImage] = {}
+        self._digest: str | None = None
+        self._has_metadata = False
+
+    def __repr__(self) -> str:
+        return f"PreparedPhoto(photo_type={self.photo_type!r}, bytes={len(self.data)})"
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the original bytes — the photo's identity in cache keys."""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    @property
+    def image(self) -> Image.Image | None:
+        """The decoded image, or None if the bytes can't be decoded."""
+        with self._lock:
+            if self._image is _UNSET:
+                try:
+                    img = Image.open(io.BytesIO(self.data))
+                    img.load()
+                    self._has_metadata = any(k in img.info for k in METADATA_KEYS)
+                    # Phones store portrait shots sideways plus an orientation tag
+                    ImageOps.exif_transpose(img, in_place=True)
+                    self._image = img
+                except Exception as e:
+                    logger.warning("Cannot decode %s photo (%d bytes): %s", self.photo_type, len(self.data), e)
+                    self._decode_error = e
+                    self._image = None
+            return self._image  # type: ignore[return-value]
+
+    @property
+    def grayscale(self) -> Image.Image | None:
+        """Grayscale ("L") plane of the decoded image."""
+        with self._lock:
+            if self._grayscale is None and self.image is not None:
+                self._grayscale = self.image.convert("L")
+            return self._grayscale
+
+    @property
+    def quality(self) -> QualityCheck:
+        """Quality pre-check result (blur, brightness, size)."""
+        with self._lock:
+            if self._quality is None:
+                self._quality = check_image_quality(
+                    len(self.data), self.image, self.grayscale, open_error=self._decode_error,
+                )
+            return self._quality
+
+    def fitted_size(self, max_dim: int = MAX_IMAGE_DIMENSION, crop: float = 1.0) -> tuple[int, int] | None:
+        """Pixel size encoded(max_dim, crop=crop) will have, or None if undecodable."""
+        img = self.image
+        if img is None:
+            return None
+        w, h = _crop_box(img.size, crop)[2:]
+        if w > max_dim or h > max_dim:
+            scale = min(max_dim / w, max_dim / h)
+            return round(w * scale), round(h * scale)
+        return w, h
+
+    def encoded(
+        self,
+        max_dim: int = MAX_IMAGE_DIMENSION,
+        mime_type: str | None = None,
+        crop: float = 1.0,
+    ) -> bytes:
+        """Image bytes cropped, fitted within max_dim and encoded as mime_type.
+
+        The original bytes are returned untouched when they already fit, need
+        no crop, carry no metadata and are in the requested format. Undecodable images are
+        passed through as-is and left for the provider to reject.
+
+        Args:
+            max_dim: Maximum width/height in pixels.
+            mime_type: Target MIME type (defaults to the photo's own).
+            crop: Fraction of width and height kept around the centre (1.0 = whole frame).
+
+        Returns:
+            Encoded image bytes.
+        """
+        mt = mime_type or self.mime_type
+        key = (max_dim, mt, crop)
+        with self._lock:
+            if key in self._encoded:
+                return self._encoded[key]
+
+            img = self.image
+            if img is None:
+                result = self.data
+            else:
+                w, h = img.size
+                same_format = PIL_FORMATS.get(mt) == img.format
+                if w <= max_dim and h <= max_dim and same_format and crop >= 1.0 and not self._has_metadata:
+                    result = self.data
+                else:
+                    result = self._encode(img, max_dim, mt, crop)
+                    logger.debug(
+                        "Encoded %s photo %dx%d → max %dpx crop %.2f %s (%d→%d bytes)",
+                        self.photo_type, w, h, max_dim, crop, mt, len(self.data), len(result),
+                    )
+            self._encoded[key] = result
+            return result
+
+    def base64(
+        self,
+        max_dim: int = MAX_IMAGE_DIMENSION,
+        mime_type: str | None = None,
+        crop: float = 1.0,
+    ) -> str:
+        """Base64 of encoded(max_dim, mime_type, crop), memoized per variant."""
+        mt = mime_type or self.mime_type
+        key = (max_dim, mt, crop)
+        with self._lock:
+            if key not in self._b64:
+                self._b64[key] = base64.b64encode(self.encoded(max_dim, mt, crop)).decode("utf-8")
+            return self._b64[key]
+
+    def for_llm(
+        self,
+        max_dim: int = MAX_IMAGE_DIMENSION,
+        crop: float = 1.0,
+        max_bytes: int | None = None,
+        formats: Sequence[str] | None = None,
+    ) -> EncodedImage:
+        """Smallest-good-enough encode for an LLM request, memoized per variant.
+
+        Crops and fits the image, then binary-searches encoder quality per
+        format (in preference order) for the highest quality within
+        max_bytes. The first format that fits at MIN_QUALITY or better wins;
+        if none does, the smallest attempt is used. Metadata is dropped and
+        EXIF orientation applied. A metadata-free original that already fits
+        every constraint is sent as-is.
+
+        Args:
+            max_dim: Maximum width/height in pixels.
+            crop: Fraction of width and height kept around the centre.
+            max_bytes: Per-image byte budget (defaults to settings.llm_image_max_bytes).
+            formats: Allowed MIME types in preference order (defaults to llm_formats()).
+
+        Returns:
+            EncodedImage with bytes, MIME type and base64.
+        """
+        budget = max_bytes if max_bytes is not None else settings.llm_image_max_bytes
+        fmts = tuple(formats or llm_formats())
+        key = (max_dim, crop, budget, fmts)
+        with self._lock:
+            if key in self._for_llm:
+                return self._for_llm[key]
+
+            img = self.image
+            if img is None:
+                result = self._encoded_image(self.data, self.mime_type)
+            elif (
+                len(self.data) <= budget
+                and not self._has_metadata
+                and crop >= 1.0
+                and max(img.size) <= max_dim
+                and img.format in {PIL_FORMATS.get(f) for f in fmts}
+            ):
+                result = self._encoded_image(self.data, Image.MIME.get(img.format or "", self.mime_type))
+            else:
+                result = self._encode_to_budget(img, max_dim, crop, budget, fmts)
+                logger.debug(
+                    "LLM encode %s photo → %s q=%s, %d→%d bytes (budget %d)",
+                    self.photo_type, result.mime_type, result.quality, len(self.data), len(result.data), budget,
+                )
+            self._for_llm[key] = result
+            return result
+
+    @staticmethod
+    def _encoded_image(data: bytes, mime_type: str, quality: int | None = None) -> EncodedImage:
+        return EncodedImage(data, mime_type, quality, base64.b64encode(data))
+
+    @classmethod
+    def _encode_to_budget(
+        cls,
+        img: Image.Image,
+        max_dim: int,
+        crop: float,
+        budget: int,
+        formats: Sequence[str],
+    ) -> EncodedImage:
+        icc_profile = img.info.get("icc_profile")
+        img = _fit(img, max_dim, crop)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        def _save(mime_type: str, quality: int) -> bytes:
+            buf = io.BytesIO()
+            kwargs: dict = {"icc_profile": icc_profile} if icc_profile else {}
+            if mime_type == "image/webp":
+                kwargs["method"] = WEBP_METHOD
+            img.save(buf, format=PIL_FORMATS[mime_type], quality=quality, **kwargs)
+            return buf.getvalue()
+
+        qualities = list(range(MIN_QUALITY, MAX_QUALITY + 1, QUALITY_STEP))
+        smallest: tuple[bytes, str, int] | None = None
+        for mime_type in formats:
+            best: tuple[bytes, int] | None = None
+            # Highest quality that fits; most photos already fit at the top
+            lo, hi = 0, len(qualities) - 1
+            mid = hi
+            while lo <= hi:
+                quality = qualities[mid]
+                data = _save(mime_type, quality)
+                if smallest is None or len(data) < len(smallest[0]):
+                    smallest = (data, mime_type, quality)
+                if len(data) <= budget:
+                    best = (data, quality)
+                    lo = mid + 1
+                else:
+                    hi = mid - 1
+                mid = (lo + hi) // 2
+            if best is not None:
+                return cls._encoded_image(best[0], mime_type, best[1])
+
+        assert smallest is not None
+        data, mime_type, quality = smallest
+        logger.warning(
+            "Image over LLM byte budget even at quality %d (%d > %d bytes)", quality, len(data), budget,
+        )
+        return cls._encoded_image(data, mime_type, quality)
+
+    def warm(self, variants: Iterable[tuple[int, float]] | None = None) -> None:
+        """Decode, run quality checks and pre-encode the LLM payload variants.
+
+        Meant to run in a worker thread so the event loop stays free.
+
+        Args:
+            variants: (max_dim, crop) pairs to pre-encode; defaults to the
+                full frame at MAX_IMAGE_DIMENSION.
+        """
+        if self.quality.passed:
+            for max_dim, crop in variants or [(MAX_IMAGE_DIMENSION, 1.0)]:
+                self.for_llm(max_dim, crop)
+
+    @staticmethod
+    def _encode(img: Image.Image, max_dim: int, mime_type: str, crop: float = 1.0) -> bytes:
+        img = _fit(img, max_dim, crop)
+        fmt = PIL_FORMATS.get(mime_type, "JPEG")
+        if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        buf = io.BytesIO()
+        if fmt == "PNG":
+            img.save(buf, format=fmt)
+        else:
+            img.save(buf, format=fmt, quality=JPEG_QUALITY)
+        return buf.getvalue()
+
+
+def _fit(img: Image.Image, max_dim: int, crop: float = 1.0) -> Image.Image:
+    """Centre-crop to `crop` of each side, then scale to fit within max_dim."""
+    if crop < 1.0:
+        left, top, w, h = _crop_box(img.size, crop)
+        img = img.crop((left, top, left + w, top + h))
+    w, h = img.size
+    if w > max_dim or h > max_dim:
+        scale = min(max_dim / w, max_dim / h)
+        img = img.resize((round(w * scale), round(h * scale)), Image.LANCZOS)
+    return img
+
+
+def _crop_box(size: tuple[int, int], crop: float) -> tuple[int, int, int, int]:
+    """(left, top, width, height) of the centred region keeping `crop` of each side."""
+    w, h = size
+    if crop >= 1.0:
+        return 0, 0, w, h
+    cw, ch = max(1, round(w * crop)), max(1, round(h * crop))
+    return (w - cw) // 2, (h - ch) // 2, cw, ch
+
+
+def as_prepared(photos: Sequence["PreparedPhoto | tuple[bytes, str]"]) -> list[PreparedPhoto]:
+    """Wrap (image_bytes, photo_type) tuples as PreparedPhotos; pass others through."""
+    return [p if isinstance(p, PreparedPhoto) else PreparedPhoto(p[0], p[1]) for p in photos]
+
+
+async def prepare_photos(
+    photos: Sequence["PreparedPhoto | tuple[bytes, str]"],
+    variants: Callable[[PreparedPhoto], Iterable[tuple[int, float]]] | None = None,
+) -> list[PreparedPhoto]:
+    """Build PreparedPhotos and warm their derivatives in worker threads.
+
+    Args:
+        photos: (image_bytes, photo_type) tuples or existing PreparedPhotos.
+        variants: Returns the (max_dim, crop) encodes to pre-compute for a photo.
+
+    Returns:
+        PreparedPhotos in the same order.
+    """
+    prepared = as_prepared(photos)
+    await asyncio.gather(*(
+        asyncio.to_thread(p.warm, variants(p) if variants else None) for p in prepared
+    ))
+    return prepared
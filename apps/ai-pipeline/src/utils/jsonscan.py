@@ -0,0 +1,180 @@
+"""Incremental scanner for the first complete top-level JSON object in text.
+
+LLM output arrives in chunks and usually wraps the JSON we want in prose or
+a markdown fence. JSONObjectScanner tracks brace depth and string/escape
+state, so a streaming caller can stop reading the moment the object closes,
+and a complete response is scanned in one pass. Precompiled patterns jump
+straight to the next character that can change state, so long runs of
+prose or string content are skipped at C speed instead of char by char.
+"""
+
+import json
+import re
+
+# Characters that matter outside a string (inside a candidate) and inside one
+_STRUCTURAL = re.compile(r'[{}"]')
+_IN_STRING = re.compile(r'["\\]')
+# A JSON object opens with a key or closes at once; anything else is prose
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+
+class JSONObjectScanner:
+    """Find the first top-level {...} in text fed in arbitrary chunks.
+
+    When a balanced candidate doesn't parse as a JSON object (e.g. prose
+    like "{note: {...}}"), the largest balanced objects nested inside it
+    are tried in order, then scanning resumes after it. Those spans don't
+    overlap, so the total work stays linear in the input size. A
+    candidate still open when the input ends (a stray "{" in prose) gets
+    the same treatment in finish().
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[tuple[int, str]] = []  # (absolute offset, text)
+        self._first = 0  # index of the first chunk a future candidate can touch
+        self._pos = 0  # absolute offset of the next character to scan
+        self._start: int | None = None
+        self._open: list[int] = []  # offsets of unclosed braces in the current candidate
+        self._nested: list[tuple[int, int]] = []  # maximal closed (start, end) spans inside it
+        self._in_string = False
+        self._escaped = False
+        self.result: dict | None = None
+        self.end: int | None = None  # absolute offset just past the object
+
+    @property
+    def done(self) -> bool:
+        """True once a complete JSON object has been found."""
+        return self.result is not None
+
+    def feed(self, chunk: str) -> dict | None:
+        """Scan another chunk of text.
+
+        Args:
+            chunk: Next piece of the text.
+
+        Returns:
+            The parsed object once it's complete (and on every later call), else None.
+        """
+        if self.done or not chunk:
+            return self.result
+        offset = self._pos
+        self._chunks.append((offset, chunk))
+        self._pos += len(chunk)
+        if self._start is None:
+            # Nothing before a candidate is ever needed again
+            self._first = len(self._chunks) - 1
+        self._scan(chunk, offset, 0)
+        return self.result
+
+    def _scan(self, chunk: str, offset: int, i: int) -> None:
+        n = len(chunk)
+        while i < n:
+            if self._start is None:
+                i = chunk.find("{", i)
+                if i < 0:
+                    return
+                self._start = offset + i
+                self._open = [self._start]
+                self._nested = []
+                self._in_string = False
+                self._escaped = False
+                i += 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    i += 1
+                    continue
+                m = _IN_STRING.search(chunk, i)
+                if m is None:
+                    return
+                i = m.end()
+                if m.group() == '"':
+                    self._in_string = False
+                else:
+                    self._escaped = True
+            else:
+                m = _STRUCTURAL.search(chunk, i)
+                if m is None:
+                    return
+                i = m.end()
+                ch = m.group()
+                if ch == '"':
+                    self._in_string = True
+                elif ch == "{":
+                    self._open.append(offset + i - 1)
+                else:
+                    start = self._open.pop()
+                    if not self._open:
+                        if self._close(offset + i):
+                            return
+                        continue
+                    # Spans inside this one are no longer maximal
+                    while self._nested and self._nested[-1][0] > start:
+                        self._nested.pop()
+                    self._nested.append((start, offset + i))
+
+    def finish(self) -> dict | None:
+        """Signal the end of input.
+
+        If a candidate is still open (its "{" was prose, not JSON), the
+        largest balanced objects inside it are tried in order.
+
+        Returns:
+            The parsed object, or None if the text holds none.
+        """
+        if self.done or self._start is None:
+            return self.result
+        self._close(None)
+        return self.result
+
+    def _text(self, start: int, end: int) -> str:
+        """Buffered text in [start, end), touching only the chunks that overlap it."""
+        parts = []
+        for idx in range(self._first, len(self._chunks)):
+            offset, text = self._chunks[idx]
+            if offset >= end:
+                break
+            if offset + len(text) <= start:
+                self._first = idx + 1
+                continue
+            parts.append(text[max(0, start - offset):end - offset])
+        return "".join(parts)
+
+    def _close(self, end: int | None) -> bool:
+        """Settle the current candidate, ending at end (None if it never closed).
+
+        The candidate itself is tried first, then the largest balanced
+        spans nested inside it. Either way the next candidate starts after it.
+        """
+        spans = [(self._start, end)] if end is not None else []
+        nested, self._nested = self._nested, []
+        self._start = None
+        return any(self._parse(start, span_end) for start, span_end in spans + nested)
+
+    def _parse(self, start: int, end: int) -> bool:
+        candidate = self._text(start, end)
+        value = None
+        if _OBJECT_START.match(candidate):
+            try:
+                value = json.loads(candidate)
+            except (json.JSONDecodeError, RecursionError):
+                pass
+        if isinstance(value, dict):
+            self.result = value
+            self.end = end
+            return True
+        return False
+
+
+def scan_json_object(text: str) -> dict | None:
+    """Return the first JSON object embedded in text, or None.
+
+    Args:
+        text: Text that may contain prose, code fences and a JSON object.
+
+    Returns:
+        Parsed dict, or None if no complete object is found.
+    """
+    scanner = JSONObjectScanner()
+    scanner.feed(text)
+    return scanner.finish()
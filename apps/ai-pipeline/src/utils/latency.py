@@ -0,0 +1,64 @@
+"""Recent upstream latencies per key, for percentile-driven decisions.
+
+Each key (e.g. "anthropic/species") keeps a sliding window of the last
+``WINDOW_SIZE`` successful call durations. Percentiles are read from the
+window, so they follow the upstream as it speeds up or slows down.
+"""
+
+import threading
+from collections import deque
+
+# Samples kept per key; old samples fall out as new calls complete
+WINDOW_SIZE = 200
+
+
+class LatencyWindow:
+    """Sliding window of call durations for one upstream key."""
+
+    def __init__(self, size: int = WINDOW_SIZE) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        """Record one completed call."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> float | None:
+        """Nearest-rank percentile of the window.
+
+        Args:
+            pct: Percentile in 0–100 (e.g. 95).
+            min_samples: Return None until the window holds this many samples.
+
+        Returns:
+            Duration in seconds, or None if there are too few samples.
+        """
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        rank = min(len(ordered) - 1, max(0, int(len(ordered) * pct / 100)))
+        return ordered[rank]
+
+
+_windows: dict[str, LatencyWindow] = {}
+_registry_lock = threading.Lock()
+
+
+def get_window(key: str) -> LatencyWindow:
+    """Return the process-wide window for key, creating it on first use."""
+    with _registry_lock:
+        window = _windows.get(key)
+        if window is None:
+            window = _windows[key] = LatencyWindow()
+        return window
+
+
+def reset() -> None:
+    """Forget every window. Intended for tests."""
+    with _registry_lock:
+        _windows.clear()
@@ -0,0 +1,81 @@
+"""In-process metrics registry — counters and gauges with label sets.
+
+Kept dependency-free on purpose: the consumer publishes a snapshot to Redis
+and the log on a fixed interval, so no scrape endpoint is needed.
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: dict[str, dict[LabelKey, float]] = {}
+_gauges: dict[str, dict[LabelKey, float]] = {}
+
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_name(name: str, key: LabelKey) -> str:
+    if not key:
+        return name
+    inner = ",".join(f'{k}="{v}"' for k, v in key)
+    return f"{name}{{{inner}}}"
+
+
+def inc(name: str, value: float = 1.0, **labels: object) -> None:
+    """Increment a counter.
+
+    Args:
+        name: Metric name (e.g. "llm_requests_total").
+        value: Amount to add.
+        **labels: Label values identifying the series.
+    """
+    key = _label_key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: object) -> None:
+    """Set a gauge to an absolute value.
+
+    Args:
+        name: Metric name (e.g. "consumer_concurrency_limit").
+        value: Current value.
+        **labels: Label values identifying the series.
+    """
+    key = _label_key(labels)
+    with _lock:
+        _gauges.setdefault(name, {})[key] = float(value)
+
+
+def get(name: str, **labels: object) -> float:
+    """Read the current value of a counter or gauge (0.0 if unset)."""
+    key = _label_key(labels)
+    with _lock:
+        if name in _gauges and key in _gauges[name]:
+            return _gauges[name][key]
+        return _counters.get(name, {}).get(key, 0.0)
+
+
+def snapshot() -> dict[str, float]:
+    """Return every series as a flat {"name{labels}": value} dict."""
+    with _lock:
+        flat: dict[str, float] = {}
+        for source in (_counters, _gauges):
+            for name, series in source.items():
+                for key, value in series.items():
+                    flat[_format_name(name, key)] = value
+        return flat
+
+
+def reset() -> None:
+    """Clear all metrics. Intended for tests."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
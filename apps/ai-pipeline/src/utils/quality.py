@@ -31,12 +31,12 @@ def _laplacian_variance(image: Image.Image) -> float:
     Higher values = sharper image. Low values = blurry.
 
     Args:
-        image: PIL Image (will be converted to grayscale).
+        image: PIL Image (converted to grayscale unless already mode "L").
 
     Returns:
         Laplacian variance score.
     """
-    gray = image.convert("L")
+    gray = image if image.mode == "L" else image.convert("L")
     # Apply Laplacian-like edge detection via FIND_EDGES
     edges = gray.filter(ImageFilter.FIND_EDGES)
     stat = ImageStat.Stat(edges)
@@ -48,12 +48,12 @@ def _mean_brightness(image: Image.Image) -> float:
     """Compute mean brightness of an image.
 
     Args:
-        image: PIL Image.
+        image: PIL Image (converted to grayscale unless already mode "L").
 
     Returns:
         Mean brightness (0-255).
     """
-    gray = image.convert("L")
+    gray = image if image.mode == "L" else image.convert("L")
     stat = ImageStat.Stat(gray)
     return stat.mean[0]
 
@@ -70,20 +70,44 @@ def check_photo_quality(image_bytes: bytes) -> QualityCheck:
     Args:
         image_bytes: Raw image bytes.
 
+    Returns:
+        QualityCheck with pass/fail and list of issues.
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+    except Exception as e:
+        return check_image_quality(len(image_bytes), None, open_error=e)
+    return check_image_quality(len(image_bytes), image)
+
+
+def check_image_quality(
+    size_bytes: int,
+    image: Image.Image | None,
+    gray: Image.Image | None = None,
+    open_error: Exception | None = None,
+) -> QualityCheck:
+    """Run quality pre-checks on an already-decoded image.
+
+    Shared by check_photo_quality() and PreparedPhoto, which keeps the
+    decoded image and grayscale plane around for the analyzers.
+
+    Args:
+        size_bytes: Size of the original encoded file.
+        image: Decoded PIL Image, or None if decoding failed.
+        gray: Precomputed grayscale plane (computed from image if omitted).
+        open_error: The decode error when image is None.
+
     Returns:
         QualityCheck with pass/fail and list of issues.
     """
     issues: list[str] = []
 
     # File size check
-    if len(image_bytes) > MAX_FILE_SIZE:
-        issues.append(f"File too large: {len(image_bytes) / 1024 / 1024:.1f}MB (max {MAX_FILE_SIZE / 1024 / 1024:.0f}MB)")
+    if size_bytes > MAX_FILE_SIZE:
+        issues.append(f"File too large: {size_bytes / 1024 / 1024:.1f}MB (max {MAX_FILE_SIZE / 1024 / 1024:.0f}MB)")
 
-    # Try to open the image
-    try:
-        image = Image.open(io.BytesIO(image_bytes))
-    except Exception as e:
-        issues.append(f"Cannot open image: {e}")
+    if image is None:
+        issues.append(f"Cannot open image: {open_error}")
         return QualityCheck(passed=False, issues=issues)
 
     # Dimension check
@@ -93,7 +117,7 @@ def check_photo_quality(image_bytes: bytes) -> QualityCheck:
 
     # Blur check
     try:
-        blur_score = _laplacian_variance(image)
+        blur_score = _laplacian_variance(gray if gray is not None else image)
         if blur_score < BLUR_THRESHOLD:
             issues.append(f"Image appears blurry (score={blur_score:.1f}, threshold={BLUR_THRESHOLD})")
     except Exception as e:
@@ -101,7 +125,7 @@ def check_photo_quality(image_bytes: bytes) -> QualityCheck:
 
     # Brightness check
     try:
-        brightness = _mean_brightness(image)
+        brightness = _mean_brightness(gray if gray is not None else image)
         if brightness < BRIGHTNESS_LOW:
             issues.append(f"Image too dark (brightness={brightness:.1f}, min={BRIGHTNESS_LOW})")
         elif brightness > BRIGHTNESS_HIGH:
@@ -116,24 +140,33 @@ def check_photo_quality(image_bytes: bytes) -> QualityCheck:
     return QualityCheck(passed=passed, issues=issues)
 
 
-def filter_quality_photos(
-    photos: list[tuple[bytes, str]],
-) -> tuple[list[tuple[bytes, str]], list[str]]:
+def filter_quality_photos(photos: list) -> tuple[list, list[str]]:
     """Filter photos by quality, returning only those that pass.
 
+    Accepts either (image_bytes, photo_type) tuples or PreparedPhoto objects;
+    prepared photos reuse their memoized decode and quality metrics.
+
     Args:
-        photos: List of (image_bytes, photo_type) tuples.
+        photos: List of (image_bytes, photo_type) tuples or PreparedPhotos.
 
     Returns:
-        Tuple of (passing_photos, all_quality_issues).
+        Tuple of (passing_photos, all_quality_issues), same element type as the input.
     """
-    passing: list[tuple[bytes, str]] = []
+    # Import here to avoid circular imports
+    from src.utils.images import PreparedPhoto
+
+    passing: list = []
     all_issues: list[str] = []
 
-    for img_bytes, photo_type in photos:
-        check = check_photo_quality(img_bytes)
+    for photo in photos:
+        if isinstance(photo, PreparedPhoto):
+            photo_type = photo.photo_type
+            check = photo.quality
+        else:
+            img_bytes, photo_type = photo
+            check = check_photo_quality(img_bytes)
         if check.passed:
-            passing.append((img_bytes, photo_type))
+            passing.append(photo)
         else:
             all_issues.extend([f"[{photo_type}] {issue}" for issue in check.issues])
             logger.warning("Skipping %s: %s", photo_type, check.issues)
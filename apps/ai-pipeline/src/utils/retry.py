@@ -0,0 +1,170 @@
+"""Shared retry policy — backoff with decorrelated jitter, Retry-After and a retry budget.
+
+Every outbound client (LLM, Pl@ntNet, internal API) drives its attempt
+loop through a ``Retrier``:
+
+    retrier = Retrier(POLICY)
+    for attempt in retrier:
+        try:
+            return await call()
+        except httpx.TimeoutException as e:
+            last_error, reason, headers = e, "timeout", None
+        ...
+        if not await retrier.backoff(reason, headers):
+            break
+    raise last_error
+
+Delays use decorrelated jitter: each sleep is drawn from
+[base, 3 × previous sleep] and capped. Jobs that failed together therefore
+spread out instead of retrying in lockstep. A Retry-After header sets a
+floor on the delay. If the header asks for longer than the policy's cap,
+the call gives up instead of parking the job.
+
+Retries also draw from one process-wide budget. Every first attempt adds
+RETRY_BUDGET_PCT/100 of a token, and every retry spends a whole one. When
+an upstream is degraded, retries therefore can't multiply its load beyond
+that fraction. Once the budget runs dry, calls fail after their first
+attempt.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+
+from src.config import settings
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Retries the budget allows back-to-back before first attempts refill it
+DEFAULT_BUDGET_BURST = 10.0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How one kind of call is retried."""
+
+    name: str  # metric label, e.g. "llm"
+    max_attempts: int = 3
+    base_delay_s: float = 1.0
+    max_delay_s: float = 30.0
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP date).
+
+    Args:
+        headers: Response headers.
+
+    Returns:
+        Seconds to wait, or None if the header is absent or malformed.
+    """
+    raw = headers.get("retry-after")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryBudget:
+    """Token bucket capping retries to a fraction of first attempts."""
+
+    def __init__(self, ratio: float, burst: float = DEFAULT_BUDGET_BURST) -> None:
+        self.ratio = max(0.0, ratio)
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def record_attempt(self) -> None:
+        """Credit the budget for one first attempt."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget if it's there."""
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class Retrier:
+    """Attempt counter and backoff for one call under a RetryPolicy."""
+
+    def __init__(self, policy: RetryPolicy, budget: "RetryBudget | None" = None) -> None:
+        self.policy = policy
+        self.budget = budget or get_budget()
+        self.attempt = 0
+        self._delay = policy.base_delay_s
+
+    def __iter__(self) -> Iterator[int]:
+        self.budget.record_attempt()
+        for self.attempt in range(1, self.policy.max_attempts + 1):
+            yield self.attempt
+
+    async def backoff(self, reason: str, headers: Mapping[str, str] | None = None, delay: float | None = None) -> bool:
+        """Wait before the next attempt, if there is to be one.
+
+        Args:
+            reason: Why the attempt failed ("timeout", "429", "5xx", ...).
+            headers: Failed response's headers, for Retry-After.
+            delay: Fixed delay instead of the jittered backoff (0 to retry at once,
+                e.g. on a different API key).
+
+        Returns:
+            True to retry; False if attempts, budget or patience ran out.
+        """
+        name = self.policy.name
+        if self.attempt >= self.policy.max_attempts:
+            return False
+        retry_after = retry_after_seconds(headers) if headers is not None else None
+        if retry_after is not None and retry_after > self.policy.max_delay_s:
+            metrics.inc("retries_denied_total", call=name, reason="retry_after")
+            logger.warning("%s: Retry-After %.0fs exceeds %.0fs, not retrying", name, retry_after, self.policy.max_delay_s)
+            return False
+        if not self.budget.try_spend():
+            metrics.inc("retries_denied_total", call=name, reason="budget")
+            logger.warning("%s: retry budget exhausted, not retrying after %s", name, reason)
+            return False
+
+        if delay is None:
+            self._delay = min(self.policy.max_delay_s, random.uniform(self.policy.base_delay_s, self._delay * 3))
+            delay = self._delay
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        metrics.inc("retries_total", call=name, reason=reason)
+        if delay > 0:
+            logger.info("%s: retrying in %.1fs (%s)", name, delay, reason)
+            await asyncio.sleep(delay)
+        return True
+
+
+_budget: RetryBudget | None = None
+
+
+def get_budget() -> RetryBudget:
+    """Return the process-wide retry budget, (re)built if RETRY_BUDGET_PCT changed."""
+    global _budget
+    ratio = max(0.0, settings.retry_budget_pct / 100)
+    if _budget is None or _budget.ratio != ratio:
+        _budget = RetryBudget(ratio)
+    return _budget
+
+
+def reset() -> None:
+    """Forget the retry budget. Intended for tests."""
+    global _budget
+    _budget = None
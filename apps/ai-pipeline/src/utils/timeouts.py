@@ -0,0 +1,68 @@
+"""Adaptive per-stage timeouts derived from observed latency.
+
+Each stage (LLM, Pl@ntNet, result POST, Nominatim) declares a
+``TimeoutPolicy`` and reports every attempt's duration through
+``observe()``. The durations go into a latency window per stage and
+upstream, e.g. "llm:anthropic/claude-sonnet-4-5-20250929". With
+ADAPTIVE_TIMEOUTS on, ``timeout_for()`` returns
+
+    clamp(TIMEOUT_QUANTILE of the window × TIMEOUT_MULTIPLIER, floor_s, ceiling_s)
+
+So a healthy upstream gets a tight timeout that cuts hung connections
+early, and a slow one gets more patience, up to the ceiling. Attempts
+that time out are recorded at the timeout they hit. A provider that
+slows down therefore pushes its quantile up rather than vanishing from
+the window. Until the window has TIMEOUT_MIN_SAMPLES, and whenever the
+feature is off, the policy's fixed default applies.
+
+Every derived value is published as the ``timeout_seconds`` gauge.
+"""
+
+from dataclasses import dataclass
+
+from src.config import settings
+from src.utils import latency, metrics
+
+
+@dataclass(frozen=True)
+class TimeoutPolicy:
+    """Timeout bounds for one stage."""
+
+    stage: str  # metric label and window prefix, e.g. "llm"
+    default_s: float  # used until enough latency is observed, or when adaptive timeouts are off
+    floor_s: float
+    ceiling_s: float
+
+
+def _window(policy: TimeoutPolicy, upstream: str) -> latency.LatencyWindow:
+    return latency.get_window(f"{policy.stage}:{upstream}" if upstream else policy.stage)
+
+
+def observe(policy: TimeoutPolicy, seconds: float, upstream: str = "") -> None:
+    """Record one attempt's duration (or the timeout it hit).
+
+    Args:
+        policy: The stage's policy.
+        seconds: How long the attempt took.
+        upstream: Provider/model or other upstream identity within the stage.
+    """
+    _window(policy, upstream).add(seconds)
+
+
+def timeout_for(policy: TimeoutPolicy, upstream: str = "") -> float:
+    """The timeout to use for the next attempt.
+
+    Args:
+        policy: The stage's policy.
+        upstream: Provider/model or other upstream identity within the stage.
+
+    Returns:
+        Timeout in seconds.
+    """
+    timeout = policy.default_s
+    if settings.adaptive_timeouts:
+        quantile = _window(policy, upstream).percentile(settings.timeout_quantile, settings.timeout_min_samples)
+        if quantile is not None:
+            timeout = min(policy.ceiling_s, max(policy.floor_s, quantile * settings.timeout_multiplier))
+    metrics.set_gauge("timeout_seconds", timeout, stage=policy.stage, upstream=upstream or policy.stage)
+    return timeout
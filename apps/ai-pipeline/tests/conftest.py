@@ -13,3 +13,25 @@ def sample_observation_id() -> str:
 def sample_job_data(sample_observation_id: str) -> dict:
     """Sample BullMQ job payload."""
     return {"observationId": sample_observation_id}
+
+
+@pytest.fixture(autouse=True)
+def _reset_process_state():
+    """Reset process-wide state around every test.
+
+    Each test starts with an empty LLM cache, closed circuits, fresh key
+    pools, hedge and retry budgets, bulkheads and spend, and no latency
+    history or metrics.
+    """
+    from src.clients import credentials, hedge, llm_cache, usage
+    from src.utils import bulkhead, circuit, latency, metrics, retry
+
+    resets = (
+        bulkhead.reset, circuit.reset, credentials.reset, hedge.reset,
+        latency.reset, llm_cache.reset, metrics.reset, retry.reset, usage.reset,
+    )
+    for reset in resets:
+        reset()
+    yield
+    for reset in resets:
+        reset()
@@ -0,0 +1,129 @@
+"""Tests for per-upstream bulkheads."""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from src.clients.llm import query
+from src.clients.plantnet import identify
+from src.config import settings
+from src.utils import metrics
+from src.utils.bulkhead import get_bulkhead, hold
+
+ANTHROPIC_RESPONSE = {"content": [{"type": "text", "text": "{}"}], "model": "m"}
+
+
+class TestBulkhead:
+    def test_unlimited_is_none(self):
+        assert get_bulkhead("llm:anthropic", 0) is None
+
+    def test_rebuilt_when_limit_changes(self):
+        first = get_bulkhead("plantnet", 2)
+        assert get_bulkhead("plantnet", 2) is first
+        assert get_bulkhead("plantnet", 4).limit == 4
+
+    @pytest.mark.asyncio
+    async def test_limit_and_fifo_order(self):
+        bulkhead = get_bulkhead("llm:anthropic", 2)
+        running, peak, order = 0, 0, []
+
+        async def call(i: int) -> None:
+            nonlocal running, peak
+            async with hold(bulkhead):
+                order.append(i)
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call(i) for i in range(6)))
+        assert peak == 2
+        assert order == list(range(6))
+        assert metrics.get("bulkhead_calls_total", bulkhead="llm:anthropic") == 6
+        assert metrics.get("bulkhead_wait_seconds_total", bulkhead="llm:anthropic") > 0
+        assert metrics.get("bulkhead_in_flight", bulkhead="llm:anthropic") == 0
+
+    @pytest.mark.asyncio
+    async def test_nested_scopes_and_unlimited_entries(self):
+        provider = get_bulkhead("llm:anthropic", 1)
+        async with hold(provider, None):
+            assert metrics.get("bulkhead_in_flight", bulkhead="llm:anthropic") == 1
+        assert metrics.get("bulkhead_in_flight", bulkhead="llm:anthropic") == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_released_on_error(self):
+        bulkhead = get_bulkhead("plantnet", 1)
+        with pytest.raises(RuntimeError):
+            async with hold(bulkhead):
+                raise RuntimeError("boom")
+        async with asyncio.timeout(1):
+            async with hold(bulkhead):
+                pass
+
+
+class TestQueryBulkheads:
+    @staticmethod
+    def _tracking_post():
+        state = {"running": 0, "peak": 0}
+
+        async def post(url, headers, **kwargs):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.01)
+            state["running"] -= 1
+            return httpx.Response(200, json=ANTHROPIC_RESPONSE, request=httpx.Request("POST", url))
+
+        return post, state
+
+    @pytest.mark.asyncio
+    async def test_provider_limit_caps_concurrent_calls(self):
+        post, state = self._tracking_post()
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_max_concurrent_calls = 2
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=post)):
+                await asyncio.gather(*(
+                    query(f"identify {i}", provider="anthropic", model="m", analyzer="species") for i in range(5)
+                ))
+
+        assert state["peak"] == 2
+        assert metrics.get("bulkhead_calls_total", bulkhead="llm:anthropic") == 5
+
+    @pytest.mark.asyncio
+    async def test_per_analyzer_limit(self):
+        post, state = self._tracking_post()
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_max_concurrent_calls_per_analyzer = 1
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=post)):
+                await asyncio.gather(*(
+                    query(f"assess {i}", provider="anthropic", model="m", analyzer="health") for i in range(3)
+                ))
+
+        assert state["peak"] == 1
+        assert metrics.get("bulkhead_calls_total", bulkhead="llm:anthropic:health") == 3
+
+
+class TestPlantNetBulkhead:
+    @pytest.mark.asyncio
+    async def test_plantnet_limit_is_separate_from_llm(self):
+        running, peak = 0, 0
+
+        async def post(url, **kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return httpx.Response(200, json={"results": []}, request=httpx.Request("POST", url))
+
+        with patch("src.clients.plantnet.settings", settings.model_copy()) as mock_settings:
+            mock_settings.plantnet_max_concurrent_calls = 1
+            with patch("src.clients.plantnet.get_client", return_value=MagicMock(post=post)):
+                await asyncio.gather(*(identify([(b"jpeg", "bark_closeup")], api_key="k") for _ in range(3)))
+
+        assert peak == 1
+        assert metrics.get("bulkhead_calls_total", bulkhead="plantnet") == 3
+        assert metrics.get("bulkhead_calls_total", bulkhead="llm:anthropic") == 0
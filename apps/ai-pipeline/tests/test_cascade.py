@@ -0,0 +1,145 @@
+"""Tests for the cheap-first model cascade."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.analyzers import cascade
+from src.analyzers.health import analyze_health
+from src.analyzers.species import analyze_species, disagrees, LLMSpecies
+from src.clients.llm import LLMResponse
+from src.clients.plantnet import PlantNetResult, PlantNetSpecies
+from src.config import settings
+from src.utils import metrics
+
+CHEAP = ("anthropic", "claude-haiku-4-5")
+
+
+@pytest.fixture
+def cascade_on():
+    with patch("src.analyzers.cascade.settings", settings.model_copy()) as mock_settings:
+        mock_settings.llm_cascade_route = "anthropic:claude-haiku-4-5"
+        yield mock_settings
+
+
+def _health(confidence: float) -> LLMResponse:
+    return LLMResponse(
+        text=f'{{"conditionStructural": "good", "conditionLeaf": "good", "confidence": {confidence}}}',
+        provider="anthropic", model="m",
+    )
+
+
+def _species(scientific: str, confidence: float) -> LLMResponse:
+    return LLMResponse(
+        text=f'{{"common": "x", "scientific": "{scientific}", "confidence": {confidence}}}',
+        provider="anthropic", model="m",
+    )
+
+
+def _route(call) -> tuple[str | None, str | None]:
+    return call.kwargs.get("provider"), call.kwargs.get("model")
+
+
+class TestHealthCascade:
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_off_by_default(self, mock_llm):
+        mock_llm.return_value = _health(0.2)
+        await analyze_health([(b"img", "full_tree_angle1")])
+        assert [_route(c) for c in mock_llm.call_args_list] == [(None, None)]
+        assert metrics.get("llm_cascade_total", analyzer="health") == 0
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_confident_cheap_answer_is_kept(self, mock_llm, cascade_on):
+        mock_llm.return_value = _health(0.9)
+        result = await analyze_health([(b"img", "full_tree_angle1")])
+        assert result.confidence == 0.9
+        assert [_route(c) for c in mock_llm.call_args_list] == [CHEAP]
+        assert metrics.get("llm_cascade_escalation_rate", analyzer="health") == 0
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_low_confidence_escalates(self, mock_llm, cascade_on):
+        mock_llm.side_effect = [_health(0.3), _health(0.85)]
+        result = await analyze_health([(b"img", "full_tree_angle1")])
+        assert result.confidence == 0.85
+        assert [_route(c) for c in mock_llm.call_args_list] == [CHEAP, (None, None)]
+        assert metrics.get("llm_cascade_escalations_total", analyzer="health", reason="low_confidence") == 1
+        assert metrics.get("llm_cascade_escalation_rate", analyzer="health") == 1.0
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_unparseable_and_failed_cheap_calls_escalate(self, mock_llm, cascade_on):
+        mock_llm.side_effect = [
+            LLMResponse(text="looks healthy", provider="anthropic", model="m"), _health(0.8),
+            Exception("503"), _health(0.8),
+        ]
+        await analyze_health([(b"img", "full_tree_angle1")])
+        await analyze_health([(b"img", "full_tree_angle1")])
+        assert metrics.get("llm_cascade_escalations_total", analyzer="health", reason="parse") == 1
+        assert metrics.get("llm_cascade_escalations_total", analyzer="health", reason="error") == 1
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_cheap_answer_kept_if_strong_one_is_unusable(self, mock_llm, cascade_on):
+        mock_llm.side_effect = [_health(0.3), LLMResponse(text="?", provider="anthropic", model="m")]
+        result = await analyze_health([(b"img", "full_tree_angle1")])
+        assert result.confidence == 0.3
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_cheap_answer_kept_if_strong_call_fails(self, mock_llm, cascade_on):
+        mock_llm.side_effect = [_health(0.1), RuntimeError("503")]
+        result = await analyze_health([(b"img", "full_tree_angle1")])
+        assert result.confidence == 0.1
+        assert metrics.get("llm_cascade_escalations_total", analyzer="health", reason="low_confidence") == 1
+
+    @pytest.mark.asyncio
+    async def test_strong_failure_without_cheap_answer_raises(self, cascade_on):
+        query = AsyncMock(side_effect=[Exception("cheap down"), RuntimeError("strong down")])
+        with pytest.raises(RuntimeError):
+            await cascade.run(query, "health", "p", [], None, lambda response, errors: None)
+
+
+class TestSpeciesCascade:
+    def test_disagrees(self):
+        oak = PlantNetSpecies("Quercus virginiana", ["Live Oak"], 0.8, "Quercus")
+        plantnet = PlantNetResult(species=[oak], best_match=oak, remaining_identification_requests=None)
+        assert disagrees(plantnet, LLMSpecies("x", "Quercus fusiformis", 0.9, "Quercus"))
+        assert not disagrees(plantnet, LLMSpecies("x", "quercus virginiana ", 0.9, "Quercus"))
+        assert not disagrees(None, LLMSpecies("x", "Quercus fusiformis", 0.9, "Quercus"))
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.species.reverse_geocode", new_callable=AsyncMock, return_value="unknown")
+    @patch("src.analyzers.species.llm_query")
+    @patch("src.analyzers.species.plantnet_identify")
+    async def test_disagreement_with_plantnet_escalates(self, mock_pn, mock_llm, _geocode, cascade_on):
+        oak = PlantNetSpecies("Quercus virginiana", ["Live Oak"], 0.85, "Quercus")
+        mock_pn.return_value = PlantNetResult(species=[oak], best_match=oak, remaining_identification_requests=None)
+        mock_llm.side_effect = [_species("Ulmus americana", 0.9), _species("Quercus virginiana", 0.8)]
+
+        result = await analyze_species([(b"img", "full_tree_angle1")])
+
+        assert [_route(c) for c in mock_llm.call_args_list] == [CHEAP, (None, None)]
+        assert result.scientific == "Quercus virginiana"
+        assert result.confidence > cascade_on.llm_cascade_species_min_confidence  # full agreement
+        assert metrics.get("llm_cascade_escalations_total", analyzer="species", reason="disagreement") == 1
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.species.reverse_geocode", new_callable=AsyncMock, return_value="unknown")
+    @patch("src.analyzers.species.llm_query")
+    @patch("src.analyzers.species.plantnet_identify")
+    async def test_agreement_stays_cheap(self, mock_pn, mock_llm, _geocode, cascade_on):
+        oak = PlantNetSpecies("Quercus virginiana", ["Live Oak"], 0.85, "Quercus")
+        mock_pn.return_value = PlantNetResult(species=[oak], best_match=oak, remaining_identification_requests=None)
+        mock_llm.return_value = _species("Quercus virginiana", 0.9)
+
+        await analyze_species([(b"img", "full_tree_angle1")])
+
+        assert [_route(c) for c in mock_llm.call_args_list] == [CHEAP]
+
+
+def test_malformed_route_disables_cascade(cascade_on):
+    cascade_on.llm_cascade_route = "haiku"
+    assert cascade.cheap_route() is None
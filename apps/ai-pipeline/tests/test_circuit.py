@@ -0,0 +1,76 @@
+"""Tests for circuit breakers."""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.utils import metrics
+from src.utils.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, get_breaker, states
+
+
+@pytest.fixture
+def clock():
+    now = [1000.0]
+    with patch("src.utils.circuit.time.monotonic", side_effect=lambda: now[0]):
+        yield now
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker("anthropic/m", failure_threshold=3, reset_timeout_s=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()  # resets the streak
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert metrics.get("circuit_state", circuit="anthropic/m") == 2
+        assert metrics.get("circuit_transitions_total", circuit="anthropic/m", to=OPEN) == 1
+
+    def test_half_open_single_probe_then_close(self, clock):
+        breaker = CircuitBreaker("anthropic/m", failure_threshold=1, reset_timeout_s=30)
+        breaker.record_failure()
+        clock[0] += 31
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()  # probe already in flight
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_failed_probe_reopens(self, clock):
+        breaker = CircuitBreaker("anthropic/m", failure_threshold=1, reset_timeout_s=30)
+        breaker.record_failure()
+        clock[0] += 31
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        clock[0] += 10
+        assert not breaker.allow()
+
+    def test_release_frees_probe_slot(self, clock):
+        breaker = CircuitBreaker("anthropic/m", failure_threshold=1, reset_timeout_s=30)
+        breaker.record_failure()
+        clock[0] += 31
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+
+    def test_abandoned_probe_times_out(self, clock):
+        breaker = CircuitBreaker("anthropic/m", failure_threshold=1, reset_timeout_s=30)
+        breaker.record_failure()
+        clock[0] += 31
+        assert breaker.allow()
+        clock[0] += 31
+        assert breaker.allow()
+
+
+class TestRegistry:
+    def test_one_breaker_per_name(self):
+        assert get_breaker("openai/gpt-4o") is get_breaker("openai/gpt-4o")
+        assert get_breaker("openai/gpt-4o") is not get_breaker("google/gemini")
+        assert states() == {"openai/gpt-4o": CLOSED, "google/gemini": CLOSED}
@@ -0,0 +1,95 @@
+"""Tests for the adaptive (AIMD) concurrency controller."""
+
+import pytest
+
+from src.utils import metrics
+from src.utils.concurrency import (
+    AdaptiveConcurrency,
+    MIN_WINDOW_SAMPLES,
+    install,
+    record_upstream,
+)
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    metrics.reset()
+    yield
+    install(None)
+    metrics.reset()
+
+
+def _feed(controller: AdaptiveConcurrency, n: int, **kwargs) -> None:
+    for _ in range(n):
+        controller.record(**kwargs)
+
+
+class TestAdaptiveConcurrency:
+    def test_initial_limit_is_clamped(self):
+        assert AdaptiveConcurrency(initial=50, maximum=8).limit == 8
+        assert AdaptiveConcurrency(initial=0, minimum=2).limit == 2
+
+    def test_holds_with_too_few_samples(self):
+        c = AdaptiveConcurrency(initial=4)
+        _feed(c, MIN_WINDOW_SAMPLES - 1, rate_limited=True)
+        assert c.adjust(in_flight=4) == 4
+
+    def test_additive_increase_when_saturated_and_healthy(self):
+        c = AdaptiveConcurrency(initial=4, maximum=10, target_latency_s=10.0)
+        _feed(c, 10, latency_s=2.0)
+        assert c.adjust(in_flight=4) == 5
+
+    def test_holds_when_not_saturated(self):
+        c = AdaptiveConcurrency(initial=4, target_latency_s=10.0)
+        _feed(c, 10, latency_s=2.0)
+        assert c.adjust(in_flight=1) == 4
+
+    def test_multiplicative_decrease_on_429s(self):
+        c = AdaptiveConcurrency(initial=10, max_rate_limited=0.05)
+        _feed(c, 8, latency_s=1.0)
+        _feed(c, 2, rate_limited=True)
+        assert c.adjust(in_flight=10) == 7
+
+    def test_decrease_on_errors(self):
+        c = AdaptiveConcurrency(initial=3, max_error_rate=0.1)
+        _feed(c, 5, latency_s=1.0)
+        _feed(c, 5, error=True)
+        assert c.adjust(in_flight=3) == 2
+
+    def test_decrease_on_slow_calls(self):
+        c = AdaptiveConcurrency(initial=6, target_latency_s=5.0)
+        _feed(c, 10, latency_s=12.0)
+        assert c.adjust(in_flight=6) == 4
+
+    def test_never_below_minimum(self):
+        c = AdaptiveConcurrency(initial=2, minimum=2)
+        _feed(c, 10, rate_limited=True)
+        assert c.adjust(in_flight=2) == 2
+
+    def test_window_resets_after_adjust(self):
+        c = AdaptiveConcurrency(initial=4, target_latency_s=10.0)
+        _feed(c, 10, rate_limited=True)
+        c.adjust(in_flight=4)
+        assert c.adjust(in_flight=0) == c.limit
+
+    def test_limit_exported_as_gauge(self):
+        c = AdaptiveConcurrency(initial=4, maximum=10, target_latency_s=10.0)
+        _feed(c, 10, latency_s=1.0)
+        c.adjust(in_flight=4)
+        assert metrics.get("consumer_concurrency_limit") == 5
+        assert metrics.get("consumer_concurrency_adjustments_total", direction="up") == 1
+
+
+class TestRecordUpstream:
+    def test_counts_outcomes(self):
+        record_upstream("anthropic", latency_s=1.0)
+        record_upstream("anthropic", rate_limited=True)
+        assert metrics.get("upstream_calls_total", upstream="anthropic", outcome="ok") == 1
+        assert metrics.get("upstream_calls_total", upstream="anthropic", outcome="rate_limited") == 1
+
+    def test_feeds_installed_controller(self):
+        c = AdaptiveConcurrency(initial=10)
+        install(c)
+        for _ in range(10):
+            record_upstream("anthropic", rate_limited=True)
+        assert c.adjust(in_flight=10) < 10
@@ -0,0 +1,132 @@
+"""Tests for per-provider API key pools."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.clients.credentials import CredentialPool, get_pool, parse_credentials
+from src.clients.llm import query
+from src.config import settings
+from src.utils import metrics
+
+ANTHROPIC_RESPONSE = {
+    "content": [{"type": "text", "text": '{"species": "oak"}'}],
+    "model": "m",
+    "usage": {"input_tokens": 100, "output_tokens": 20},
+}
+
+
+def _response(status: int, headers: dict | None = None, json: dict | None = None) -> httpx.Response:
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    return httpx.Response(status, headers=headers or {}, json=json or {"error": "x"}, request=request)
+
+
+class TestParseCredentials:
+    def test_entries(self):
+        creds = parse_credentials("anthropic", "sk-a, sk-b*3, sk-c@https://proxy.example.com/*0.5")
+        assert [(c.key, c.base_url, c.weight) for c in creds] == [
+            ("sk-a", "https://api.anthropic.com", 1.0),
+            ("sk-b", "https://api.anthropic.com", 3.0),
+            ("sk-c", "https://proxy.example.com", 0.5),
+        ]
+
+    def test_single_key_joins_pool_once(self):
+        assert [c.key for c in parse_credentials("openai", "sk-b", "sk-a")] == ["sk-a", "sk-b"]
+        assert [c.key for c in parse_credentials("openai", "sk-a", "sk-a")] == ["sk-a"]
+
+    def test_id_does_not_leak_key(self):
+        (cred,) = parse_credentials("anthropic", "sk-secret")
+        assert "secret" not in cred.id
+        assert "secret" not in repr(cred)
+
+    def test_empty_pool_raises(self):
+        with pytest.raises(ValueError, match="ANTHROPIC_API_KEY"):
+            get_pool("anthropic", "", "")
+
+
+class TestCredentialPool:
+    def test_prefers_faster_key(self):
+        pool = CredentialPool("anthropic", parse_credentials("anthropic", "sk-fast,sk-slow"))
+        fast, slow = pool.credentials
+        pool.observe(fast, latency_s=1.0)
+        pool.observe(slow, latency_s=10.0)
+        picks = []
+        for _ in range(200):
+            cred = pool.acquire()
+            pool.release(cred)
+            picks.append(cred.key)
+        # Two choices: the slow key only wins when drawn twice (~25%)
+        assert picks.count("sk-fast") > 120
+
+    def test_low_quota_is_penalized(self):
+        pool = CredentialPool("anthropic", parse_credentials("anthropic", "sk-a,sk-b"))
+        a, b = pool.credentials
+        pool.observe(a, 1.0, {"anthropic-ratelimit-requests-limit": "100", "anthropic-ratelimit-requests-remaining": "1"})
+        pool.observe(b, 1.0, {"anthropic-ratelimit-requests-limit": "100", "anthropic-ratelimit-requests-remaining": "90"})
+        assert pool._cost(a) > pool._cost(b)
+
+    def test_ejected_key_skipped_until_all_are(self):
+        pool = CredentialPool("anthropic", parse_credentials("anthropic", "sk-a,sk-b"))
+        a, b = pool.credentials
+        pool.eject(a, 60, "401")
+        assert {pool.acquire().key for _ in range(20)} == {"sk-b"}
+        assert not pool.has_alternative(b)
+        pool.eject(b, 120, "429")
+        assert pool.acquire() is a  # back soonest
+        assert metrics.get("llm_key_ejections_total", provider="anthropic", key=a.id, reason="401") == 1
+
+
+class TestQueryWithPool:
+    @pytest.fixture
+    def pool_settings(self):
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = ""
+            mock_settings.anthropic_api_keys = "sk-bad,sk-good@https://proxy.example.com"
+            mock_settings.llm_prompt_caching = False
+            yield mock_settings
+
+    @staticmethod
+    async def _post(url, headers, **kwargs):
+        if headers["x-api-key"] == "sk-bad":
+            return _response(401)
+        assert url == "https://proxy.example.com/v1/messages"
+        return _response(200, json=ANTHROPIC_RESPONSE)
+
+    @pytest.mark.asyncio
+    async def test_auth_failure_ejects_key_and_retries_immediately(self, pool_settings):
+        mock_post = AsyncMock(side_effect=self._post)
+        with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+            with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock) as sleep:
+                for i in range(5):
+                    result = await query(f"identify {i}", provider="anthropic", model="m")
+
+        assert result.text == '{"species": "oak"}'
+        sleep.assert_not_awaited()
+        keys = [c.kwargs["headers"]["x-api-key"] for c in mock_post.call_args_list]
+        assert keys.count("sk-bad") <= 1  # ejected after its first 401
+
+    @pytest.mark.asyncio
+    async def test_429_moves_to_next_key(self, pool_settings):
+        pool_settings.anthropic_api_keys = "sk-a,sk-b"
+        seen = []
+
+        async def post(url, headers, **kwargs):
+            seen.append(headers["x-api-key"])
+            if len(seen) == 1:
+                return _response(429, headers={"retry-after": "20"})
+            return _response(200, json=ANTHROPIC_RESPONSE)
+
+        with patch("src.clients.llm.get_client", return_value=MagicMock(post=AsyncMock(side_effect=post))):
+            with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock) as sleep:
+                await query("identify", provider="anthropic", model="m")
+
+        assert len(seen) == 2 and seen[0] != seen[1]
+        sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_single_bad_key_still_raises(self, pool_settings):
+        pool_settings.anthropic_api_keys = "sk-bad"
+        with patch("src.clients.llm.get_client", return_value=MagicMock(post=AsyncMock(side_effect=self._post))):
+            with pytest.raises(httpx.HTTPStatusError):
+                await query("identify", provider="anthropic", model="m")
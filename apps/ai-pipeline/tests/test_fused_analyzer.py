@@ -0,0 +1,131 @@
+"""Tests for the fused (single-call) analyzer and the pipeline's fused mode."""
+
+import json
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.analyzers.fused import analyze_fused, parse_fused_response, FusedResult
+from src.analyzers.health import HealthResult
+from src.analyzers.species import SpeciesResult
+from src.clients.llm import LLMResponse
+from src.clients.storage import ObservationRecord
+from src.pipeline import _analyze_fused
+
+
+FULL_DOC = {
+    "species": {"common": "Live Oak", "scientific": "Quercus virginiana", "confidence": 0.9},
+    "health": {
+        "conditionStructural": "good", "conditionLeaf": "fair",
+        "confidence": 0.8, "observations": ["deadwood"],
+    },
+    "site": {
+        "conditionRating": "good", "crownDieback": False, "trunkDefects": ["lean"],
+        "locationType": "street", "siteType": "tree_lawn", "overheadUtilityConflict": True,
+        "maintenanceFlag": "routine", "sidewalkDamage": False,
+        "mulchSoilCondition": "no_mulch", "riskFlag": False,
+    },
+    "measurements": {"dbhCm": 45, "heightM": 12, "crownWidthM": 9, "numStems": 1},
+}
+
+
+def _response(doc) -> LLMResponse:
+    text = doc if isinstance(doc, str) else json.dumps(doc)
+    return LLMResponse(text=text, provider="anthropic", model="test")
+
+
+class TestParseFusedResponse:
+    def test_all_sections(self):
+        result = parse_fused_response(_response(FULL_DOC))
+        assert result.species.scientific == "Quercus virginiana"
+        assert result.species.genus == "Quercus"
+        assert result.health.condition_structural == "good"
+        assert result.site.location_type == "street"
+        assert result.measurements.dbh_cm == 45.0
+
+    def test_invalid_section_is_none(self):
+        doc = dict(FULL_DOC, health={"conditionStructural": "amazing", "conditionLeaf": "???"})
+        result = parse_fused_response(_response(doc))
+        assert result.health is None
+        assert result.species is not None
+        assert result.site is not None
+
+    def test_missing_section_is_none(self):
+        doc = {k: v for k, v in FULL_DOC.items() if k != "measurements"}
+        assert parse_fused_response(_response(doc)).measurements is None
+
+    def test_unparseable_document(self):
+        assert parse_fused_response(_response("no json here")) == FusedResult()
+
+
+class TestAnalyzeFused:
+    @pytest.mark.asyncio
+    @patch("src.analyzers.fused.llm_query")
+    async def test_single_call(self, mock_llm):
+        mock_llm.return_value = _response(FULL_DOC)
+        result = await analyze_fused([(b"img", "full_tree_angle1")], 30.27, -97.74, region="Austin")
+        mock_llm.assert_called_once()
+        assert "Austin" in mock_llm.call_args.args[0]
+        assert result.health is not None
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.fused.llm_query")
+    async def test_llm_error_returns_empty(self, mock_llm):
+        mock_llm.side_effect = Exception("API down")
+        assert await analyze_fused([(b"img", "full_tree_angle1")]) == FusedResult()
+
+
+def _observation() -> ObservationRecord:
+    return ObservationRecord(id="obs", tree_id=None, latitude=30.27, longitude=-97.74, status="pending_ai")
+
+
+class TestPipelineFusedMode:
+    @pytest.mark.asyncio
+    @patch("src.pipeline.analyze_measurements")
+    @patch("src.pipeline.analyze_site")
+    @patch("src.pipeline.analyze_health")
+    @patch("src.pipeline.reverse_geocode", new_callable=AsyncMock, return_value="Austin")
+    @patch("src.analyzers.species.plantnet_identify", new_callable=AsyncMock, return_value=None)
+    @patch("src.analyzers.species.llm_query")
+    @patch("src.analyzers.fused.llm_query")
+    async def test_falls_back_only_for_failed_section(
+        self, mock_fused_llm, mock_species_llm, _pn, _geo, mock_health, mock_site, mock_measurements,
+    ):
+        doc = dict(FULL_DOC, health={"conditionStructural": "amazing"})
+        mock_fused_llm.return_value = _response(doc)
+        mock_health.return_value = HealthResult(
+            condition_structural="good", condition_leaf="good", confidence=0.7,
+        )
+
+        species, health, measurements, site = await _analyze_fused([(b"img", "full_tree_angle1")], _observation())
+
+        mock_fused_llm.assert_called_once()
+        mock_species_llm.assert_not_called()
+        mock_health.assert_called_once()
+        mock_site.assert_not_called()
+        mock_measurements.assert_not_called()
+        assert isinstance(species, SpeciesResult)
+        assert species.scientific == "Quercus virginiana"
+        assert health.condition_structural == "good"
+        assert site.location_type == "street"
+        assert measurements.height_m == 12.0
+
+    @pytest.mark.asyncio
+    @patch("src.pipeline.analyze_measurements")
+    @patch("src.pipeline.analyze_site")
+    @patch("src.pipeline.analyze_health")
+    @patch("src.pipeline.reverse_geocode", new_callable=AsyncMock, return_value="Austin")
+    @patch("src.analyzers.species.plantnet_identify", new_callable=AsyncMock, return_value=None)
+    @patch("src.analyzers.species.llm_query")
+    @patch("src.analyzers.fused.llm_query")
+    async def test_species_prompt_sent_when_section_fails(
+        self, mock_fused_llm, mock_species_llm, _pn, _geo, mock_health, mock_site, mock_measurements,
+    ):
+        doc = dict(FULL_DOC, species={"common": "?"})
+        mock_fused_llm.return_value = _response(doc)
+        mock_species_llm.return_value = _response(FULL_DOC["species"])
+
+        species, *_ = await _analyze_fused([(b"img", "full_tree_angle1")], _observation())
+
+        mock_species_llm.assert_called_once()
+        assert species.scientific == "Quercus virginiana"
@@ -0,0 +1,126 @@
+"""Tests for hedged LLM requests."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from src.clients.hedge import HedgeBudget, race
+from src.clients.llm import LLMResponse, query
+from src.config import settings
+from src.utils import latency, metrics
+
+
+def _call(result, delay: float = 0.0, error: Exception | None = None, log: list | None = None):
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(f"cancelled {result}")
+            raise
+        if error is not None:
+            raise error
+        return result
+    return run
+
+
+class TestRace:
+    @pytest.mark.asyncio
+    async def test_fast_primary_never_hedges(self):
+        started = []
+
+        async def backup():
+            started.append(True)
+            return "backup"
+
+        assert await race(_call("primary"), backup, delay=0.05) == ("primary", False)
+        assert not started
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_and_primary_is_cancelled(self):
+        log: list[str] = []
+        result = await race(_call("primary", delay=1.0, log=log), _call("backup"), delay=0.01)
+        assert result == ("backup", True)
+        await asyncio.sleep(0)
+        assert log == ["cancelled primary"]
+
+    @pytest.mark.asyncio
+    async def test_failed_hedge_waits_for_primary(self):
+        result = await race(_call("primary", delay=0.05), _call("x", error=RuntimeError("boom")), delay=0.01)
+        assert result == ("primary", False)
+
+    @pytest.mark.asyncio
+    async def test_both_fail_raises_primary_error(self):
+        with pytest.raises(ValueError, match="primary"):
+            await race(
+                _call("p", delay=0.02, error=ValueError("primary")),
+                _call("b", error=RuntimeError("backup")),
+                delay=0.01,
+            )
+
+    @pytest.mark.asyncio
+    async def test_invalid_result_loses_to_valid_one(self):
+        result = await race(_call("", delay=0.02), _call("ok", delay=0.04), delay=0.01, valid=bool)
+        assert result == ("ok", True)
+
+    @pytest.mark.asyncio
+    async def test_budget_refusal_keeps_waiting_on_primary(self):
+        result = await race(_call("primary", delay=0.03), _call("backup"), delay=0.01, may_hedge=lambda: False)
+        assert result == ("primary", False)
+
+
+class TestHedgeBudget:
+    def test_caps_hedges_to_ratio_of_calls(self):
+        budget = HedgeBudget(0.25)
+        spent = 0
+        for _ in range(100):
+            budget.record_call()
+            spent += budget.try_spend()
+        assert spent == 25
+
+    def test_zero_budget_never_hedges(self):
+        budget = HedgeBudget(0.0)
+        budget.record_call()
+        assert not budget.try_spend()
+
+
+class TestQueryHedging:
+    @pytest.mark.asyncio
+    async def test_slow_call_is_hedged_to_alternate_route(self):
+        window = latency.get_window("anthropic/species")
+        for _ in range(20):
+            window.add(0.01)
+
+        async def upstream(prompt, imgs, prov, mdl, *args, **kwargs):
+            await asyncio.sleep(1.0 if prov == "anthropic" else 0.0)
+            return LLMResponse(text='{"species": "oak"}', provider=prov, model=mdl)
+
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.llm_hedging = True
+            mock_settings.llm_hedge_route = "openai:gpt-4o"
+            mock_settings.llm_hedge_budget_pct = 100.0
+            with patch("src.clients.llm.get_cache", return_value=None):
+                with patch("src.clients.llm._query_upstream", side_effect=upstream):
+                    result = await query("identify", provider="anthropic", model="m", analyzer="species")
+
+        assert result.provider == "openai"
+        assert metrics.get("llm_hedges_total", provider="anthropic", analyzer="species", outcome="won") == 1
+        assert len(latency.get_window("openai/species")) == 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_latency_history(self):
+        calls = []
+
+        async def upstream(prompt, imgs, prov, mdl, *args, **kwargs):
+            calls.append(prov)
+            return LLMResponse(text="{}", provider=prov, model=mdl)
+
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.llm_hedging = True
+            with patch("src.clients.llm.get_cache", return_value=None):
+                with patch("src.clients.llm._query_upstream", side_effect=upstream):
+                    await query("identify", provider="anthropic", model="m", analyzer="health")
+
+        assert calls == ["anthropic"]
+        assert len(latency.get_window("anthropic/health")) == 1
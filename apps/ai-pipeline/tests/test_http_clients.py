@@ -0,0 +1,69 @@
+"""Tests for the pooled outbound HTTP client registry."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.clients import http
+
+
+@pytest.fixture(autouse=True)
+async def _close_clients():
+    yield
+    await http.close_all()
+
+
+class TestGetClient:
+    @pytest.mark.asyncio
+    async def test_reuses_client_per_upstream(self):
+        first = http.get_client("anthropic")
+        assert http.get_client("anthropic") is first
+        assert http.get_client("openai") is not first
+
+    @pytest.mark.asyncio
+    async def test_recreates_closed_client(self):
+        first = http.get_client("nominatim")
+        await first.aclose()
+        assert http.get_client("nominatim") is not first
+
+    @pytest.mark.asyncio
+    async def test_close_all(self):
+        client = http.get_client("internal_api")
+        await http.close_all()
+        assert client.is_closed
+        assert http._clients == {}
+
+
+class TestConfigure:
+    def test_limits_scale_with_concurrency(self):
+        limits = http.configure(4)
+        assert limits.max_connections == 4 * http.CALLS_PER_JOB
+        assert limits.max_keepalive_connections == limits.max_connections
+
+    @pytest.mark.asyncio
+    async def test_http2_follows_settings(self, monkeypatch):
+        monkeypatch.setattr(http.settings, "http2_enabled", False)
+        client = http.get_client("google")
+        assert client._transport._pool._http2 is False
+
+
+class TestLoopRedis:
+    def test_client_per_loop_and_stale_one_closed(self):
+        redis = http.LoopRedis("test")
+        clients = [MagicMock(aclose=AsyncMock()) for _ in range(2)]
+
+        async def use() -> object:
+            client = redis.get()
+            assert redis.get() is client
+            await asyncio.sleep(0)  # let a stale client's close run
+            return client
+
+        with patch("src.clients.http.aioredis.Redis.from_url", side_effect=clients):
+            first = asyncio.run(use())
+            second = asyncio.run(use())
+            asyncio.run(redis.close())
+
+        assert (first, second) == tuple(clients)
+        first.aclose.assert_awaited_once()
+        second.aclose.assert_awaited_once()
@@ -0,0 +1,103 @@
+"""Tests for the per-provider, per-analyzer image policy table."""
+
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from src.clients.image_policy import (
+    DEFAULT_POLICY,
+    ImagePolicy,
+    encode_variants,
+    estimate_image_tokens,
+    estimate_request_image_tokens,
+    resolve_policy,
+)
+from src.clients.json_body import materialize
+from src.clients.llm import _build_anthropic_payload, _build_google_payload, _build_openai_payload
+from src.utils.images import PreparedPhoto
+
+
+def _photo(width: int = 4000, height: int = 3000, photo_type: str = "full_tree_angle1") -> PreparedPhoto:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (90, 120, 60)).save(buf, format="JPEG")
+    return PreparedPhoto(buf.getvalue(), photo_type)
+
+
+def _decoded_size(b64: str) -> tuple[int, int]:
+    return Image.open(io.BytesIO(base64.b64decode(b64))).size
+
+
+class TestResolvePolicy:
+    def test_exact_match_wins(self):
+        assert resolve_policy("anthropic", "site", "bark_closeup").max_dim == 768
+
+    def test_analyzer_beats_photo_type(self):
+        assert resolve_policy("anthropic", "site", "full_tree_angle2") == resolve_policy("anthropic", "site", "x")
+
+    def test_photo_type_fallback(self):
+        assert resolve_policy("anthropic", "species", "bark_closeup").crop == 0.8
+
+    def test_provider_default(self):
+        assert resolve_policy("google", None, "full_tree_angle1") == ImagePolicy(max_dim=1536)
+
+    def test_unknown_provider(self):
+        assert resolve_policy("mystery", "health", "bark_closeup") is DEFAULT_POLICY
+
+    def test_encode_variants(self):
+        variants = encode_variants("anthropic", "full_tree_angle1")
+        assert (1232, 1.0) in variants and (1024, 1.0) in variants
+        assert encode_variants("anthropic", "full_tree_angle1", shared_prefix=True) == [(1232, 1.0)]
+
+
+class TestEstimateTokens:
+    def test_anthropic(self):
+        assert estimate_image_tokens("anthropic", 1000, 750) == 1000
+        assert estimate_image_tokens("anthropic", 4000, 3000) == 1600
+
+    def test_anthropic_default_fits_under_server_downscaling(self):
+        w, h = _photo(4000, 3000).fitted_size(resolve_policy("anthropic", "health", "full_tree_angle1").max_dim)
+        assert w * h <= 1_150_000
+        assert estimate_image_tokens("anthropic", w, h) < 1600
+
+    def test_openai(self):
+        assert estimate_image_tokens("openai", 4000, 3000, detail="low") == 85
+        # 1024x768 → 2x2 tiles
+        assert estimate_image_tokens("openai", 1024, 768, detail="high") == 85 + 170 * 4
+
+    def test_google(self):
+        assert estimate_image_tokens("google", 300, 300) == 258
+        assert estimate_image_tokens("google", 1536, 1152) == 258 * 4
+
+    def test_request_estimate_uses_policy(self):
+        photos = [_photo(), _photo(photo_type="bark_closeup")]
+        site = estimate_request_image_tokens("openai", photos, "site")
+        health = estimate_request_image_tokens("openai", photos, "health")
+        assert site == 85 * 2
+        assert health > site
+
+    def test_undecodable_photo_skipped(self):
+        assert estimate_request_image_tokens("anthropic", [PreparedPhoto(b"junk")]) == 0
+
+
+class TestPayloadsFollowPolicy:
+    def test_anthropic_site_sends_smaller_images(self):
+        photo = _photo()
+        site = materialize(_build_anthropic_payload("p", [photo], "m", analyzer="site"))
+        health = materialize(_build_anthropic_payload("p", [photo], "m", analyzer="health"))
+        assert _decoded_size(site["messages"][0]["content"][0]["source"]["data"]) == (1024, 768)
+        assert _decoded_size(health["messages"][0]["content"][0]["source"]["data"]) == (1232, 924)
+
+    def test_openai_detail(self):
+        payload = materialize(_build_openai_payload("p", [_photo()], "m", analyzer="site"))
+        image_url = payload["messages"][0]["content"][0]["image_url"]
+        assert image_url["detail"] == "low"
+        data = image_url["url"].split(",", 1)[1]
+        assert max(_decoded_size(data)) == 512
+
+    def test_google_bark_closeup_cropped(self):
+        payload = materialize(_build_google_payload("p", [_photo(2000, 1500, "bark_closeup")], "m", analyzer="species"))
+        data = payload["contents"][0]["parts"][0]["inline_data"]["data"]
+        # 80% centre crop (1600x1200) fits within 1536px
+        assert _decoded_size(data) == (1536, 1152)
@@ -0,0 +1,193 @@
+"""Tests for decode-once photo preparation."""
+
+import base64
+import io
+import random
+
+import pytest
+from PIL import Image
+
+from src.utils.images import (
+    MAX_IMAGE_DIMENSION,
+    MAX_QUALITY,
+    PreparedPhoto,
+    as_prepared,
+    prepare_photos,
+)
+from src.utils.quality import filter_quality_photos
+
+
+def _make_jpeg(width: int = 640, height: int = 480, noisy: bool = True) -> bytes:
+    img = Image.new("RGB", (width, height), (128, 128, 128))
+    if noisy:
+        random.seed(7)
+        pixels = img.load()
+        for x in range(0, width, 2):
+            for y in range(0, height, 2):
+                pixels[x, y] = (random.randint(0, 255),) * 3
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class TestPreparedPhoto:
+    def test_decodes_once(self, monkeypatch):
+        photo = PreparedPhoto(_make_jpeg(), "full_tree_angle1")
+        calls = []
+        real_open = Image.open
+        monkeypatch.setattr("src.utils.images.Image.open", lambda *a, **k: calls.append(1) or real_open(*a, **k))
+
+        photo.quality
+        photo.grayscale
+        photo.base64()
+        photo.base64(mime_type="image/png")
+        assert len(calls) == 1
+
+    def test_small_jpeg_passes_through(self):
+        data = _make_jpeg(640, 480)
+        photo = PreparedPhoto(data)
+        assert photo.encoded() == data
+        assert base64.b64decode(photo.base64()) == data
+
+    def test_large_image_resized(self):
+        photo = PreparedPhoto(_make_jpeg(3000, 2000, noisy=False))
+        resized = Image.open(io.BytesIO(photo.encoded()))
+        assert max(resized.size) == MAX_IMAGE_DIMENSION
+        assert resized.format == "JPEG"
+
+    def test_base64_memoized_per_mime(self):
+        photo = PreparedPhoto(_make_jpeg())
+        jpeg_b64 = photo.base64()
+        png_b64 = photo.base64(mime_type="image/png")
+        assert jpeg_b64 is photo.base64()
+        assert Image.open(io.BytesIO(base64.b64decode(png_b64))).format == "PNG"
+
+    def test_png_source_reencoded_as_jpeg(self):
+        buf = io.BytesIO()
+        Image.new("RGBA", (300, 300), (10, 200, 10, 255)).save(buf, format="PNG")
+        photo = PreparedPhoto(buf.getvalue())
+        assert Image.open(io.BytesIO(photo.encoded())).format == "JPEG"
+
+    def test_undecodable_passes_through(self):
+        photo = PreparedPhoto(b"not-an-image")
+        assert photo.image is None
+        assert photo.encoded() == b"not-an-image"
+        assert photo.quality.passed is False
+        assert any("Cannot open image" in issue for issue in photo.quality.issues)
+
+    def test_quality_matches_bytes_check(self):
+        from src.utils.quality import check_photo_quality
+
+        data = _make_jpeg(noisy=False)
+        assert PreparedPhoto(data).quality == check_photo_quality(data)
+
+
+class TestHelpers:
+    def test_as_prepared_wraps_tuples(self):
+        existing = PreparedPhoto(b"x", "bark_closeup")
+        result = as_prepared([(b"y", "full_tree_angle1"), existing])
+        assert result[0].photo_type == "full_tree_angle1"
+        assert result[1] is existing
+
+    @pytest.mark.asyncio
+    async def test_prepare_photos_warms_derivatives(self):
+        prepared = await prepare_photos([(_make_jpeg(), "full_tree_angle1")])
+        assert prepared[0]._quality is not None
+        assert prepared[0]._for_llm
+
+    def test_filter_accepts_prepared_photos(self):
+        good = PreparedPhoto(_make_jpeg(), "full_tree_angle1")
+        bad = PreparedPhoto(_make_jpeg(100, 100), "bark_closeup")
+        passing, issues = filter_quality_photos([good, bad])
+        assert passing == [good]
+        assert any(issue.startswith("[bark_closeup]") for issue in issues)
+
+
+class TestCrop:
+    def test_centre_crop(self):
+        img = Image.new("RGB", (1000, 500), (0, 0, 0))
+        img.paste((255, 255, 255), (100, 50, 900, 450))
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        photo = PreparedPhoto(buf.getvalue(), mime_type="image/png")
+
+        cropped = Image.open(io.BytesIO(photo.encoded(crop=0.8)))
+        assert cropped.size == (800, 400)
+        assert cropped.getpixel((0, 0)) == (255, 255, 255)
+
+    def test_fitted_size(self):
+        photo = PreparedPhoto(_make_jpeg(4000, 3000, noisy=False))
+        assert photo.fitted_size(1024) == (1024, 768)
+        assert photo.fitted_size(1024, crop=0.5) == (1024, 768)
+        assert photo.fitted_size(4000, crop=0.5) == (2000, 1500)
+        assert PreparedPhoto(b"junk").fitted_size() is None
+
+
+def _photo_like_jpeg(width: int, height: int) -> bytes:
+    """Smooth gradients plus sensor-like noise — compresses like a real photo."""
+    from PIL import ImageFilter
+
+    g = Image.linear_gradient("L").resize((width, height))
+    r = Image.radial_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    img = Image.merge("RGB", (g, r, noise)).filter(ImageFilter.GaussianBlur(1))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def _jpeg_with_exif(width: int, height: int, orientation: int) -> bytes:
+    img = Image.new("RGB", (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "PhoneMaker"
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", exif=exif)
+    return buf.getvalue()
+
+
+class TestForLLM:
+    def test_hits_byte_budget(self):
+        data = _photo_like_jpeg(1200, 900)
+        encoded = PreparedPhoto(data).for_llm(1200, max_bytes=60_000, formats=["image/jpeg"])
+        assert len(encoded.data) <= 60_000
+        assert encoded.mime_type == "image/jpeg"
+        assert encoded.quality < MAX_QUALITY
+        # One byte less and the chosen quality no longer fits
+        tighter = PreparedPhoto(data).for_llm(1200, max_bytes=len(encoded.data) - 1, formats=["image/jpeg"])
+        assert tighter.quality < encoded.quality
+
+    def test_prefers_webp(self):
+        photo = PreparedPhoto(_photo_like_jpeg(1200, 900))
+        encoded = photo.for_llm(1200, max_bytes=100_000, formats=["image/webp", "image/jpeg"])
+        assert encoded.mime_type == "image/webp"
+        assert Image.open(io.BytesIO(encoded.data)).format == "WEBP"
+
+    def test_unreachable_budget_returns_smallest(self):
+        encoded = PreparedPhoto(_make_jpeg(800, 600)).for_llm(800, max_bytes=100, formats=["image/jpeg"])
+        assert encoded.quality == 40
+
+    def test_clean_small_original_passes_through(self):
+        data = _make_jpeg(640, 480, noisy=False)
+        encoded = PreparedPhoto(data).for_llm(1024, max_bytes=len(data), formats=["image/jpeg"])
+        assert encoded.data == data
+        assert encoded.quality is None
+        assert base64.b64decode(encoded.base64) == data
+
+    def test_exif_orientation_applied_and_metadata_stripped(self):
+        data = _jpeg_with_exif(400, 300, orientation=6)  # rotate 90° CW on display
+        photo = PreparedPhoto(data)
+        encoded = photo.for_llm(1024, max_bytes=len(data) * 10, formats=["image/jpeg"])
+        out = Image.open(io.BytesIO(encoded.data))
+        assert out.size == (300, 400)
+        assert "exif" not in out.info
+        assert photo.fitted_size(1024) == (300, 400)
+
+    def test_memoized(self):
+        photo = PreparedPhoto(_make_jpeg())
+        assert photo.for_llm(512, max_bytes=50_000) is photo.for_llm(512, max_bytes=50_000)
+
+    def test_undecodable_passes_through(self):
+        encoded = PreparedPhoto(b"junk", mime_type="image/png").for_llm()
+        assert encoded.data == b"junk"
+        assert encoded.mime_type == "image/png"
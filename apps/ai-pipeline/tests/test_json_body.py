@@ -0,0 +1,78 @@
+"""Tests for streamed JSON request bodies."""
+
+import base64
+import json
+
+import httpx
+import pytest
+
+from src.clients.json_body import Base64Segment, JSONBody, iter_json, materialize
+
+
+B64 = base64.b64encode(b"\xff\xd8\xff\xe0 some image bytes")
+
+
+def _payload() -> dict:
+    return {
+        "model": "m",
+        "max_tokens": 1024,
+        "temperature": 0.5,
+        "stop": None,
+        "stream": False,
+        "messages": [{
+            "role": "user",
+            "content": [
+                {"type": "image", "source": {"data": Base64Segment(B64)}},
+                {"type": "image_url", "image_url": {"url": Base64Segment(B64, prefix="data:image/webp;base64,")}},
+                {"type": "text", "text": 'Identify "this" tree — ünïcode\n'},
+            ],
+        }],
+    }
+
+
+class TestIterJson:
+    def test_matches_json_dumps(self):
+        body = b"".join(iter_json(_payload()))
+        assert json.loads(body) == materialize(_payload())
+
+    def test_base64_not_copied(self):
+        views = [c for c in iter_json(_payload()) if isinstance(c, memoryview)]
+        assert len(views) == 2
+        assert all(v.obj is B64 for v in views)
+
+    def test_data_url(self):
+        doc = json.loads(b"".join(iter_json({"url": Base64Segment(B64, prefix="data:image/jpeg;base64,")})))
+        assert doc["url"] == "data:image/jpeg;base64," + B64.decode()
+
+
+class TestJSONBody:
+    def test_content_length(self):
+        body = JSONBody(_payload())
+        assert body.content_length == len(bytes(body))
+        assert body.headers == {"Content-Length": str(body.content_length)}
+
+    @pytest.mark.asyncio
+    async def test_restartable(self):
+        body = JSONBody(_payload())
+        first = b"".join([bytes(c) async for c in body])
+        second = b"".join([bytes(c) async for c in body])
+        assert first == second == bytes(body)
+
+    @pytest.mark.asyncio
+    async def test_sent_over_httpx(self):
+        received = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            received["length"] = request.headers["content-length"]
+            received["doc"] = json.loads(request.read())
+            return httpx.Response(200)
+
+        body = JSONBody(_payload())
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await client.post(
+                "https://llm.test/v1", content=body,
+                headers={"content-type": "application/json", **body.headers},
+            )
+
+        assert received["length"] == str(body.content_length)
+        assert received["doc"] == materialize(_payload())
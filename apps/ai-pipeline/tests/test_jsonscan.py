@@ -0,0 +1,75 @@
+"""Tests for the incremental JSON object scanner."""
+
+import pytest
+
+from src.utils.jsonscan import JSONObjectScanner, scan_json_object
+
+
+class TestScanJsonObject:
+    def test_bare_object(self):
+        assert scan_json_object('{"a": 1}') == {"a": 1}
+
+    def test_prose_and_fence(self):
+        text = 'Here you go:\n```json\n{"a": {"b": [1, 2]}}\n```\nLet me know!'
+        assert scan_json_object(text) == {"a": {"b": [1, 2]}}
+
+    def test_braces_and_escapes_in_strings(self):
+        text = '{"note": "use {curly} and \\"quotes\\" \\\\", "n": 1} trailing }'
+        assert scan_json_object(text) == {"note": 'use {curly} and "quotes" \\', "n": 1}
+
+    def test_skips_non_json_candidate(self):
+        assert scan_json_object('Format: {see below}. {"a": 1}') == {"a": 1}
+
+    def test_deep_nesting(self):
+        assert scan_json_object('x {"a": {"b": {"c": {"d": 1}}}} y') == {"a": {"b": {"c": {"d": 1}}}}
+
+    def test_object_inside_unclosed_prose_brace(self):
+        text = 'Result {as requested: {"a": {"b": 1}} and {"c": 2}'
+        assert scan_json_object(text) == {"a": {"b": 1}}
+
+    def test_object_inside_closed_prose_braces(self):
+        assert scan_json_object('Here {note: {"a": 1}} done') == {"a": 1}
+        assert scan_json_object('{see {x} and {"a": 1} or {"b": 2}} {"c": 3}') == {"a": 1}
+
+    def test_stray_braces_before_object(self):
+        assert scan_json_object("{" * 1000 + '{"a": 1}') == {"a": 1}
+
+    @pytest.mark.parametrize("text", ["", "no json here", '{"a": 1', "[1, 2]", "{" * 5000, "{x}" * 5000, "{x {y}}" * 5000])
+    def test_none_when_no_object(self, text):
+        assert scan_json_object(text) is None
+
+    def test_unterminated_fences_are_linear(self):
+        # Quadratic for the old regex cascade (several seconds); one pass here
+        text = ("```json\n" + "word " * 20) * 10_000
+        assert scan_json_object(text) is None
+
+
+class TestJSONObjectScanner:
+    def test_chunked_input(self):
+        text = 'Sure. {"species": "oak", "nested": {"x": "}"}} And some commentary.'
+        scanner = JSONObjectScanner()
+        results = [scanner.feed(ch) for ch in text]
+
+        completed_at = next(i for i, r in enumerate(results) if r is not None)
+        assert text[completed_at] == "}"
+        assert scanner.end == completed_at + 1
+        assert scanner.done
+        assert scanner.result == {"species": "oak", "nested": {"x": "}"}}
+
+    def test_candidate_spanning_chunks_after_rejected_one(self):
+        scanner = JSONObjectScanner()
+        for chunk in ["{not json} ", '{"a"', ': "b', '"}', " more"]:
+            scanner.feed(chunk)
+        assert scanner.result == {"a": "b"}
+        assert scanner.end == len('{not json} {"a": "b"}')
+
+    def test_escape_split_across_chunks(self):
+        scanner = JSONObjectScanner()
+        for chunk in ['{"a": "x\\', '"}', '"}']:
+            scanner.feed(chunk)
+        assert scanner.result == {"a": 'x"}'}
+
+    def test_feeding_after_done_is_a_noop(self):
+        scanner = JSONObjectScanner()
+        scanner.feed('{"a": 1}')
+        assert scanner.feed('{"b": 2}') == {"a": 1}
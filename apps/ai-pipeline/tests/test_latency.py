@@ -0,0 +1,30 @@
+"""Tests for the sliding latency windows."""
+
+from src.utils.latency import LatencyWindow, get_window
+
+
+class TestLatencyWindow:
+    def test_percentile(self):
+        window = LatencyWindow()
+        for ms in range(1, 101):
+            window.add(ms / 1000)
+        assert window.percentile(50) == 0.051
+        assert window.percentile(95) == 0.096
+        assert window.percentile(100) == 0.1
+
+    def test_needs_min_samples(self):
+        window = LatencyWindow()
+        window.add(1.0)
+        assert window.percentile(95, min_samples=2) is None
+        window.add(2.0)
+        assert window.percentile(95, min_samples=2) == 2.0
+
+    def test_old_samples_fall_out(self):
+        window = LatencyWindow(size=3)
+        for seconds in (10.0, 1.0, 1.0, 1.0):
+            window.add(seconds)
+        assert len(window) == 3
+        assert window.percentile(100) == 1.0
+
+    def test_registry(self):
+        assert get_window("anthropic/species") is get_window("anthropic/species")
@@ -0,0 +1,156 @@
+"""Tests for provider batch jobs, against a local stand-in for the batch APIs."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from src import reprocess
+from src.clients import llm_batch
+from src.clients.llm import query
+from src.config import settings
+from src.utils import metrics
+
+
+class FakeBatchServer:
+    """Just enough of Anthropic Message Batches and OpenAI Batch to run jobs end to end."""
+
+    def __init__(self) -> None:
+        self.jobs: list[list[dict]] = []  # request lines per submitted job
+        self.live_calls = 0
+        self.fail: set[str] = set()  # prompts whose batch request errors
+        self._files: dict[str, bytes] = {}
+        self._polls = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/v1/messages/batches":
+            self.jobs.append(json.loads(request.content)["requests"])
+            return httpx.Response(200, json={"id": "msgbatch_1", "processing_status": "in_progress"})
+        if path == "/v1/messages/batches/msgbatch_1":
+            self._polls += 1
+            return httpx.Response(200, json={
+                "id": "msgbatch_1", "processing_status": "ended",
+                "results_url": "https://api.anthropic.com/v1/messages/batches/msgbatch_1/results",
+            })
+        if path.endswith("/results"):
+            lines = [self._anthropic_result(r) for r in self.jobs[-1]]
+            return httpx.Response(200, text="\n".join(json.dumps(line) for line in lines))
+        if path == "/v1/files" and request.method == "POST":
+            content = request.read()
+            jsonl = content[content.index(b'{"custom_id"'):content.rindex(b"}") + 1]
+            self.jobs.append([json.loads(line) for line in jsonl.splitlines()])
+            return httpx.Response(200, json={"id": "file-in"})
+        if path == "/v1/batches":
+            return httpx.Response(200, json={"id": "batch_1", "status": "validating"})
+        if path == "/v1/batches/batch_1":
+            self._polls += 1
+            lines = [self._openai_result(r) for r in self.jobs[-1]]
+            self._files["file-out"] = "\n".join(json.dumps(line) for line in lines).encode()
+            return httpx.Response(200, json={"id": "batch_1", "status": "completed", "output_file_id": "file-out"})
+        if path == "/v1/files/file-out/content":
+            return httpx.Response(200, content=self._files["file-out"])
+        self.live_calls += 1
+        return httpx.Response(200, json={"content": [{"type": "text", "text": "live"}]})
+
+    @staticmethod
+    def _prompt(params: dict) -> str:
+        content = params["messages"][0]["content"]
+        return content if isinstance(content, str) else content[-1]["text"]
+
+    def _anthropic_result(self, request: dict) -> dict:
+        prompt = self._prompt(request["params"])
+        if prompt in self.fail:
+            return {"custom_id": request["custom_id"], "result": {"type": "errored", "error": {"type": "overloaded"}}}
+        message = {"content": [{"type": "text", "text": f"answer to {prompt}"}], "usage": {"input_tokens": 10}}
+        return {"custom_id": request["custom_id"], "result": {"type": "succeeded", "message": message}}
+
+    def _openai_result(self, request: dict) -> dict:
+        body = {"choices": [{"message": {"content": f"answer to {self._prompt(request['body'])}"}}]}
+        return {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+
+
+@pytest.fixture
+def server():
+    fake = FakeBatchServer()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+    with (
+        patch("src.clients.llm.get_client", return_value=client),
+        patch("src.clients.llm_batch.get_client", return_value=client),
+        patch("src.clients.llm.settings", settings.model_copy()) as llm_settings,
+        patch("src.clients.llm_batch.settings", settings.model_copy()) as batch_settings,
+    ):
+        llm_settings.anthropic_api_key = llm_settings.openai_api_key = "sk-test"
+        llm_settings.llm_cache_enabled = False
+        batch_settings.llm_batch_flush_s = 0.01
+        batch_settings.llm_batch_poll_s = 0
+        yield fake
+
+
+class TestBatchSession:
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_job(self, server):
+        async with llm_batch.collect():
+            results = await asyncio.gather(*(query(f"q{i}", provider="anthropic", model="m") for i in range(3)))
+
+        assert [r.text for r in results] == ["answer to q0", "answer to q1", "answer to q2"]
+        assert len(server.jobs) == 1 and len(server.jobs[0]) == 3
+        assert server.jobs[0][0]["params"]["model"] == "m"
+        assert server.live_calls == 0
+        assert results[0].input_tokens == 10
+        assert metrics.get("llm_batch_requests_total", provider="anthropic") == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_request_raises_for_its_caller_only(self, server):
+        server.fail.add("bad")
+        async with llm_batch.collect():
+            results = await asyncio.gather(
+                query("good", provider="anthropic", model="m"),
+                query("bad", provider="anthropic", model="m"),
+                return_exceptions=True,
+            )
+
+        assert results[0].text == "answer to good"
+        assert isinstance(results[1], llm_batch.BatchRequestError)
+        assert metrics.get("llm_batch_failures_total", provider="anthropic", reason="request") == 1
+
+    @pytest.mark.asyncio
+    async def test_openai_batch(self, server):
+        async with llm_batch.collect():
+            results = await asyncio.gather(*(query(f"q{i}", provider="openai", model="gpt") for i in range(2)))
+
+        assert [r.text for r in results] == ["answer to q0", "answer to q1"]
+        assert server.jobs[0][0]["url"] == "/v1/chat/completions"
+        assert server.jobs[0][0]["body"]["model"] == "gpt"
+
+    @pytest.mark.asyncio
+    async def test_max_requests_splits_jobs(self, server):
+        with patch("src.clients.llm_batch.settings.llm_batch_max_requests", 2):
+            async with llm_batch.collect():
+                await asyncio.gather(*(query(f"q{i}", provider="anthropic", model="m") for i in range(3)))
+
+        assert [len(job) for job in server.jobs] == [2, 1]
+
+    @pytest.mark.asyncio
+    async def test_live_outside_collect(self, server):
+        result = await query("q", provider="anthropic", model="m")
+        assert result.text == "live"
+        assert server.jobs == []
+
+
+@pytest.mark.asyncio
+async def test_reprocess_runs_pipelines_inside_a_batch_session():
+    sessions = []
+
+    async def pipeline(observation_id, pool):
+        sessions.append(llm_batch.current("anthropic"))
+        return observation_id != "bad"
+
+    with patch("src.reprocess.run_pipeline", new=AsyncMock(side_effect=pipeline)):
+        results = await reprocess.reprocess(["a", "b", "bad"], pool=None)
+
+    assert results == {"a": True, "b": True, "bad": False}
+    assert sessions[0] is not None and all(s is sessions[0] for s in sessions)
+    assert llm_batch.current("anthropic") is None
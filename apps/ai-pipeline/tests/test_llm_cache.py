@@ -0,0 +1,222 @@
+"""Tests for the content-addressed LLM response cache."""
+
+import asyncio
+import zlib
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.clients import llm_cache
+from src.clients.llm import query, discard_cached
+from src.clients.llm_cache import LLMCache, LRUCache, cache_key, REDIS_KEY_PREFIX
+from src.config import settings
+from src.utils import metrics
+from src.utils.images import PreparedPhoto
+
+
+ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+ANTHROPIC_RESPONSE = {
+    "content": [{"type": "text", "text": '{"species": "oak"}'}],
+    "model": "claude-sonnet-4-5-20250929",
+    "usage": {"input_tokens": 100, "output_tokens": 20},
+}
+
+
+class TestCacheKey:
+    def test_stable(self):
+        assert cache_key("anthropic", "m", "p", ["a"], 1024) == cache_key("anthropic", "m", "p", ["a"], 1024)
+
+    @pytest.mark.parametrize("changed", [
+        ("openai", "m", "p", ["a"], 1024),
+        ("anthropic", "m2", "p", ["a"], 1024),
+        ("anthropic", "m", "p2", ["a"], 1024),
+        ("anthropic", "m", "p", ["b"], 1024),
+        ("anthropic", "m", "p", ["a", "a"], 1024),
+        ("anthropic", "m", "p", ["a"], 512),
+    ])
+    def test_every_input_matters(self, changed):
+        assert cache_key(*changed) != cache_key("anthropic", "m", "p", ["a"], 1024)
+
+    def test_photo_digest_follows_content(self):
+        assert PreparedPhoto(b"abc", "bark").digest == PreparedPhoto(b"abc", "leaf").digest
+        assert PreparedPhoto(b"abc").digest != PreparedPhoto(b"abd").digest
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used_by_size(self):
+        lru = LRUCache(max_bytes=10)
+        lru.put("a", b"1234")
+        lru.put("b", b"1234")
+        lru.get("a")
+        lru.put("c", b"1234")
+        assert lru.get("b") is None
+        assert lru.get("a") == b"1234"
+        assert lru.size == 8
+
+    def test_oversized_value_not_stored(self):
+        lru = LRUCache(max_bytes=4)
+        lru.put("a", b"12345")
+        assert len(lru) == 0
+
+    def test_replace_updates_size(self):
+        lru = LRUCache(max_bytes=100)
+        lru.put("a", b"12345")
+        lru.put("a", b"12")
+        assert lru.size == 2
+
+
+class TestLLMCache:
+    @pytest.mark.asyncio
+    async def test_memory_hit(self):
+        cache = LLMCache(max_bytes=1024)
+        call = AsyncMock(return_value=b"value")
+        assert await cache.get_or_call("k", call) == (b"value", "upstream")
+        assert await cache.get_or_call("k", call) == (b"value", "memory")
+        call.assert_awaited_once()
+        assert metrics.get("llm_cache_requests_total", tier="memory", result="hit") == 1
+        assert metrics.get("llm_cache_requests_total", tier="all", result="miss") == 1
+
+    @pytest.mark.asyncio
+    async def test_singleflight(self):
+        cache = LLMCache(max_bytes=1024)
+        release = asyncio.Event()
+        calls = 0
+
+        async def slow_call() -> bytes:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return b"value"
+
+        tasks = [asyncio.create_task(cache.get_or_call("k", slow_call)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == 1
+        assert sorted(source for _, source in results) == ["inflight"] * 4 + ["upstream"]
+
+    @pytest.mark.asyncio
+    async def test_errors_shared_and_not_cached(self):
+        cache = LLMCache(max_bytes=1024)
+        release = asyncio.Event()
+
+        async def failing_call() -> bytes:
+            await release.wait()
+            raise RuntimeError("upstream down")
+
+        tasks = [asyncio.create_task(cache.get_or_call("k", failing_call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await cache.get_or_call("k", AsyncMock(return_value=b"ok")) == (b"ok", "upstream")
+
+    @pytest.mark.asyncio
+    async def test_waiter_takes_over_when_leader_cancelled(self):
+        cache = LLMCache(max_bytes=1024)
+        hang = asyncio.Event()
+
+        async def hanging_call() -> bytes:
+            await hang.wait()
+            return b"never"
+
+        leader = asyncio.create_task(cache.get_or_call("k", hanging_call))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_call("k", AsyncMock(return_value=b"mine")))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await waiter == (b"mine", "upstream")
+
+    @pytest.mark.asyncio
+    async def test_redis_tier(self):
+        store: dict[str, bytes] = {}
+        redis = MagicMock()
+        redis.get = AsyncMock(side_effect=lambda k: store.get(k))
+        redis.set = AsyncMock(side_effect=lambda k, v, ex: store.__setitem__(k, v))
+
+        writer = LLMCache(max_bytes=1024, redis_enabled=True, ttl_s=60)
+        reader = LLMCache(max_bytes=1024, redis_enabled=True, ttl_s=60)
+        for cache in (writer, reader):
+            cache._redis_client = lambda: redis
+
+        await writer.get_or_call("k", AsyncMock(return_value=b"value" * 20))
+        assert zlib.decompress(store[REDIS_KEY_PREFIX + "k"]) == b"value" * 20
+        assert redis.set.call_args.kwargs["ex"] == 60
+
+        call = AsyncMock()
+        assert await reader.get_or_call("k", call) == (b"value" * 20, "redis")
+        call.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_is_a_miss(self):
+        redis = MagicMock()
+        redis.get = AsyncMock(side_effect=ConnectionError("refused"))
+        redis.set = AsyncMock(side_effect=ConnectionError("refused"))
+        cache = LLMCache(max_bytes=1024, redis_enabled=True)
+        cache._redis_client = lambda: redis
+
+        assert await cache.get_or_call("k", AsyncMock(return_value=b"v")) == (b"v", "upstream")
+        assert await cache.get_or_call("k", AsyncMock()) == (b"v", "memory")
+
+
+def _ok_response() -> httpx.Response:
+    return httpx.Response(200, json=ANTHROPIC_RESPONSE, request=httpx.Request("POST", ANTHROPIC_URL))
+
+
+class TestQueryCaching:
+    @pytest.fixture
+    def mock_post(self):
+        post = AsyncMock(side_effect=lambda *a, **kw: _ok_response())
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.llm_provider = "anthropic"
+            mock_settings.llm_model = "claude-sonnet-4-5-20250929"
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_prompt_caching = False
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=post)):
+                yield post
+
+    @pytest.mark.asyncio
+    async def test_identical_query_served_from_cache(self, mock_post):
+        photo = PreparedPhoto(b"\xff\xd8img", "full_tree_angle1")
+        first = await query("identify", images=[photo])
+        second = await query("identify", images=[PreparedPhoto(b"\xff\xd8img", "full_tree_angle1")])
+
+        assert mock_post.await_count == 1
+        assert first.cached is False
+        assert second.cached is True
+        assert second.text == first.text
+        assert second.usage == first.usage
+
+    @pytest.mark.asyncio
+    async def test_different_inputs_miss(self, mock_post):
+        await query("identify", images=[(b"one", "image/jpeg")])
+        await query("identify", images=[(b"two", "image/jpeg")])
+        await query("identify", images=[(b"two", "image/jpeg")], max_tokens=512)
+        assert mock_post.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_image_policy_is_part_of_key(self, mock_post):
+        photo = PreparedPhoto(b"\xff\xd8img", "full_tree_angle1")
+        await query("identify", images=[photo], analyzer="health")
+        await query("identify", images=[photo], analyzer="site")
+        await query("identify", images=[photo], analyzer="species")  # same policy as health
+        assert mock_post.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_discarded_response_is_refetched(self, mock_post):
+        response = await query("identify")
+        await discard_cached(response)
+        await query("identify")
+        assert mock_post.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_disabled(self, mock_post, monkeypatch):
+        monkeypatch.setattr(llm_cache.settings, "llm_cache_enabled", False)
+        await query("identify")
+        response = await query("identify")
+        assert mock_post.await_count == 2
+        assert response.cache_key is None
@@ -1,5 +1,7 @@
 """Tests for the multimodal LLM client."""
 
+import json
+
 import pytest
 import httpx
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -14,8 +16,13 @@ from src.clients.llm import (
     _parse_openai_response,
     _parse_google_response,
     _encode_image,
+    _routes,
     LLMResponse,
 )
+from src.clients.json_body import materialize
+from src.config import settings
+from src.utils import metrics
+from src.utils.circuit import CircuitOpenError, get_breaker, states
 
 
 FAKE_IMG = b"\xff\xd8\xff\xe0fake"
@@ -69,7 +76,7 @@ class TestBuildPayloads:
         assert len(content) == 4
 
     def test_openai_payload_structure(self):
-        payload = _build_openai_payload("identify", [(FAKE_IMG, "image/jpeg")], "gpt-4o")
+        payload = materialize(_build_openai_payload("identify", [(FAKE_IMG, "image/jpeg")], "gpt-4o"))
         assert payload["model"] == "gpt-4o"
         content = payload["messages"][0]["content"]
         assert content[0]["type"] == "image_url"
@@ -161,6 +168,17 @@ class TestExtractJson:
         result = extract_json('  \n  {"key": "value"}  \n  ')
         assert result == {"key": "value"}
 
+    def test_three_levels_of_nesting_in_prose(self):
+        text = 'Assessment:\n{"species": {"common": "oak"}, "site": {"risk": {"flag": true}}}\nThanks!'
+        assert extract_json(text) == {"species": {"common": "oak"}, "site": {"risk": {"flag": True}}}
+
+    def test_braces_in_strings(self):
+        text = 'Note {see below}: {"notes": "crack at {base}", "q": "say \\"hi\\""}'
+        assert extract_json(text) == {"notes": "crack at {base}", "q": 'say "hi"'}
+
+    def test_top_level_array_is_not_an_object(self):
+        assert extract_json('[{"a": 1}]') == {"a": 1}
+
 
 def _mock_response(url: str, status: int, json_data: dict) -> httpx.Response:
     return httpx.Response(status, json=json_data, request=httpx.Request("POST", url))
@@ -174,7 +192,7 @@ class TestQuery:
 
     @pytest.mark.asyncio
     async def test_missing_anthropic_key(self):
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "anthropic"
             mock_settings.llm_model = "claude-sonnet-4-5-20250929"
             mock_settings.anthropic_api_key = ""
@@ -183,7 +201,7 @@ class TestQuery:
 
     @pytest.mark.asyncio
     async def test_missing_openai_key(self):
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "openai"
             mock_settings.llm_model = "gpt-4o"
             mock_settings.openai_api_key = ""
@@ -192,7 +210,7 @@ class TestQuery:
 
     @pytest.mark.asyncio
     async def test_missing_google_key(self):
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "google"
             mock_settings.llm_model = "gemini-2.0-flash"
             mock_settings.google_api_key = ""
@@ -204,16 +222,12 @@ class TestQuery:
         resp = _mock_response(ANTHROPIC_URL, 200, ANTHROPIC_RESPONSE)
         mock_post = AsyncMock(return_value=resp)
 
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "anthropic"
             mock_settings.llm_model = "claude-sonnet-4-5-20250929"
             mock_settings.anthropic_api_key = "sk-test"
 
-            with patch("src.clients.llm.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(
-                    return_value=MagicMock(post=mock_post)
-                )
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
 
                 result = await query(
                     "identify this tree",
@@ -229,16 +243,12 @@ class TestQuery:
         resp = _mock_response(OPENAI_URL, 200, OPENAI_RESPONSE)
         mock_post = AsyncMock(return_value=resp)
 
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "openai"
             mock_settings.llm_model = "gpt-4o"
             mock_settings.openai_api_key = "sk-test"
 
-            with patch("src.clients.llm.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(
-                    return_value=MagicMock(post=mock_post)
-                )
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
 
                 result = await query(
                     "identify this tree",
@@ -255,16 +265,13 @@ class TestQuery:
         resp = _mock_response(google_url, 200, GOOGLE_RESPONSE)
         mock_post = AsyncMock(return_value=resp)
 
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "google"
             mock_settings.llm_model = "gemini-2.0-flash"
             mock_settings.google_api_key = "test-key"
+            mock_settings.llm_prompt_caching = False
 
-            with patch("src.clients.llm.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(
-                    return_value=MagicMock(post=mock_post)
-                )
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
 
                 result = await query(
                     "identify this tree",
@@ -285,17 +292,13 @@ class TestQuery:
 
         mock_post = AsyncMock(side_effect=[error_resp, ok_resp])
 
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "anthropic"
             mock_settings.llm_model = "claude-sonnet-4-5-20250929"
             mock_settings.anthropic_api_key = "sk-test"
 
-            with patch("src.clients.llm.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(
-                    return_value=MagicMock(post=mock_post)
-                )
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
-                with patch("src.clients.llm.asyncio.sleep", new_callable=AsyncMock):
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
                     result = await query("test", provider="anthropic")
 
         assert result.provider == "anthropic"
@@ -309,16 +312,12 @@ class TestQuery:
         ))
         mock_post = AsyncMock(return_value=error_resp)
 
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "anthropic"
             mock_settings.llm_model = "claude-sonnet-4-5-20250929"
             mock_settings.anthropic_api_key = "sk-bad"
 
-            with patch("src.clients.llm.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(
-                    return_value=MagicMock(post=mock_post)
-                )
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
 
                 with pytest.raises(httpx.HTTPStatusError):
                     await query("test", provider="anthropic")
@@ -330,23 +329,216 @@ class TestQuery:
         resp = _mock_response(ANTHROPIC_URL, 200, ANTHROPIC_RESPONSE)
         mock_post = AsyncMock(return_value=resp)
 
-        with patch("src.clients.llm.settings") as mock_settings:
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
             mock_settings.llm_provider = "anthropic"
             mock_settings.llm_model = "claude-sonnet-4-5-20250929"
             mock_settings.anthropic_api_key = "sk-test"
 
-            with patch("src.clients.llm.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(
-                    return_value=MagicMock(post=mock_post)
-                )
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
 
                 result = await query("text only prompt", provider="anthropic")
 
         assert result.text == '{"species": "oak"}'
         # Verify the payload had no images
         call_kwargs = mock_post.call_args
-        payload = call_kwargs.kwargs["json"]
+        payload = json.loads(bytes(call_kwargs.kwargs["content"]))
         content = payload["messages"][0]["content"]
         assert len(content) == 1  # text only
         assert content[0]["type"] == "text"
+
+
+def _status_error(url: str, status: int) -> httpx.Response:
+    resp = _mock_response(url, status, {"error": "upstream"})
+    resp.raise_for_status = MagicMock(side_effect=httpx.HTTPStatusError(
+        str(status), request=httpx.Request("POST", url), response=resp
+    ))
+    return resp
+
+
+@pytest.fixture
+def failover_settings():
+    with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+        mock_settings.anthropic_api_key = "sk-test"
+        mock_settings.openai_api_key = "sk-test"
+        mock_settings.llm_failover = "openai:gpt-4o"
+        mock_settings.llm_circuit_failure_threshold = 2
+        yield mock_settings
+
+
+class TestFailover:
+    @staticmethod
+    def _clients(anthropic_post: AsyncMock, openai_post: AsyncMock):
+        clients = {"anthropic": MagicMock(post=anthropic_post), "openai": MagicMock(post=openai_post)}
+        return patch("src.clients.llm.get_client", side_effect=lambda upstream: clients[upstream])
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_backoff_and_fails_over(self, failover_settings):
+        anthropic_post = AsyncMock(side_effect=httpx.ReadTimeout("slow"))
+        openai_post = AsyncMock(return_value=_mock_response(OPENAI_URL, 200, OPENAI_RESPONSE))
+
+        with self._clients(anthropic_post, openai_post):
+            with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock) as sleep:
+                result = await query("test", provider="anthropic", model="claude-test")
+
+        assert result.provider == "openai"
+        assert anthropic_post.call_count == 2  # circuit opened after the second timeout
+        assert sleep.await_count == 1
+        assert states()["anthropic/claude-test"] == "open"
+        assert metrics.get("llm_failovers_total", provider="anthropic", to="openai", reason="circuit_open") == 1
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_routes_without_calling(self, failover_settings):
+        breaker = get_breaker("anthropic/claude-test", failure_threshold=1)
+        breaker.record_failure()
+        anthropic_post = AsyncMock()
+        openai_post = AsyncMock(return_value=_mock_response(OPENAI_URL, 200, OPENAI_RESPONSE))
+
+        with self._clients(anthropic_post, openai_post):
+            result = await query("test", provider="anthropic", model="claude-test")
+
+        assert result.provider == "openai"
+        anthropic_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_exhausted_retries_fail_over(self, failover_settings):
+        failover_settings.llm_circuit_failure_threshold = 5
+        anthropic_post = AsyncMock(return_value=_status_error(ANTHROPIC_URL, 429))
+        openai_post = AsyncMock(return_value=_mock_response(OPENAI_URL, 200, OPENAI_RESPONSE))
+
+        with self._clients(anthropic_post, openai_post):
+            with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
+                result = await query("test", provider="anthropic", model="claude-test")
+
+        assert result.provider == "openai"
+        assert anthropic_post.call_count == 3
+        assert states()["anthropic/claude-test"] == "closed"  # 429 is throttling, not an outage
+        assert metrics.get("llm_failovers_total", provider="anthropic", to="openai", reason="429") == 1
+
+    @pytest.mark.asyncio
+    async def test_client_error_does_not_fail_over(self, failover_settings):
+        anthropic_post = AsyncMock(return_value=_status_error(ANTHROPIC_URL, 400))
+        openai_post = AsyncMock()
+
+        with self._clients(anthropic_post, openai_post):
+            with pytest.raises(httpx.HTTPStatusError):
+                await query("test", provider="anthropic", model="claude-test")
+
+        openai_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_last_route_open_raises(self, failover_settings):
+        for name in ("anthropic/claude-test", "openai/gpt-4o"):
+            get_breaker(name, failure_threshold=1).record_failure()
+
+        with pytest.raises(CircuitOpenError, match="openai/gpt-4o"):
+            await query("test", provider="anthropic", model="claude-test")
+
+    def test_routes_dedupe_and_skip_malformed(self, failover_settings):
+        failover_settings.llm_failover = "anthropic:claude-test, google:gemini-2.0-flash, gemini, openai:gpt-4o"
+        assert _routes("anthropic", "claude-test") == [
+            ("anthropic", "claude-test"), ("google", "gemini-2.0-flash"), ("openai", "gpt-4o"),
+        ]
+
+
+class TestPromptCaching:
+    def test_anthropic_breakpoint_on_last_image(self):
+        payload = _build_anthropic_payload("p", [(FAKE_IMG, "image/jpeg")] * 2, "m", cache_images=True)
+        content = payload["messages"][0]["content"]
+        assert "cache_control" not in content[0]
+        assert content[1]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in content[-1]
+
+    def test_anthropic_no_breakpoint_by_default(self):
+        payload = _build_anthropic_payload("p", [(FAKE_IMG, "image/jpeg")], "m")
+        assert all("cache_control" not in block for block in payload["messages"][0]["content"])
+
+    def test_anthropic_no_breakpoint_without_images(self):
+        payload = _build_anthropic_payload("p", [], "m", cache_images=True)
+        assert payload["messages"][0]["content"] == [{"type": "text", "text": "p"}]
+
+    def test_google_payload_with_cached_content(self):
+        payload = _build_google_payload("p", [(FAKE_IMG, "image/jpeg")], "m", cached_content="cachedContents/abc")
+        assert payload["cachedContent"] == "cachedContents/abc"
+        assert payload["contents"][0]["parts"] == [{"text": "p"}]
+
+    def test_cache_token_usage(self):
+        anthropic = _parse_anthropic_response({
+            **ANTHROPIC_RESPONSE,
+            "usage": {"input_tokens": 50, "cache_read_input_tokens": 1500, "cache_creation_input_tokens": 0},
+        })
+        assert anthropic.cache_read_tokens == 1500
+        assert anthropic.cache_write_tokens == 0
+
+        openai = _parse_openai_response({
+            **OPENAI_RESPONSE,
+            "usage": {"prompt_tokens": 2000, "prompt_tokens_details": {"cached_tokens": 1536}},
+        })
+        assert openai.cache_read_tokens == 1536
+
+        google = _parse_google_response({
+            **GOOGLE_RESPONSE,
+            "usageMetadata": {"promptTokenCount": 1800, "cachedContentTokenCount": 1700},
+        })
+        assert google.cache_read_tokens == 1700
+
+    @pytest.mark.asyncio
+    async def test_google_context_cache_created_once(self):
+        from src.clients import llm
+
+        llm._gemini_contexts.clear()
+        create_url = "https://generativelanguage.googleapis.com/v1beta/cachedContents?key=test-key"
+        created = _mock_response(create_url, 200, {
+            "name": "cachedContents/abc", "usageMetadata": {"totalTokenCount": 1700},
+        })
+
+        async def post(url, **kwargs):
+            if url.startswith(llm.GEMINI_CACHE_URL):
+                return created
+            return _mock_response(url, 200, GOOGLE_RESPONSE)
+
+        mock_post = AsyncMock(side_effect=post)
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.google_api_key = "test-key"
+            mock_settings.llm_prompt_caching = True
+            mock_settings.llm_prompt_cache_ttl_s = 300
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                first = await query("health", images=[(FAKE_IMG, "image/jpeg")], provider="google", model="gemini")
+                await query("site", images=[(FAKE_IMG, "image/jpeg")], provider="google", model="gemini")
+
+        urls = [c.args[0] for c in mock_post.call_args_list]
+        assert sum(u.startswith(llm.GEMINI_CACHE_URL) for u in urls) == 1
+        assert first.cache_write_tokens == 1700
+        generate_payload = json.loads(bytes(mock_post.call_args_list[-1].kwargs["content"]))
+        assert generate_payload["cachedContent"] == "cachedContents/abc"
+        assert generate_payload["contents"][0]["parts"] == [{"text": "site"}]
+        llm._gemini_contexts.clear()
+
+    @pytest.mark.asyncio
+    async def test_google_context_cache_refused_sends_inline(self):
+        from src.clients import llm
+
+        llm._gemini_contexts.clear()
+        create_url = "https://generativelanguage.googleapis.com/v1beta/cachedContents?key=test-key"
+        refused = _mock_response(create_url, 400, {"error": {"message": "too few tokens"}})
+
+        async def post(url, **kwargs):
+            if url.startswith(llm.GEMINI_CACHE_URL):
+                return refused
+            return _mock_response(url, 200, GOOGLE_RESPONSE)
+
+        mock_post = AsyncMock(side_effect=post)
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.google_api_key = "test-key"
+            mock_settings.llm_prompt_caching = True
+            mock_settings.llm_prompt_cache_ttl_s = 300
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                result = await query("health", images=[(FAKE_IMG, "image/jpeg")], provider="google", model="gemini")
+                await query("site", images=[(FAKE_IMG, "image/jpeg")], provider="google", model="gemini")
+
+        assert result.text == '{"species": "oak"}'
+        urls = [c.args[0] for c in mock_post.call_args_list]
+        assert sum(u.startswith(llm.GEMINI_CACHE_URL) for u in urls) == 1
+        generate_payload = json.loads(bytes(mock_post.call_args_list[-1].kwargs["content"]))
+        assert "cachedContent" not in generate_payload
+        assert "inline_data" in generate_payload["contents"][0]["parts"][0]
+        llm._gemini_contexts.clear()
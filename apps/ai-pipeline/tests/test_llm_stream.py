@@ -0,0 +1,156 @@
+"""Tests for SSE streaming of LLM responses."""
+
+import json
+
+import httpx
+import pytest
+from unittest.mock import patch
+
+from src.clients.llm import query
+from src.clients.llm_stream import iter_sse
+from src.config import settings
+from src.utils import metrics
+
+
+def _sse(events: list[dict], done: bool = False) -> list[bytes]:
+    chunks = [f"data: {json.dumps(e)}\n\n".encode() for e in events]
+    if done:
+        chunks.append(b"data: [DONE]\n\n")
+    return chunks
+
+
+def _anthropic_events(*texts: str) -> list[dict]:
+    return [
+        {"type": "message_start", "message": {"model": "claude-test", "usage": {"input_tokens": 100}}},
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        *({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": t}} for t in texts),
+        {"type": "message_delta", "usage": {"output_tokens": 20}},
+        {"type": "message_stop"},
+    ]
+
+
+class _Body(httpx.AsyncByteStream):
+    """Streaming body that records how many chunks the client pulled."""
+
+    def __init__(self, chunks: list[bytes]) -> None:
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def stream_settings():
+    with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+        mock_settings.llm_streaming = True
+        mock_settings.llm_prompt_caching = False
+        mock_settings.anthropic_api_key = "sk-test"
+        mock_settings.openai_api_key = "sk-test"
+        mock_settings.google_api_key = "test-key"
+        yield mock_settings
+
+
+def _serve(body: _Body, requests: list[httpx.Request]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, stream=body, headers={"content-type": "text/event-stream"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return patch("src.clients.llm.get_client", return_value=client)
+
+
+class TestIterSSE:
+    @pytest.mark.asyncio
+    async def test_events_comments_and_done(self):
+        async def lines():
+            for line in [": ping", "event: message", 'data: {"a": 1}', "", "", 'data: {"b":', "data: 2}", "",
+                         "data: [DONE]", "", 'data: {"never": 1}', ""]:
+                yield line
+
+        assert [e async for e in iter_sse(lines())] == [{"a": 1}, {"b": 2}]
+
+
+class TestStreamingQuery:
+    @pytest.mark.asyncio
+    async def test_anthropic_stops_after_json(self, stream_settings):
+        body = _Body(_sse(_anthropic_events('Here: {"species": ', '"oak"}', " I hope", " that helps.")))
+        requests: list[httpx.Request] = []
+        with _serve(body, requests):
+            result = await query("identify", provider="anthropic", model="claude-test")
+
+        assert result.text == 'Here: {"species": "oak"}'
+        assert result.model == "claude-test"
+        assert result.usage == {"input_tokens": 100}  # output tokens arrive after the cut
+        assert result.ttft_s is not None and result.generation_s is not None
+        assert json.loads(requests[0].content)["stream"] is True
+        assert body.sent < len(body.chunks)
+        assert body.closed
+        assert metrics.get("llm_streams_total", provider="anthropic", outcome="early") == 1
+
+    @pytest.mark.asyncio
+    async def test_anthropic_complete_stream(self, stream_settings):
+        body = _Body(_sse(_anthropic_events("no json", " at all")))
+        with _serve(body, []):
+            result = await query("identify", provider="anthropic", model="claude-test")
+
+        assert result.text == "no json at all"
+        assert result.usage == {"input_tokens": 100, "output_tokens": 20}
+        assert metrics.get("llm_streams_total", provider="anthropic", outcome="complete") == 1
+
+    @pytest.mark.asyncio
+    async def test_openai(self, stream_settings):
+        events = [
+            {"model": "gpt-4o", "choices": [{"delta": {"role": "assistant", "content": ""}}]},
+            {"model": "gpt-4o", "choices": [{"delta": {"content": '{"a": 1}'}}]},
+            {"model": "gpt-4o", "choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 5}},
+        ]
+        requests: list[httpx.Request] = []
+        with _serve(_Body(_sse(events, done=True)), requests):
+            result = await query("identify", provider="openai", model="gpt-4o")
+
+        assert result.text == '{"a": 1}'
+        assert result.provider == "openai"
+        payload = json.loads(requests[0].content)
+        assert payload["stream"] is True
+        assert payload["stream_options"] == {"include_usage": True}
+
+    @pytest.mark.asyncio
+    async def test_google(self, stream_settings):
+        events = [
+            {"candidates": [{"content": {"parts": [{"text": '```json\n{"a": '}]}}], "modelVersion": "gemini"},
+            {"candidates": [{"content": {"parts": [{"text": '2}\n```'}]}}], "modelVersion": "gemini",
+             "usageMetadata": {"promptTokenCount": 10}},
+        ]
+        requests: list[httpx.Request] = []
+        with _serve(_Body(_sse(events)), requests):
+            result = await query("identify", provider="google", model="gemini")
+
+        assert result.text == '```json\n{"a": 2}'
+        assert result.usage == {"promptTokenCount": 10}
+        assert ":streamGenerateContent?alt=sse&key=test-key" in str(requests[0].url)
+        assert "stream" not in json.loads(requests[0].content)
+
+    @pytest.mark.asyncio
+    async def test_error_event_is_retried(self, stream_settings):
+        bodies = [
+            _Body(_sse([{"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}])),
+            _Body(_sse(_anthropic_events('{"a": 1}'))),
+        ]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, stream=bodies.pop(0))
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch("src.clients.llm.get_client", return_value=client):
+            with patch("src.utils.retry.asyncio.sleep"):
+                result = await query("identify", provider="anthropic", model="claude-test")
+
+        assert result.text == '{"a": 1}'
+        assert not bodies
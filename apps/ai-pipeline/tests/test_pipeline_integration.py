@@ -14,6 +14,8 @@ from src.pipeline import (
 from src.analyzers.species import SpeciesResult
 from src.analyzers.health import HealthResult
 from src.analyzers.measurements import MeasurementResult
+from src.clients import usage
+from src.clients.llm import LLMResponse
 from src.clients.storage import ObservationRecord, DownloadedPhoto, PhotoRecord
 
 
@@ -136,9 +138,7 @@ class TestPostAIResult:
         with patch("src.pipeline.settings") as mock_settings:
             mock_settings.api_base_url = API_URL
             mock_settings.internal_api_key = "test-key"
-            with patch("src.pipeline.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(return_value=MagicMock(post=mock_post))
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
+            with patch("src.pipeline.get_client", return_value=MagicMock(post=mock_post)):
 
                 success = await post_ai_result(OBS_ID, ai_result)
 
@@ -148,6 +148,26 @@ class TestPostAIResult:
         assert call_kwargs.kwargs["headers"]["X-Internal-API-Key"] == "test-key"
         payload = call_kwargs.kwargs["json"]
         assert payload["species"]["common"] == "Oak"
+        assert "usage" not in payload
+
+    @pytest.mark.asyncio
+    async def test_usage_posted_in_api_shape(self):
+        ledger = usage.UsageLedger()
+        ledger.add(usage.Usage(calls=1, input_tokens=900, output_tokens=80, images=3, cost_usd=0.004), "health", "anthropic/m")
+        ai_result = AIResult(health={"confidence": 0.7}, usage=ledger.as_dict())
+
+        resp = httpx.Response(200, request=httpx.Request("POST", f"{API_URL}/api/internal/observations/{OBS_ID}/ai-result"))
+        mock_post = AsyncMock(return_value=resp)
+        with patch("src.pipeline.settings") as mock_settings:
+            mock_settings.api_base_url = API_URL
+            with patch("src.pipeline.get_client", return_value=MagicMock(post=mock_post)):
+                assert await post_ai_result(OBS_ID, ai_result)
+
+        posted = mock_post.call_args.kwargs["json"]["usage"]
+        # Keys of aiUsageSchema in packages/shared-schemas
+        counts = {"calls", "cachedCalls", "inputTokens", "outputTokens", "cacheReadTokens", "cacheWriteTokens", "images", "costUsd"}
+        assert set(posted) == counts | {"byAnalyzer", "byModel"}
+        assert set(posted["byAnalyzer"]["health"]) == counts
 
     @pytest.mark.asyncio
     async def test_auth_failure_no_retry(self):
@@ -162,9 +182,7 @@ class TestPostAIResult:
         with patch("src.pipeline.settings") as mock_settings:
             mock_settings.api_base_url = API_URL
             mock_settings.internal_api_key = "bad-key"
-            with patch("src.pipeline.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(return_value=MagicMock(post=mock_post))
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
+            with patch("src.pipeline.get_client", return_value=MagicMock(post=mock_post)):
 
                 success = await post_ai_result(OBS_ID, ai_result)
 
@@ -186,10 +204,8 @@ class TestPostAIResult:
         with patch("src.pipeline.settings") as mock_settings:
             mock_settings.api_base_url = API_URL
             mock_settings.internal_api_key = "key"
-            with patch("src.pipeline.httpx.AsyncClient") as MockClient:
-                MockClient.return_value.__aenter__ = AsyncMock(return_value=MagicMock(post=mock_post))
-                MockClient.return_value.__aexit__ = AsyncMock(return_value=False)
-                with patch("src.pipeline.asyncio.sleep", new_callable=AsyncMock):
+            with patch("src.pipeline.get_client", return_value=MagicMock(post=mock_post)):
+                with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
                     success = await post_ai_result(OBS_ID, ai_result)
 
         assert success is True
@@ -221,6 +237,28 @@ class TestRunPipeline:
         assert mock_measurements.call_args.kwargs["species_scientific"] == "Quercus virginiana"
         mock_post.assert_called_once()
 
+    @pytest.mark.asyncio
+    @patch("src.pipeline.post_ai_result", return_value=True)
+    @patch("src.pipeline.analyze_measurements", return_value=None)
+    @patch("src.pipeline.analyze_site", return_value=None)
+    @patch("src.pipeline.analyze_health")
+    @patch("src.pipeline.analyze_species", return_value=None)
+    @patch("src.pipeline.fetch_observation_photos")
+    async def test_llm_usage_posted(self, mock_fetch, _species, mock_health, _site, _measurements, mock_post):
+        async def health(*args, **kwargs):
+            response = LLMResponse(text="", provider="anthropic", model="claude-haiku-4-5", usage={"input_tokens": 1000})
+            await usage.record(response, "anthropic", "claude-haiku-4-5", "health", 2)
+            return _health()
+
+        mock_fetch.return_value = (_observation(), [_downloaded_photo("bark_closeup")])
+        mock_health.side_effect = health
+
+        assert await run_pipeline(OBS_ID, AsyncMock())
+
+        posted = mock_post.call_args.args[1].usage
+        assert (posted["calls"], posted["inputTokens"], posted["images"]) == (1, 1000, 2)
+        assert posted["byAnalyzer"]["health"]["costUsd"] == pytest.approx(0.001)
+
     @pytest.mark.asyncio
     @patch("src.pipeline.fetch_observation_photos")
     async def test_observation_not_found(self, mock_fetch):
@@ -342,3 +380,36 @@ class TestRunPipeline:
         success = await run_pipeline(OBS_ID, pool)
 
         assert success is False
+
+    @pytest.mark.asyncio
+    @patch("src.pipeline.post_ai_result", return_value=True)
+    @patch("src.pipeline.analyze_measurements", return_value=None)
+    @patch("src.pipeline.analyze_site")
+    @patch("src.pipeline.analyze_health")
+    @patch("src.pipeline.analyze_species")
+    @patch("src.pipeline.reverse_geocode", new_callable=AsyncMock, return_value="Austin")
+    @patch("src.pipeline.fetch_observation_photos")
+    async def test_prompt_caching_warms_with_health_first(
+        self, mock_fetch, _geo, mock_species, mock_health, mock_site, _measurements, _post, monkeypatch,
+    ):
+        """With prompt caching on, health writes the image prefix before the fan-out."""
+        monkeypatch.setattr("src.pipeline.settings.llm_prompt_caching", True)
+        monkeypatch.setattr("src.pipeline.settings.llm_provider", "anthropic")
+        call_order = []
+
+        def tracker(name, result=None):
+            async def _track(*args, **kwargs):
+                call_order.append(name)
+                return result
+            return _track
+
+        mock_fetch.return_value = (_observation(), [_downloaded_photo()])
+        mock_species.side_effect = tracker("species")
+        mock_health.side_effect = tracker("health")
+        mock_site.side_effect = tracker("site")
+
+        await run_pipeline(OBS_ID, AsyncMock())
+
+        assert call_order[0] == "health"
+        assert sorted(call_order[1:]) == ["site", "species"]
+        assert mock_species.call_args.kwargs["region"] == "Austin"
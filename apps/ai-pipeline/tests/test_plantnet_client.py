@@ -1,12 +1,16 @@
 """Tests for the Pl@ntNet API client."""
 
+import email
+
+import httpx
 import pytest
-import requests
-from unittest.mock import AsyncMock, patch, MagicMock
+import respx
+from unittest.mock import AsyncMock, patch
 
 from src.clients.plantnet import (
     identify,
     _parse_response,
+    _MultipartBody,
     PlantNetResult,
     PlantNetSpecies,
     PLANTNET_URL,
@@ -39,16 +43,14 @@ EMPTY_RESPONSE = {"results": [], "remainingIdentificationRequests": 499}
 FAKE_PHOTO = b"\xff\xd8\xff\xe0fake-jpeg"
 
 
-def _mock_response(status_code: int, json_data: dict) -> MagicMock:
-    """Create a mock requests Response."""
-    mock_resp = MagicMock(spec=requests.Response)
-    mock_resp.status_code = status_code
-    mock_resp.json.return_value = json_data
-    if status_code >= 400:
-        mock_resp.raise_for_status.side_effect = requests.HTTPError(response=mock_resp)
-    else:
-        mock_resp.raise_for_status.return_value = None
-    return mock_resp
+def _parse_multipart(request: httpx.Request) -> list[tuple[str, bytes]]:
+    """Decode a multipart request body into (field name, payload) pairs."""
+    raw = b"Content-Type: " + request.headers["content-type"].encode() + b"\r\n\r\n" + request.content
+    message = email.message_from_bytes(raw)
+    return [
+        (part.get_param("name", header="content-disposition"), part.get_payload(decode=True))
+        for part in message.get_payload()
+    ]
 
 
 class TestParseResponse:
@@ -92,6 +94,30 @@ class TestOrganMap:
         assert ORGAN_MAP.get("unknown_type", "habit") == "habit"
 
 
+class TestMultipartBody:
+    @pytest.mark.asyncio
+    async def test_encodes_fields_and_files(self):
+        body = _MultipartBody(
+            fields=[("organs", "habit"), ("organs", "bark")],
+            files=[("images", "photo_0.jpg", FAKE_PHOTO, "image/jpeg")],
+        )
+        raw = b"".join([bytes(chunk) async for chunk in body])
+        assert len(raw) == body.content_length
+        request = httpx.Request("POST", PLANTNET_URL, content=raw, headers=body.headers)
+        assert _parse_multipart(request) == [
+            ("organs", b"habit"), ("organs", b"bark"), ("images", FAKE_PHOTO),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_restartable_without_copying_images(self):
+        body = _MultipartBody(fields=[], files=[("images", "a.jpg", FAKE_PHOTO, "image/jpeg")])
+        first = [chunk async for chunk in body]
+        second = [chunk async for chunk in body]
+        assert [bytes(c) for c in first] == [bytes(c) for c in second]
+        views = [c for c in first if isinstance(c, memoryview)]
+        assert len(views) == 1 and views[0].obj is FAKE_PHOTO
+
+
 class TestIdentify:
     @pytest.mark.asyncio
     async def test_no_api_key_raises(self):
@@ -106,176 +132,137 @@ class TestIdentify:
             await identify([], api_key="test-key")
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_successful_identification(self):
-        mock_response = _mock_response(200, SAMPLE_RESPONSE)
-        mock_post = MagicMock(return_value=mock_response)
-
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                # Make to_thread call the function synchronously
-                mock_to_thread.side_effect = lambda fn: fn()
-
-                result = await identify(
-                    [
-                        (FAKE_PHOTO, "full_tree_angle1"),
-                        (FAKE_PHOTO, "full_tree_angle2"),
-                        (FAKE_PHOTO, "bark_closeup"),
-                    ],
-                    api_key="test-key",
-                )
+        respx.post(PLANTNET_URL).mock(return_value=httpx.Response(200, json=SAMPLE_RESPONSE))
+
+        result = await identify(
+            [
+                (FAKE_PHOTO, "full_tree_angle1"),
+                (FAKE_PHOTO, "full_tree_angle2"),
+                (FAKE_PHOTO, "bark_closeup"),
+            ],
+            api_key="test-key",
+        )
 
         assert result.best_match is not None
         assert result.best_match.scientific_name == "Quercus virginiana"
         assert len(result.species) == 2
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_empty_results(self):
-        mock_response = _mock_response(200, EMPTY_RESPONSE)
-        mock_post = MagicMock(return_value=mock_response)
+        respx.post(PLANTNET_URL).mock(return_value=httpx.Response(200, json=EMPTY_RESPONSE))
 
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                mock_to_thread.side_effect = lambda fn: fn()
-
-                result = await identify(
-                    [(FAKE_PHOTO, "full_tree_angle1")],
-                    api_key="test-key",
-                )
+        result = await identify(
+            [(FAKE_PHOTO, "full_tree_angle1")],
+            api_key="test-key",
+        )
 
         assert result.best_match is None
         assert result.species == []
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_sends_correct_params(self):
-        mock_response = _mock_response(200, SAMPLE_RESPONSE)
-        mock_post = MagicMock(return_value=mock_response)
-
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                mock_to_thread.side_effect = lambda fn: fn()
+        route = respx.post(PLANTNET_URL).mock(return_value=httpx.Response(200, json=SAMPLE_RESPONSE))
 
-                await identify(
-                    [(FAKE_PHOTO, "full_tree_angle1"), (FAKE_PHOTO, "bark_closeup")],
-                    api_key="test-key",
-                )
+        await identify(
+            [(FAKE_PHOTO, "full_tree_angle1"), (FAKE_PHOTO, "bark_closeup")],
+            api_key="test-key",
+        )
 
-        mock_post.assert_called_once()
-        call_kwargs = mock_post.call_args
-        assert call_kwargs.kwargs["params"] == {"api-key": "test-key"}
+        assert route.call_count == 1
+        request = route.calls.last.request
+        assert request.url.params["api-key"] == "test-key"
+        assert _parse_multipart(request) == [
+            ("organs", b"habit"), ("organs", b"bark"),
+            ("images", FAKE_PHOTO), ("images", FAKE_PHOTO),
+        ]
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_client_error_no_retry(self):
         """4xx errors (except 429) should not be retried."""
-        mock_response = _mock_response(401, {"error": "unauthorized"})
-        mock_post = MagicMock(return_value=mock_response)
-
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                mock_to_thread.side_effect = lambda fn: fn()
+        route = respx.post(PLANTNET_URL).mock(return_value=httpx.Response(401, json={"error": "unauthorized"}))
 
-                with pytest.raises(requests.HTTPError):
-                    await identify(
-                        [(FAKE_PHOTO, "full_tree_angle1")],
-                        api_key="bad-key",
-                    )
+        with pytest.raises(httpx.HTTPStatusError):
+            await identify(
+                [(FAKE_PHOTO, "full_tree_angle1")],
+                api_key="bad-key",
+            )
 
         # Should NOT retry on 401
-        assert mock_post.call_count == 1
+        assert route.call_count == 1
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_retries_on_server_error(self):
         """5xx errors should be retried."""
-        error_resp = _mock_response(500, {"error": "internal"})
-        ok_resp = _mock_response(200, SAMPLE_RESPONSE)
-
-        call_count = [0]
-        def post_side_effect(*args, **kwargs):
-            call_count[0] += 1
-            if call_count[0] < 3:
-                return error_resp
-            return ok_resp
-
-        mock_post = MagicMock(side_effect=post_side_effect)
-
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                mock_to_thread.side_effect = lambda fn: fn()
-                with patch("src.clients.plantnet.asyncio.sleep", new_callable=AsyncMock):
-                    result = await identify(
-                        [(FAKE_PHOTO, "full_tree_angle1")],
-                        api_key="test-key",
-                    )
+        route = respx.post(PLANTNET_URL).mock(side_effect=[
+            httpx.Response(500, json={"error": "internal"}),
+            httpx.Response(500, json={"error": "internal"}),
+            httpx.Response(200, json=SAMPLE_RESPONSE),
+        ])
+
+        with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
+            result = await identify(
+                [(FAKE_PHOTO, "full_tree_angle1")],
+                api_key="test-key",
+            )
 
         assert result.best_match is not None
-        assert mock_post.call_count == 3
+        assert route.call_count == 3
+        # Every attempt streams the full body
+        assert all(_parse_multipart(call.request)[-1] == ("images", FAKE_PHOTO) for call in route.calls)
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_retries_exhausted_raises(self):
         """After MAX_RETRIES failures, should raise last error."""
-        error_resp = _mock_response(500, {"error": "down"})
-        mock_post = MagicMock(return_value=error_resp)
+        route = respx.post(PLANTNET_URL).mock(return_value=httpx.Response(500, json={"error": "down"}))
 
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                mock_to_thread.side_effect = lambda fn: fn()
-                with patch("src.clients.plantnet.asyncio.sleep", new_callable=AsyncMock):
-                    with pytest.raises(requests.HTTPError):
-                        await identify(
-                            [(FAKE_PHOTO, "full_tree_angle1")],
-                            api_key="test-key",
-                        )
+        with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
+            with pytest.raises(httpx.HTTPStatusError):
+                await identify(
+                    [(FAKE_PHOTO, "full_tree_angle1")],
+                    api_key="test-key",
+                )
 
-        assert mock_post.call_count == 3  # MAX_RETRIES
+        assert route.call_count == 3  # MAX_RETRIES
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_retries_on_rate_limit(self):
         """429 should be retried."""
-        rate_resp = _mock_response(429, {"error": "rate limited"})
-        ok_resp = _mock_response(200, SAMPLE_RESPONSE)
-
-        call_count = [0]
-        def post_side_effect(*args, **kwargs):
-            call_count[0] += 1
-            if call_count[0] < 2:
-                return rate_resp
-            return ok_resp
-
-        mock_post = MagicMock(side_effect=post_side_effect)
-
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                mock_to_thread.side_effect = lambda fn: fn()
-                with patch("src.clients.plantnet.asyncio.sleep", new_callable=AsyncMock):
-                    result = await identify(
-                        [(FAKE_PHOTO, "full_tree_angle1")],
-                        api_key="test-key",
-                    )
+        route = respx.post(PLANTNET_URL).mock(side_effect=[
+            httpx.Response(429, json={"error": "rate limited"}),
+            httpx.Response(200, json=SAMPLE_RESPONSE),
+        ])
+
+        with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
+            result = await identify(
+                [(FAKE_PHOTO, "full_tree_angle1")],
+                api_key="test-key",
+            )
 
         assert result.best_match is not None
-        assert mock_post.call_count == 2
+        assert route.call_count == 2
 
     @pytest.mark.asyncio
+    @respx.mock
     async def test_retries_on_timeout(self):
         """Timeout exceptions should be retried."""
-        ok_resp = _mock_response(200, SAMPLE_RESPONSE)
-
-        call_count = [0]
-        def post_side_effect(*args, **kwargs):
-            call_count[0] += 1
-            if call_count[0] < 2:
-                raise requests.Timeout("timeout")
-            return ok_resp
-
-        mock_post = MagicMock(side_effect=post_side_effect)
-
-        with patch("src.clients.plantnet.requests.post", mock_post):
-            with patch("src.clients.plantnet.asyncio.to_thread", new_callable=AsyncMock) as mock_to_thread:
-                mock_to_thread.side_effect = lambda fn: fn()
-                with patch("src.clients.plantnet.asyncio.sleep", new_callable=AsyncMock):
-                    result = await identify(
-                        [(FAKE_PHOTO, "full_tree_angle1")],
-                        api_key="test-key",
-                    )
+        route = respx.post(PLANTNET_URL).mock(side_effect=[
+            httpx.ReadTimeout("timeout"),
+            httpx.Response(200, json=SAMPLE_RESPONSE),
+        ])
+
+        with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
+            result = await identify(
+                [(FAKE_PHOTO, "full_tree_angle1")],
+                api_key="test-key",
+            )
 
         assert result.best_match is not None
-        assert mock_post.call_count == 2
+        assert route.call_count == 2
@@ -0,0 +1,242 @@
+"""Tests for the header-calibrated LLM rate limiter."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.clients.llm import query
+from src.clients.rate_limit import (
+    REDIS_KEY_PREFIX,
+    RateLimiter,
+    RedisBuckets,
+    parse_gemini_quota,
+    parse_rate_limit_headers,
+)
+from src.config import settings
+from src.utils import metrics
+
+ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+
+ANTHROPIC_HEADERS = {
+    "anthropic-ratelimit-requests-limit": "50",
+    "anthropic-ratelimit-requests-remaining": "49",
+    "anthropic-ratelimit-input-tokens-limit": "30000",
+    "anthropic-ratelimit-input-tokens-remaining": "27000",
+    "anthropic-ratelimit-output-tokens-limit": "8000",
+    "anthropic-ratelimit-output-tokens-remaining": "7900",
+}
+
+GEMINI_429 = {
+    "error": {
+        "code": 429,
+        "status": "RESOURCE_EXHAUSTED",
+        "details": [
+            {
+                "@type": "type.googleapis.com/google.rpc.QuotaFailure",
+                "violations": [{
+                    "quotaMetric": "generativelanguage.googleapis.com/generate_content_free_tier_input_token_count",
+                    "quotaId": "GenerateContentInputTokensPerModelPerMinute-FreeTier",
+                    "quotaValue": "250000",
+                }],
+            },
+            {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "24s"},
+        ],
+    },
+}
+
+
+def _response(status: int = 200, headers: dict | None = None, json: dict | None = None) -> httpx.Response:
+    return httpx.Response(status, headers=headers or {}, json=json or {}, request=httpx.Request("POST", ANTHROPIC_URL))
+
+
+class TestParsing:
+    def test_anthropic_headers(self):
+        parsed = parse_rate_limit_headers("anthropic", ANTHROPIC_HEADERS)
+        assert parsed == {
+            "requests": (50, 49),
+            "input_tokens": (30000, 27000),
+            "output_tokens": (8000, 7900),
+        }
+
+    def test_openai_headers(self):
+        parsed = parse_rate_limit_headers("openai", {
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "499",
+            "x-ratelimit-limit-tokens": "30000",
+            "x-ratelimit-remaining-tokens": "29000",
+            "x-ratelimit-reset-tokens": "2s",
+        })
+        assert parsed == {"requests": (500, 499), "tokens": (30000, 29000)}
+
+    def test_malformed_headers_ignored(self):
+        assert parse_rate_limit_headers("anthropic", {"anthropic-ratelimit-requests-limit": "lots"}) == {}
+
+    def test_gemini_quota(self):
+        quotas, delay = parse_gemini_quota(GEMINI_429)
+        assert quotas == {"input_tokens": (250000, 0)}
+        assert delay == 24
+
+
+class TestLocalLimiter:
+    @pytest.mark.asyncio
+    async def test_unknown_limits_not_enforced(self):
+        limiter = RateLimiter(shared=False)
+        with patch("src.clients.rate_limit.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            for _ in range(100):
+                await limiter.reserve("anthropic", "m", 10_000, 1_000)
+        sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_waits_when_bucket_empty(self):
+        limiter = RateLimiter(shared=False)
+        clock = [100.0]
+
+        async def advance(seconds):
+            clock[0] += seconds
+
+        with patch("src.clients.rate_limit.time.monotonic", side_effect=lambda: clock[0]):
+            await limiter.observe("anthropic", "m", _response(headers={
+                "anthropic-ratelimit-input-tokens-limit": "6000",
+                "anthropic-ratelimit-input-tokens-remaining": "1000",
+            }))
+            with patch("src.clients.rate_limit.asyncio.sleep", new_callable=AsyncMock, side_effect=advance) as sleep:
+                await limiter.reserve("anthropic", "m", 3000, 100)
+        # 2000 tokens short at 100 tokens/s → ~20s (plus up to 10% jitter)
+        assert 20 <= sleep.await_args.args[0] <= 22
+        assert metrics.get("llm_rate_limit_waits_total", provider="anthropic") == 1
+
+    @pytest.mark.asyncio
+    async def test_settle_refunds_unused_output(self):
+        limiter = RateLimiter(shared=False)
+        await limiter.observe("anthropic", "m", _response(headers={
+            "anthropic-ratelimit-output-tokens-limit": "1000",
+            "anthropic-ratelimit-output-tokens-remaining": "1000",
+        }))
+        reservation = await limiter.reserve("anthropic", "m", 100, 1000)
+        await limiter.settle(reservation, 100, 50)
+        bucket = limiter.buckets._buckets[f"{REDIS_KEY_PREFIX}anthropic:m:output_tokens"]
+        assert bucket[1] == pytest.approx(950, abs=1)
+
+    @pytest.mark.asyncio
+    async def test_429_blocks_until_retry_after(self):
+        limiter = RateLimiter(shared=False)
+        await limiter.observe("anthropic", "m", _response(429, headers={"retry-after": "5"}))
+        wait = await limiter.buckets.take(f"{REDIS_KEY_PREFIX}anthropic:m:blocked", {})
+        assert 4 < wait <= 5
+        assert metrics.get("llm_rate_limit_blocks_total", provider="anthropic") == 1
+
+    @pytest.mark.asyncio
+    async def test_gemini_429_calibrates(self):
+        limiter = RateLimiter(shared=False)
+        await limiter.observe("google", "gemini", _response(429, json=GEMINI_429))
+        bucket = limiter.buckets._buckets[f"{REDIS_KEY_PREFIX}google:gemini:input_tokens"]
+        assert bucket[0] == 250000
+        assert bucket[1] == 0
+        assert metrics.get("llm_rate_limit_per_minute", provider="google", model="gemini", dimension="input_tokens") == 250000
+
+    @pytest.mark.asyncio
+    async def test_gives_up_waiting_after_max_wait(self):
+        limiter = RateLimiter(shared=False, max_wait_s=1.0)
+        await limiter.observe("anthropic", "m", _response(429, headers={"retry-after": "30"}))
+        with patch("src.clients.rate_limit.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            reservation = await limiter.reserve("anthropic", "m", 10, 10)
+        sleep.assert_not_awaited()
+        assert reservation.amounts == {}
+
+
+class TestRedisBuckets:
+    @pytest.mark.asyncio
+    async def test_scripts_called_with_keys(self):
+        take, adjust = AsyncMock(return_value=b"0"), AsyncMock(return_value=1)
+        buckets = RedisBuckets()
+        buckets._client = lambda: (MagicMock(), take, adjust)
+        limiter = RateLimiter(shared=True)
+        limiter.buckets = buckets
+
+        reservation = await limiter.reserve("openai", "gpt-4o", 900, 100)
+        keys = take.await_args.kwargs["keys"]
+        assert keys[0] == f"{REDIS_KEY_PREFIX}openai:gpt-4o:blocked"
+        assert take.await_args.kwargs["args"] == ["1.0", "1000.0"]
+        assert keys[1:] == [f"{REDIS_KEY_PREFIX}openai:gpt-4o:requests", f"{REDIS_KEY_PREFIX}openai:gpt-4o:tokens"]
+
+        await limiter.settle(reservation, 900, 40)
+        assert adjust.await_args.kwargs["keys"] == [f"{REDIS_KEY_PREFIX}openai:gpt-4o:tokens"]
+        assert adjust.await_args.kwargs["args"][:3] == ["", "", "60.0"]
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_fails_open(self):
+        buckets = RedisBuckets()
+        buckets._client = lambda: (MagicMock(), AsyncMock(side_effect=ConnectionError("refused")), AsyncMock())
+        limiter = RateLimiter(shared=True)
+        limiter.buckets = buckets
+        reservation = await limiter.reserve("anthropic", "m", 10, 10)
+        assert reservation.amounts == {}
+
+
+class TestQueryIntegration:
+    @pytest.mark.asyncio
+    async def test_reserve_observe_settle(self):
+        limiter = RateLimiter(shared=False)
+        response = _response(headers=ANTHROPIC_HEADERS, json={
+            "content": [{"type": "text", "text": "{}"}],
+            "model": "m",
+            "usage": {"input_tokens": 120, "output_tokens": 30},
+        })
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_prompt_caching = False
+            mock_settings.llm_structured_output = False
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=AsyncMock(return_value=response))):
+                with patch("src.clients.llm.get_limiter", return_value=limiter):
+                    with patch.object(limiter, "settle", wraps=limiter.settle) as settle:
+                        await query("x" * 400, provider="anthropic", model="m", max_tokens=500)
+
+        reservation = settle.await_args.args[0]
+        assert reservation.amounts == {"requests": 1.0, "input_tokens": 100.0, "output_tokens": 500.0}
+        assert settle.await_args.args[1:] == (120, 30)
+        bucket = limiter.buckets._buckets[f"{REDIS_KEY_PREFIX}anthropic:m:requests"]
+        assert bucket[0] == 50
+
+    @pytest.mark.asyncio
+    async def test_failed_attempts_settle_to_what_the_provider_counted(self):
+        limiter = RateLimiter(shared=False)
+        request = httpx.Request("POST", ANTHROPIC_URL)
+        ok = _response(json={"content": [{"type": "text", "text": "{}"}], "usage": {"input_tokens": 90, "output_tokens": 5}})
+        post = AsyncMock(side_effect=[
+            httpx.ConnectError("refused", request=request),
+            httpx.ReadTimeout("slow", request=request),
+            ok,
+        ])
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_prompt_caching = False
+            mock_settings.llm_structured_output = False
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=post)):
+                with patch("src.clients.llm.get_limiter", return_value=limiter):
+                    with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock):
+                        with patch.object(limiter, "settle", wraps=limiter.settle) as settle:
+                            await query("x" * 400, provider="anthropic", model="m", max_tokens=500)
+
+        # Refused: nothing counted. Timed out reading: the prompt was. Answered: actual usage.
+        assert [call.args[1:] for call in settle.await_args_list] == [(0, 0), (100, 0), (90, 5)]
+
+    @pytest.mark.asyncio
+    async def test_unparseable_answer_still_observed_and_settled(self):
+        limiter = RateLimiter(shared=False)
+        garbled = httpx.Response(
+            200, headers=ANTHROPIC_HEADERS, content=b"<html>proxy error</html>", request=httpx.Request("POST", ANTHROPIC_URL),
+        )
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_prompt_caching = False
+            mock_settings.llm_structured_output = False
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=AsyncMock(return_value=garbled))):
+                with patch("src.clients.llm.get_limiter", return_value=limiter):
+                    with patch.object(limiter, "settle", wraps=limiter.settle) as settle:
+                        with pytest.raises(ValueError):
+                            await query("x" * 400, provider="anthropic", model="m", max_tokens=500)
+
+        assert settle.await_args.args[1:] == (100, 0)
+        bucket = limiter.buckets._buckets[f"{REDIS_KEY_PREFIX}anthropic:m:requests"]
+        assert bucket[0] == 50
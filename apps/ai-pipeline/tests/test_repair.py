@@ -0,0 +1,93 @@
+"""Tests for the text-only repair re-prompt."""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.analyzers import health
+from src.analyzers.health import analyze_health, parse_health_response
+from src.analyzers.measurements import analyze_measurements, parse_measurement_response
+from src.analyzers.repair import build_prompt
+from src.clients.llm import LLMResponse
+from src.config import settings
+from src.utils import metrics
+
+BAD_HEALTH = '{"conditionStructural": "so-so", "conditionLeaf": "good", "confidence": 0.7}'
+GOOD_HEALTH = '{"conditionStructural": "fair", "conditionLeaf": "good", "confidence": 0.7}'
+
+
+@pytest.fixture
+def repair_on():
+    with patch("src.analyzers.cascade.settings", settings.model_copy()) as mock_settings:
+        mock_settings.llm_repair = True
+        yield mock_settings
+
+
+def _response(text: str) -> LLMResponse:
+    return LLMResponse(text=text, provider="anthropic", model="m")
+
+
+class TestValidationErrors:
+    def test_health_names_bad_field_and_allowed_values(self):
+        errors: list[str] = []
+        assert parse_health_response(BAD_HEALTH, errors) is None
+        assert len(errors) == 1
+        assert "conditionStructural 'so-so'" in errors[0] and "excellent" in errors[0]
+
+    def test_measurement_missing_field(self):
+        errors: list[str] = []
+        assert parse_measurement_response('{"heightM": 12}', errors) is None
+        assert errors == ["dbhCm is missing"]
+
+    def test_no_json(self):
+        errors: list[str] = []
+        assert parse_health_response("It looks healthy.", errors) is None
+        assert errors == ["No JSON object found in the response"]
+
+
+def test_prompt_carries_answer_errors_and_enums():
+    prompt = build_prompt(BAD_HEALTH, ["conditionStructural 'so-so' is not allowed"], health.RESPONSE_SCHEMA)
+    assert BAD_HEALTH in prompt
+    assert "- conditionStructural 'so-so' is not allowed" in prompt
+    assert '"fungal_fruiting_bodies"' in prompt  # enum values from the schema
+
+
+class TestRepairInAnalyzers:
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_off_by_default(self, mock_llm):
+        mock_llm.return_value = _response(BAD_HEALTH)
+        assert await analyze_health([(b"img", "full_tree_angle1")]) is None
+        mock_llm.assert_called_once()
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.health.llm_query")
+    async def test_repair_is_text_only(self, mock_llm, repair_on):
+        mock_llm.side_effect = [_response(BAD_HEALTH), _response(GOOD_HEALTH)]
+
+        result = await analyze_health([(b"img", "full_tree_angle1")])
+
+        assert result.condition_structural == "fair"
+        first, second = mock_llm.call_args_list
+        assert first.kwargs["images"]
+        assert "images" not in second.kwargs
+        assert "so-so" in second.args[0]
+        assert second.kwargs["schema"] is health.RESPONSE_SCHEMA
+        assert metrics.get("llm_repairs_total", analyzer="health", outcome="fixed") == 1
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.measurements.llm_query")
+    async def test_failed_repair_returns_none(self, mock_llm, repair_on):
+        mock_llm.side_effect = [_response('{"heightM": 12}'), _response('{"heightM": 12}')]
+
+        assert await analyze_measurements([(b"img", "full_tree_angle1")]) is None
+        assert mock_llm.call_count == 2
+        assert metrics.get("llm_repairs_total", analyzer="measurements", outcome="failed") == 1
+
+    @pytest.mark.asyncio
+    @patch("src.analyzers.measurements.llm_query")
+    async def test_repair_error_is_contained(self, mock_llm, repair_on):
+        mock_llm.side_effect = [_response("no idea"), Exception("503")]
+
+        assert await analyze_measurements([(b"img", "full_tree_angle1")]) is None
+        assert metrics.get("llm_repairs_total", analyzer="measurements", outcome="error") == 1
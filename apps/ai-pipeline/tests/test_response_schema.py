@@ -0,0 +1,154 @@
+"""Tests for structured-output schemas and their provider wiring."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.analyzers import fused, health, measurements, site, species
+from src.analyzers.health import VALID_CONDITIONS, VALID_OBSERVATIONS, parse_health_response
+from src.analyzers.site import VALID_SITE_TYPES
+from src.clients import usage
+from src.clients.llm import _apply_response_schema, _parse_anthropic_response, prompt_caching, query
+from src.clients.response_schema import camel_case, to_gemini_schema
+from src.config import settings
+from src.utils import metrics
+
+
+def _walk_objects(schema: dict):
+    if schema.get("type") == "object":
+        yield schema
+        for prop in schema["properties"].values():
+            yield from _walk_objects(prop)
+
+
+class TestDataclassSchema:
+    def test_camel_case(self):
+        assert camel_case("dbh_cm") == "dbhCm"
+        assert camel_case("overhead_utility_conflict") == "overheadUtilityConflict"
+        assert camel_case("confidence") == "confidence"
+
+    def test_health_schema(self):
+        props = health.RESPONSE_SCHEMA.schema["properties"]
+        assert set(props) == {"conditionStructural", "conditionLeaf", "confidence", "observations"}
+        assert props["conditionLeaf"]["enum"] == sorted(VALID_CONDITIONS)
+        assert props["observations"]["items"]["enum"] == sorted(VALID_OBSERVATIONS)
+
+    def test_nullable_enum(self):
+        site_type = site.RESPONSE_SCHEMA.schema["properties"]["siteType"]
+        assert site_type["type"] == ["string", "null"]
+        assert site_type["enum"] == [*sorted(VALID_SITE_TYPES), None]
+
+    def test_locally_computed_fields_excluded(self):
+        assert set(measurements.RESPONSE_SCHEMA.schema["properties"]) == {"dbhCm", "heightM", "crownWidthM", "numStems"}
+        assert measurements.RESPONSE_SCHEMA.schema["properties"]["numStems"] == {"type": "integer"}
+        assert set(species.RESPONSE_SCHEMA.schema["properties"]) == {"common", "scientific", "confidence"}
+
+    def test_strict_everywhere(self):
+        for obj in _walk_objects(fused.RESPONSE_SCHEMA.schema):
+            assert obj["additionalProperties"] is False
+            assert obj["required"] == list(obj["properties"])
+
+    def test_schema_document_is_accepted_by_parser(self):
+        document = {"conditionStructural": "good", "conditionLeaf": "fair", "confidence": 0.8, "observations": ["lean"]}
+        assert set(document) == set(health.RESPONSE_SCHEMA.schema["required"])
+        assert parse_health_response(json.dumps(document)).observations == ["lean"]
+
+
+class TestGeminiSchema:
+    def test_converts_nullable_and_drops_additional_properties(self):
+        converted = to_gemini_schema(site.RESPONSE_SCHEMA.schema)
+        assert "additionalProperties" not in converted
+        assert converted["properties"]["siteType"]["type"] == "string"
+        assert converted["properties"]["siteType"]["nullable"] is True
+        assert None not in converted["properties"]["siteType"]["enum"]
+        assert converted["properties"]["trunkDefects"]["items"]["type"] == "string"
+
+
+class TestProviderWiring:
+    def test_anthropic_forced_tool(self):
+        payload = {"messages": []}
+        _apply_response_schema(payload, "anthropic", health.RESPONSE_SCHEMA)
+        assert payload["tools"][0]["name"] == "health_assessment"
+        assert payload["tools"][0]["input_schema"] == health.RESPONSE_SCHEMA.schema
+        assert payload["tool_choice"] == {"type": "tool", "name": "health_assessment"}
+
+    def test_openai_json_schema(self):
+        payload = {"messages": []}
+        _apply_response_schema(payload, "openai", health.RESPONSE_SCHEMA)
+        assert payload["response_format"]["type"] == "json_schema"
+        assert payload["response_format"]["json_schema"]["strict"] is True
+
+    def test_google_response_schema(self):
+        payload = {"contents": [], "generationConfig": {"maxOutputTokens": 10}}
+        _apply_response_schema(payload, "google", health.RESPONSE_SCHEMA)
+        assert payload["generationConfig"]["responseMimeType"] == "application/json"
+        assert payload["generationConfig"]["responseSchema"]["type"] == "object"
+
+    def test_anthropic_tool_use_becomes_json_text(self):
+        result = _parse_anthropic_response({
+            "content": [{"type": "tool_use", "id": "t1", "name": "species_identification",
+                         "input": {"common": "Live Oak", "scientific": "Quercus virginiana", "confidence": 0.9}}],
+            "model": "claude-test",
+        })
+        assert json.loads(result.text)["scientific"] == "Quercus virginiana"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("enabled", [True, False])
+    async def test_query_applies_schema_only_when_enabled(self, enabled):
+        url = "https://api.anthropic.com/v1/messages"
+        mock_post = AsyncMock(return_value=httpx.Response(
+            200, json={"content": [{"type": "text", "text": "{}"}], "model": "m"}, request=httpx.Request("POST", url),
+        ))
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_prompt_caching = False
+            mock_settings.llm_structured_output = enabled
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                await query("assess", provider="anthropic", model="m", schema=site.RESPONSE_SCHEMA)
+
+        payload = json.loads(bytes(mock_post.call_args.kwargs["content"]))
+        assert ("tools" in payload) is enabled
+
+    @pytest.mark.asyncio
+    async def test_anthropic_tools_turn_off_image_prefix_caching(self):
+        url = "https://api.anthropic.com/v1/messages"
+        mock_post = AsyncMock(return_value=httpx.Response(
+            200, json={"content": [{"type": "text", "text": "{}"}], "model": "m"}, request=httpx.Request("POST", url),
+        ))
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            mock_settings.llm_prompt_caching = True
+            mock_settings.llm_structured_output = True
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                await query(
+                    "assess", images=[(b"img", "image/jpeg")], provider="anthropic", model="m",
+                    schema=site.RESPONSE_SCHEMA,
+                )
+            # The per-analyzer tool precedes the images in Anthropic's cache prefix; Gemini's cache is unaffected
+            assert not prompt_caching("anthropic")
+            assert prompt_caching("google")
+
+        payload = json.loads(bytes(mock_post.call_args.kwargs["content"]))
+        assert "tools" in payload
+        assert all("cache_control" not in block for block in payload["messages"][0]["content"])
+
+    @pytest.mark.asyncio
+    async def test_openai_refusal_is_an_empty_billed_answer(self):
+        url = "https://api.openai.com/v1/chat/completions"
+        mock_post = AsyncMock(return_value=httpx.Response(200, json={
+            "model": "gpt-4o",
+            "choices": [{"message": {"role": "assistant", "content": None, "refusal": "I can't help with that."}}],
+            "usage": {"prompt_tokens": 300, "completion_tokens": 8},
+        }, request=httpx.Request("POST", url)))
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.openai_api_key = "sk-test"
+            mock_settings.llm_structured_output = True
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                with usage.track() as ledger:
+                    result = await query("assess", provider="openai", model="gpt-4o", schema=site.RESPONSE_SCHEMA)
+
+        assert result.text == ""
+        assert metrics.get("llm_refusals_total", provider="openai", model="gpt-4o") == 1
+        assert (ledger.total.calls, ledger.total.input_tokens) == (1, 300)
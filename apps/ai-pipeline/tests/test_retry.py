@@ -0,0 +1,82 @@
+"""Tests for the shared retry policy."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.utils import metrics
+from src.utils.retry import RetryBudget, RetryPolicy, Retrier, retry_after_seconds
+
+POLICY = RetryPolicy("test", max_attempts=4, base_delay_s=1.0, max_delay_s=20.0)
+
+
+@pytest.fixture
+def sleep():
+    with patch("src.utils.retry.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        yield mock_sleep
+
+
+@pytest.mark.parametrize("headers, expected", [({"retry-after": "7"}, 7), ({}, None), ({"retry-after": "soon"}, None)])
+def test_retry_after(headers, expected):
+    assert retry_after_seconds(headers) == expected
+
+
+class TestRetrier:
+    @pytest.mark.asyncio
+    async def test_attempts_and_jittered_delays(self, sleep):
+        retrier = Retrier(POLICY, RetryBudget(1.0))
+        attempts = []
+        for attempt in retrier:
+            attempts.append(attempt)
+            if not await retrier.backoff("timeout"):
+                break
+        assert attempts == [1, 2, 3, 4]
+        delays = [c.args[0] for c in sleep.await_args_list]
+        assert len(delays) == 3
+        assert all(1.0 <= d <= 20.0 for d in delays)
+        assert metrics.get("retries_total", call="test", reason="timeout") == 3
+
+    @pytest.mark.asyncio
+    async def test_delays_are_decorrelated(self, sleep):
+        for _ in range(20):
+            retrier = Retrier(POLICY, RetryBudget(1.0))
+            next(iter(retrier))
+            await retrier.backoff("503")
+        first_delays = {c.args[0] for c in sleep.await_args_list}
+        assert len(first_delays) > 1  # no lockstep
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_a_floor(self, sleep):
+        retrier = Retrier(POLICY, RetryBudget(1.0))
+        next(iter(retrier))
+        assert await retrier.backoff("429", {"retry-after": "15"})
+        assert sleep.await_args.args[0] >= 15
+
+    @pytest.mark.asyncio
+    async def test_retry_after_beyond_cap_gives_up(self, sleep):
+        retrier = Retrier(POLICY, RetryBudget(1.0))
+        next(iter(retrier))
+        assert not await retrier.backoff("429", {"retry-after": "120"})
+        sleep.assert_not_awaited()
+        assert metrics.get("retries_denied_total", call="test", reason="retry_after") == 1
+
+    @pytest.mark.asyncio
+    async def test_immediate_retry(self, sleep):
+        retrier = Retrier(POLICY, RetryBudget(1.0))
+        next(iter(retrier))
+        assert await retrier.backoff("401", delay=0)
+        sleep.assert_not_awaited()
+
+
+class TestRetryBudget:
+    @pytest.mark.asyncio
+    async def test_budget_caps_retries(self, sleep):
+        budget = RetryBudget(0.1, burst=2)
+        retried = 0
+        for _ in range(30):
+            retrier = Retrier(POLICY, budget)
+            next(iter(retrier))
+            retried += await retrier.backoff("503")
+        # 2 from the initial burst, then 0.1 per call
+        assert 4 <= retried <= 5
+        assert metrics.get("retries_denied_total", call="test", reason="budget") == 30 - retried
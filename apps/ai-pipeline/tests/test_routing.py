@@ -0,0 +1,121 @@
+"""Tests for per-analyzer LLM routing."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.analyzers.site import analyze_site
+from src.clients.llm import LLMResponse, query
+from src.clients.routing import AnalyzerRoute, parse_route, route_for
+from src.config import settings
+
+SITE_TEXT = '{"conditionRating": "good", "locationType": "street"}'
+
+
+@pytest.fixture
+def routes():
+    with patch("src.clients.routing.settings", settings.model_copy()) as mock_settings:
+        yield mock_settings
+
+
+class TestRouteFor:
+    def test_defaults_when_unset(self, routes):
+        assert route_for("species") == AnalyzerRoute()
+        assert route_for("species").query_kwargs() == {}
+
+    def test_analyzer_entry_overrides_wildcard(self, routes):
+        routes.llm_routes = {
+            "*": {"temperature": 0, "max_tokens": 800},
+            "site": {"provider": "anthropic", "model": "claude-haiku-4-5", "max_tokens": 300, "stop": "\n\n\n"},
+        }
+        assert route_for("site").query_kwargs() == {
+            "provider": "anthropic", "model": "claude-haiku-4-5", "max_tokens": 300, "temperature": 0,
+            "stop": ("\n\n\n",),
+        }
+        assert route_for("species").query_kwargs() == {"max_tokens": 800, "temperature": 0}
+
+    def test_unknown_field_raises(self, routes):
+        routes.llm_routes = {"site": {"max_output_tokens": 300}}
+        with pytest.raises(ValueError, match="max_output_tokens"):
+            route_for("site")
+
+
+class TestParseRoute:
+    def test_provider_and_model(self):
+        assert parse_route(" anthropic:claude-haiku-4-5 ") == ("anthropic", "claude-haiku-4-5")
+
+    @pytest.mark.parametrize("entry", ["", "  ", "anthropic", "anthropic:", ":gpt-4o"])
+    def test_malformed_is_none(self, entry):
+        assert parse_route(entry) is None
+
+
+class TestAnalyzersUseRoutes:
+    @pytest.mark.asyncio
+    @patch("src.analyzers.site.llm_query")
+    async def test_site_route_passed_to_query(self, mock_llm, routes):
+        routes.llm_routes = {"site": {"model": "claude-haiku-4-5", "max_tokens": 300, "timeout": 20}}
+        mock_llm.return_value = LLMResponse(text=SITE_TEXT, provider="anthropic", model="claude-haiku-4-5")
+
+        await analyze_site([(b"img", "full_tree_angle1")])
+
+        kwargs = mock_llm.call_args.kwargs
+        assert (kwargs["model"], kwargs["max_tokens"], kwargs["timeout"]) == ("claude-haiku-4-5", 300, 20)
+        assert "provider" not in kwargs  # still LLM_PROVIDER
+
+
+class TestSamplingPayload:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("provider, expected", [
+        ("anthropic", {"temperature": 0.2, "stop_sequences": ["END"]}),
+        ("openai", {"temperature": 0.2, "stop": ["END"]}),
+    ])
+    async def test_sampling_fields(self, provider, expected):
+        response = httpx.Response(
+            200,
+            json={"content": [{"type": "text", "text": "{}"}]} if provider == "anthropic"
+            else {"choices": [{"message": {"content": "{}"}}]},
+            request=httpx.Request("POST", "https://example.com"),
+        )
+        mock_post = AsyncMock(return_value=response)
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = mock_settings.openai_api_key = "sk-test"
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                await query("p", provider=provider, model="m", temperature=0.2, stop=["END"])
+
+        payload = json.loads(bytes(mock_post.call_args.kwargs["content"]))
+        assert {k: payload[k] for k in expected} == expected
+
+    @pytest.mark.asyncio
+    async def test_gemini_generation_config(self):
+        response = httpx.Response(
+            200,
+            json={"candidates": [{"content": {"parts": [{"text": "{}"}]}}]},
+            request=httpx.Request("POST", "https://example.com"),
+        )
+        mock_post = AsyncMock(return_value=response)
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.google_api_key = "g-test"
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                await query("p", provider="google", model="gemini", max_tokens=300, temperature=0.0, stop=["END"])
+
+        payload = json.loads(bytes(mock_post.call_args.kwargs["content"]))
+        assert payload["generationConfig"] == {"maxOutputTokens": 300, "temperature": 0.0, "stopSequences": ["END"]}
+
+    @pytest.mark.asyncio
+    async def test_temperature_is_part_of_cache_key(self):
+        response = httpx.Response(
+            200,
+            json={"content": [{"type": "text", "text": "{}"}]},
+            request=httpx.Request("POST", "https://example.com"),
+        )
+        mock_post = AsyncMock(return_value=response)
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                await query("p", provider="anthropic", model="m", temperature=0.0)
+                await query("p", provider="anthropic", model="m", temperature=1.0)
+                await query("p", provider="anthropic", model="m", temperature=0.0)
+
+        assert mock_post.await_count == 2
@@ -84,6 +84,20 @@ class TestFetchObservation:
         result = await fetch_observation(mock_pool, obs_id)
         assert result is not None
         assert result.tree_id is None
+        assert result.contract_id is None
+
+    @pytest.mark.asyncio
+    async def test_contract_of_tree_zone(self, mock_pool, obs_id):
+        mock_pool.fetchrow.return_value = {
+            "id": UUID(obs_id),
+            "tree_id": UUID("00000000-0000-0000-0000-000000000001"),
+            "latitude": 30.0,
+            "longitude": -97.0,
+            "status": "pending_ai",
+            "contract_id": UUID("00000000-0000-0000-0000-0000000000c1"),
+        }
+        result = await fetch_observation(mock_pool, obs_id)
+        assert result.contract_id == "00000000-0000-0000-0000-0000000000c1"
 
 
 class TestFetchPhotos:
@@ -0,0 +1,83 @@
+"""Tests for adaptive per-stage timeouts."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.clients.llm import query
+from src.config import settings
+from src.utils import metrics
+from src.utils.timeouts import TimeoutPolicy, observe, timeout_for
+
+POLICY = TimeoutPolicy("test", default_s=30.0, floor_s=2.0, ceiling_s=60.0)
+
+
+@pytest.fixture
+def adaptive():
+    with patch("src.utils.timeouts.settings", settings.model_copy()) as mock_settings:
+        mock_settings.adaptive_timeouts = True
+        mock_settings.timeout_quantile = 99.0
+        mock_settings.timeout_multiplier = 2.0
+        mock_settings.timeout_min_samples = 10
+        yield mock_settings
+
+
+class TestTimeoutFor:
+    def test_default_when_disabled(self):
+        for _ in range(100):
+            observe(POLICY, 1.0)
+        assert timeout_for(POLICY) == 30.0
+
+    def test_default_until_enough_samples(self, adaptive):
+        for _ in range(9):
+            observe(POLICY, 1.0)
+        assert timeout_for(POLICY) == 30.0
+
+    def test_quantile_times_multiplier(self, adaptive):
+        for _ in range(20):
+            observe(POLICY, 4.0, "anthropic/m")
+        assert timeout_for(POLICY, "anthropic/m") == 8.0
+        assert metrics.get("timeout_seconds", stage="test", upstream="anthropic/m") == 8.0
+        assert timeout_for(POLICY, "openai/m") == 30.0  # separate window
+
+    def test_clamped_to_floor_and_ceiling(self, adaptive):
+        for _ in range(20):
+            observe(POLICY, 0.1, "fast")
+            observe(POLICY, 45.0, "slow")
+        assert timeout_for(POLICY, "fast") == 2.0
+        assert timeout_for(POLICY, "slow") == 60.0
+
+
+class TestLLMIntegration:
+    @pytest.mark.asyncio
+    async def test_derived_timeout_used_and_learned(self, adaptive):
+        for _ in range(20):
+            observe(TimeoutPolicy("llm", 60.0, 15.0, 120.0), 10.0, "anthropic/m")
+        response = httpx.Response(
+            200,
+            json={"content": [{"type": "text", "text": "{}"}], "model": "m"},
+            request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"),
+        )
+        mock_post = AsyncMock(return_value=response)
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                await query("identify", provider="anthropic", model="m")
+
+        assert mock_post.call_args.kwargs["timeout"] == 20.0
+
+    @pytest.mark.asyncio
+    async def test_explicit_timeout_wins(self, adaptive):
+        response = httpx.Response(
+            200,
+            json={"content": [{"type": "text", "text": "{}"}], "model": "m"},
+            request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"),
+        )
+        mock_post = AsyncMock(return_value=response)
+        with patch("src.clients.llm.settings", settings.model_copy()) as mock_settings:
+            mock_settings.anthropic_api_key = "sk-test"
+            with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+                await query("identify", provider="anthropic", model="m", timeout=7.0)
+
+        assert mock_post.call_args.kwargs["timeout"] == 7.0
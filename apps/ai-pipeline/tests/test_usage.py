@@ -0,0 +1,156 @@
+"""Tests for LLM token/cost accounting and budgets."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.clients import usage
+from src.clients.llm import LLMResponse, query
+from src.config import settings
+from src.utils import latency, metrics
+
+
+@pytest.fixture
+def usage_settings():
+    """One settings copy for the LLM client and the usage ledger."""
+    copy = settings.model_copy()
+    copy.llm_budget_shared = False
+    copy.anthropic_api_key = "sk-test"
+    with patch("src.clients.usage.settings", copy), patch("src.clients.llm.settings", copy):
+        yield copy
+
+
+@pytest.fixture
+def upstream():
+    """Anthropic stand-in answering every call with 1M input and 100k output tokens."""
+    def respond(*args, **kwargs):
+        body = json.loads(bytes(kwargs["content"]))
+        return httpx.Response(
+            200,
+            json={
+                "model": body["model"],
+                "content": [{"type": "text", "text": "{}"}],
+                "usage": {"input_tokens": 1_000_000, "output_tokens": 100_000},
+            },
+            request=httpx.Request("POST", "https://example.com"),
+        )
+
+    mock_post = AsyncMock(side_effect=respond)
+    with patch("src.clients.llm.get_client", return_value=MagicMock(post=mock_post)):
+        yield mock_post
+
+
+def _models(mock_post) -> list[str]:
+    return [json.loads(bytes(c.kwargs["content"]))["model"] for c in mock_post.call_args_list]
+
+
+class TestNormalize:
+    def test_anthropic_cache_tokens_priced_separately(self):
+        response = LLMResponse(
+            text="", provider="anthropic", model="claude-sonnet-4-5-20250929",
+            usage={"input_tokens": 1000, "output_tokens": 200},
+            cache_read_tokens=10_000, cache_write_tokens=0,
+        )
+        result = usage.normalize(response, "claude-sonnet-4-5-20250929", images=4)
+        assert (result.input_tokens, result.cache_read_tokens, result.images) == (1000, 10_000, 4)
+        assert result.cost_usd == pytest.approx((1000 * 3 + 200 * 15 + 10_000 * 0.3) / 1e6)
+
+    def test_openai_prompt_tokens_include_cached_prefix(self):
+        response = LLMResponse(
+            text="", provider="openai", model="gpt-4o-2024-08-06",
+            usage={"prompt_tokens": 5000, "completion_tokens": 100}, cache_read_tokens=4000,
+        )
+        result = usage.normalize(response, "gpt-4o", images=1)
+        assert (result.input_tokens, result.cache_read_tokens, result.output_tokens) == (1000, 4000, 100)
+
+    def test_batch_discount_and_cache_hits(self):
+        response = LLMResponse(text="", provider="anthropic", model="m", usage={"input_tokens": 1_000_000})
+        assert usage.normalize(response, "claude-haiku-4-5", 0, batched=True).cost_usd == pytest.approx(0.5)
+        response.cached = True
+        assert usage.normalize(response, "claude-haiku-4-5", 0).cost_usd == 0
+
+    def test_unknown_model_is_counted_unpriced(self):
+        response = LLMResponse(text="", provider="openai", model="", usage={"prompt_tokens": 10})
+        assert usage.normalize(response, "o9-preview", 0).cost_usd == 0
+        assert metrics.get("llm_unpriced_calls_total", provider="openai", model="o9-preview") == 1
+
+    def test_price_override(self, usage_settings):
+        usage_settings.llm_prices = {"o9": {"input": 2.0, "output": 8.0}}
+        assert usage.price_for("o9-preview") == usage.Price(2.0, 8.0, 2.0, 2.0)
+
+
+class TestLedger:
+    @pytest.mark.asyncio
+    async def test_queries_accounted_per_analyzer_and_model(self, upstream, usage_settings):
+        with usage.track() as ledger:
+            await query("p", provider="anthropic", model="claude-haiku-4-5", analyzer="site")
+            await query("q", provider="anthropic", model="claude-sonnet-4-5", analyzer="species")
+
+        assert ledger.total.calls == 2
+        assert ledger.by_analyzer["site"].cost_usd == pytest.approx(1.0 + 0.5)
+        assert ledger.by_analyzer["species"].cost_usd == pytest.approx(3.0 + 1.5)
+        assert set(ledger.as_dict()["byModel"]) == {"anthropic/claude-haiku-4-5", "anthropic/claude-sonnet-4-5"}
+        assert metrics.get(
+            "llm_tokens_total", provider="anthropic", model="claude-haiku-4-5", analyzer="site", kind="input",
+        ) == 1_000_000
+
+    @pytest.mark.asyncio
+    async def test_losing_hedge_billed_at_its_input_estimate(self, upstream, usage_settings):
+        usage_settings.llm_hedging = True
+        usage_settings.llm_hedge_budget_pct = 100.0
+        window = latency.get_window("anthropic/species")
+        for _ in range(20):
+            window.add(0.01)
+        respond = upstream.side_effect
+
+        async def slow_first_call(*args, **kwargs):
+            if upstream.call_count == 1:
+                await asyncio.sleep(1.0)
+            return respond(*args, **kwargs)
+
+        upstream.side_effect = slow_first_call
+        with usage.track() as ledger:
+            await query("x" * 400, provider="anthropic", model="claude-haiku-4-5", analyzer="species")
+
+        # The winner's reported 1M input tokens plus the cancelled primary's ~100 token estimate
+        assert ledger.total.calls == 2
+        assert ledger.total.input_tokens == 1_000_000 + 100
+        assert ledger.total.output_tokens == 100_000
+        assert metrics.get("llm_abandoned_calls_total", provider="anthropic", analyzer="species") == 1
+
+
+class TestBudgets:
+    @pytest.mark.asyncio
+    async def test_daily_budget_switches_to_cheaper_route(self, upstream, usage_settings):
+        usage_settings.llm_daily_budget_usd = 5.0
+        usage_settings.llm_budget_route = "anthropic:claude-haiku-4-5"
+
+        for prompt in ("p", "q", "r"):
+            await query(prompt, provider="anthropic", model="claude-sonnet-4-5")
+
+        # $4.50 spent after the first call: past 90% of $5
+        assert _models(upstream) == ["claude-sonnet-4-5", "claude-haiku-4-5", "claude-haiku-4-5"]
+        assert metrics.get("llm_budget_downgrades_total", scope="daily", analyzer="default") == 2
+
+    @pytest.mark.asyncio
+    async def test_contract_budget_only_applies_to_its_contract(self, upstream, usage_settings):
+        usage_settings.llm_contract_daily_budgets_usd = {"c1": 4.0}
+        usage_settings.llm_budget_route = "anthropic:claude-haiku-4-5"
+
+        with usage.track("c1"):
+            await query("p", provider="anthropic", model="claude-sonnet-4-5")
+            await query("q", provider="anthropic", model="claude-sonnet-4-5")
+        with usage.track("c2"):
+            await query("r", provider="anthropic", model="claude-sonnet-4-5")
+
+        assert _models(upstream) == ["claude-sonnet-4-5", "claude-haiku-4-5", "claude-sonnet-4-5"]
+
+    @pytest.mark.asyncio
+    async def test_no_route_no_downgrade(self, upstream, usage_settings):
+        usage_settings.llm_daily_budget_usd = 1.0
+        await query("p", provider="anthropic", model="claude-sonnet-4-5")
+        await query("q", provider="anthropic", model="claude-sonnet-4-5")
+        assert _models(upstream) == ["claude-sonnet-4-5", "claude-sonnet-4-5"]
@@ -0,0 +1,3 @@
+-- Migration 0005: LLM token usage and estimated cost of each observation's AI analysis
+
+ALTER TABLE observations ADD COLUMN IF NOT EXISTS ai_usage JSONB;
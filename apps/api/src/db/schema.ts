@@ -184,6 +184,7 @@ export const observations = pgTable(
     aiSpeciesResult: text('ai_species_result'),
     aiHealthResult: text('ai_health_result'),
     aiMeasurementResult: text('ai_measurement_result'),
+    aiUsage: jsonb('ai_usage'), // LLM tokens and estimated cost of the AI analysis
     notes: text('notes'),
     // Level 1 inspection fields
     conditionRating: varchar('condition_rating', { length: 20 }),
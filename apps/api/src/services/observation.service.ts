@@ -235,6 +235,7 @@ export async function updateObservationAIResult(
       mulchSoilCondition?: string | null;
       riskFlag?: boolean | null;
     } | null;
+    usage?: Record<string, unknown> | null;
   }
 ) {
   const obs = await db
@@ -255,6 +256,8 @@ export async function updateObservationAIResult(
     status: 'pending_review',
     updatedAt: new Date(),
   };
+  // LLM tokens and estimated cost, kept from the last run that reported them
+  if (aiResult.usage) obsUpdates.aiUsage = aiResult.usage;
 
   // Site assessment AI fields on observation
   if (aiResult.site) {
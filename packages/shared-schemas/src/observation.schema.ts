@@ -10,5 +10,6 @@ export {
   aiSpeciesResultSchema,
   aiHealthResultSchema,
   aiMeasurementResultSchema,
+  aiUsageSchema,
   treeObservationSchema,
 } from './tree.schema';
@@ -87,6 +87,23 @@ export const photoSchema = z.object({
   createdAt: z.string(),
 });
 
+// LLM tokens and estimated cost of one observation's analysis
+const aiUsageCountsSchema = z.object({
+  calls: z.number().int().nonnegative(),
+  cachedCalls: z.number().int().nonnegative(),
+  inputTokens: z.number().int().nonnegative(),
+  outputTokens: z.number().int().nonnegative(),
+  cacheReadTokens: z.number().int().nonnegative(),
+  cacheWriteTokens: z.number().int().nonnegative(),
+  images: z.number().int().nonnegative(),
+  costUsd: z.number().nonnegative(),
+});
+
+export const aiUsageSchema = aiUsageCountsSchema.extend({
+  byAnalyzer: z.record(aiUsageCountsSchema),
+  byModel: z.record(aiUsageCountsSchema),
+});
+
 export const observationSchema = z.object({
   id: z.string().uuid(),
   treeId: z.string().uuid().nullable(),
@@ -98,6 +115,7 @@ export const observationSchema = z.object({
   aiSpeciesResult: z.string().nullable(),
   aiHealthResult: z.string().nullable(),
   aiMeasurementResult: z.string().nullable(),
+  aiUsage: aiUsageSchema.nullable().optional(),
   notes: z.string().nullable(),
   // Level 1 inspection fields
   conditionRating: z.string().nullable().optional(),
@@ -216,6 +234,7 @@ export const aiResultSchema = z.object({
   species: aiSpeciesResultSchema.nullable(),
   health: aiHealthResultSchema.nullable(),
   measurements: aiMeasurementResultSchema.nullable(),
+  usage: aiUsageSchema.nullable().optional(),
   // Level 1 AI-estimated fields
   heightEstimateM: z.number().positive().nullable().optional(),
   canopySpreadM: z.number().positive().nullable().optional(),
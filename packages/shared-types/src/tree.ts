@@ -92,6 +92,7 @@ export interface Observation {
   aiSpeciesResult: string | null;
   aiHealthResult: string | null;
   aiMeasurementResult: string | null;
+  aiUsage?: AIUsage | null;
   notes: string | null;
   // Level 1 inspection fields
   conditionRating: string | null;
@@ -145,8 +146,25 @@ export interface AIMeasurementResult {
   heightM: number;
 }
 
+export interface AIUsageCounts {
+  calls: number;
+  cachedCalls: number;
+  inputTokens: number;
+  outputTokens: number;
+  cacheReadTokens: number;
+  cacheWriteTokens: number;
+  images: number;
+  costUsd: number;
+}
+
+export interface AIUsage extends AIUsageCounts {
+  byAnalyzer: Record<string, AIUsageCounts>;
+  byModel: Record<string, AIUsageCounts>;
+}
+
 export interface AIResult {
   species: AISpeciesResult | null;
   health: AIHealthResult | null;
   measurements: AIMeasurementResult | null;
+  usage?: AIUsage | null;
 }